@@ -13,6 +13,7 @@ Architecture:
 from __future__ import annotations
 import os
 import threading
+import time
 import logging
 from pathlib import Path
 
@@ -25,61 +26,58 @@ _flask_thread: threading.Thread | None = None
 _flask_started = False
 
 
+def find_opencode_config() -> Path | None:
+    """Locate opencode.json: next to the plugin first, then the repo root."""
+    current_dir = Path(__file__).parent.resolve()
+    for config_path in (current_dir / "opencode.json", current_dir.parent.parent / "opencode.json"):
+        if config_path.exists():
+            return config_path
+    return None
+
+
 def start_flask_service() -> None:
-    """Start the Flask Logic Layer in a daemon thread."""
+    """
+    Start the Flask Logic Layer in a daemon thread.
+    
+    Nothing heavy happens on ComfyUI's import path: Flask, Socket.IO and
+    httpx are imported inside the thread, the socket server binds right
+    away and OpenCode Server is warmed up in the background (clients get
+    ``opencode_status`` events as it becomes ready).
+    """
     global _flask_thread, _flask_started
     
     if _flask_started:
         return
     
-    try:
-        from .backend.logic import create_app, socketio
-        
-        def run_flask():
-            # Configure OpenCode Client
-            from .backend.core import get_opencode_client, OpencodeConfig
-            
-            # Determine config path: check sibling first, then repo root
-            current_dir = Path(__file__).parent.resolve()
-            config_path = current_dir / "opencode.json"
-            
-            if not config_path.exists():
-                # Fallback to repo root (development environment)
-                repo_root = current_dir.parent.parent
-                config_path = repo_root / "opencode.json"
+    def run_flask():
+        try:
+            started = time.perf_counter()
+            from .backend.logic import ServerConfig, create_app, run_server
+            from .backend.core import get_opencode_warmup
             
-            if config_path.exists():
+            config_path = find_opencode_config()
+            if config_path:
                 logger.info(f"Using OpenCode config: {config_path}")
-                client = get_opencode_client()
-                client.configure(OpencodeConfig(config_path=str(config_path)))
-                
-                # Ensure server is running with this config
-                if client.ensure_server_running():
-                    logger.info("OpenCode Server is ready")
-                else:
-                    logger.error("Failed to start OpenCode Server")
             else:
                 logger.warning("opencode.json not found, using default configuration")
-
-            app = create_app()
-            # Get port from environment or use default 8189 (avoid 5000 which is AirPlay on Mac)
-            port = int(os.environ.get("COMFYUI_PROMPT_SKILLS_PORT", 8189))
-            logger.info(f"Starting Flask Logic Layer on port {port}...")
-            socketio.run(
-                app,
-                host="0.0.0.0",
-                port=port,
-                allow_unsafe_werkzeug=True,
-                debug=True,
-                use_reloader=False,
+            
+            # Port defaults to 8189 (avoid 5000 which is AirPlay on Mac)
+            server_config = ServerConfig.from_env()
+            app = create_app(debug=server_config.debug, server_config=server_config)
+            get_opencode_warmup().start(str(config_path) if config_path else None)
+            
+            logger.info(
+                f"Starting Flask Logic Layer on port {server_config.port} "
+                f"(initialized in {time.perf_counter() - started:.2f}s)..."
             )
-        
-        _flask_thread = threading.Thread(target=run_flask, daemon=True)
-        _flask_thread.start()
-        _flask_started = True
-        logger.info("Flask Logic Layer started successfully")
-    except Exception as e:
-        logger.error(f"Failed to start Flask service: {e}")
+            run_server(app, server_config)
+        except Exception as e:
+            logger.error(f"Failed to start Flask service: {e}")
+    
+    _flask_thread = threading.Thread(target=run_flask, name="prompt-skills-flask", daemon=True)
+    _flask_thread.start()
+    _flask_started = True
+    logger.info("Flask Logic Layer starting in the background")
 
 
 # Only initialize ComfyUI-specific components when running in ComfyUI context
@@ -90,16 +88,18 @@ try:
     start_flask_service()
 
     # Import node classes
-    from .nodes import OpencodeContainerNode, ShowTextNode
+    from .nodes import OpencodeContainerNode, PromptBatchNode, ShowTextNode
 
     # ComfyUI node registration
     NODE_CLASS_MAPPINGS = {
         "OpencodeContainerNode": OpencodeContainerNode,
+        "PromptBatchNode": PromptBatchNode,
         "ShowTextNode": ShowTextNode,
     }
 
     NODE_DISPLAY_NAME_MAPPINGS = {
         "OpencodeContainerNode": "Prompt Skills Generator",
+        "PromptBatchNode": "Prompt Skills Batch",
         "ShowTextNode": "Show Text",
     }
 
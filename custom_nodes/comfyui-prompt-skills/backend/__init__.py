@@ -4,10 +4,12 @@ from .core import (
     SessionManager,
     SkillRegistry,
     OpencodeClient,
+    AsyncOpencodeClient,
     OutputFormatter,
     get_session_manager,
     get_skill_registry,
     get_opencode_client,
+    get_async_opencode_client,
     get_output_formatter,
 )
 
@@ -22,10 +24,12 @@ __all__ = [
     "SessionManager",
     "SkillRegistry",
     "OpencodeClient",
+    "AsyncOpencodeClient",
     "OutputFormatter",
     "get_session_manager",
     "get_skill_registry",
     "get_opencode_client",
+    "get_async_opencode_client",
     "get_output_formatter",
     # Logic (Tier 2)
     "create_app",
@@ -1,12 +1,60 @@
 """Tier 3: Opencode Core - Business Logic Layer"""
 
-from .session_manager import SessionManager, get_session_manager
-from .skill_registry import SkillRegistry, get_skill_registry
-from .opencode_client import OpencodeClient, get_opencode_client, OpencodeConfig
-from .output_formatter import OutputFormatter, get_output_formatter
+from .session_manager import SessionManager, SessionLimits, get_session_manager
+from .session_store import (
+    SessionStore,
+    SQLiteSessionStore,
+    MemorySessionStore,
+    get_session_store,
+)
+from .skill_registry import Skill, SkillRegistry, CompiledPrompt, get_skill_registry
+from .opencode_client import (
+    OpencodeClient,
+    OpencodeConfig,
+    get_opencode_client,
+    message_role,
+    message_text,
+)
+from .async_opencode_client import AsyncOpencodeClient, get_async_opencode_client
+from .async_runtime import BackgroundLoop, get_background_loop
+from .output_formatter import OutputFormatter, StreamingPromptParser, get_output_formatter
+from .event_stream import EventStreamRouter, get_event_router
+from .scheduler import (
+    GenerationScheduler,
+    GenerationJob,
+    SchedulerConfig,
+    get_generation_scheduler,
+)
+from .style_index import StyleIndex, get_style_index
+from .prompt_budget import (
+    PromptAssembler,
+    PromptSection,
+    AssembledPrompt,
+    estimate_tokens,
+    get_prompt_assembler,
+)
+from .result_cache import (
+    ResultCache,
+    ResultCacheConfig,
+    make_cache_key,
+    get_result_cache,
+)
+from .warmup import OpencodeWarmup, get_opencode_warmup
+from .tracing import Trace, Tracer, export_chrome, get_tracer, trace_span
+from .metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+    FAST_BUCKETS,
+    LATENCY_BUCKETS,
+    get_metrics_registry,
+)
 from .debug_logger import (
     DebugEmitter,
+    DebugLogQueue,
     get_debug_emitter,
+    get_debug_log_queue,
     debug_log,
     logger,
     DEBUG_MODE,
@@ -14,16 +62,63 @@ from .debug_logger import (
 
 __all__ = [
     "SessionManager",
+    "SessionLimits",
+    "SessionStore",
+    "SQLiteSessionStore",
+    "MemorySessionStore",
+    "Skill",
     "SkillRegistry",
+    "CompiledPrompt",
     "OpencodeClient",
     "OpencodeConfig",
+    "AsyncOpencodeClient",
+    "BackgroundLoop",
     "OutputFormatter",
+    "StreamingPromptParser",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "MetricsRegistry",
+    "FAST_BUCKETS",
+    "LATENCY_BUCKETS",
+    "get_metrics_registry",
+    "Trace",
+    "Tracer",
+    "export_chrome",
+    "get_tracer",
+    "trace_span",
     "DebugEmitter",
+    "DebugLogQueue",
+    "EventStreamRouter",
+    "GenerationScheduler",
+    "GenerationJob",
+    "SchedulerConfig",
+    "StyleIndex",
+    "PromptAssembler",
+    "PromptSection",
+    "AssembledPrompt",
+    "ResultCache",
+    "ResultCacheConfig",
+    "OpencodeWarmup",
     "get_session_manager",
+    "get_session_store",
     "get_skill_registry",
     "get_opencode_client",
+    "get_async_opencode_client",
+    "get_background_loop",
     "get_output_formatter",
+    "get_event_router",
+    "get_generation_scheduler",
+    "get_style_index",
+    "get_prompt_assembler",
+    "estimate_tokens",
+    "get_result_cache",
+    "get_opencode_warmup",
+    "make_cache_key",
     "get_debug_emitter",
+    "get_debug_log_queue",
+    "message_role",
+    "message_text",
     "debug_log",
     "logger",
     "DEBUG_MODE",
@@ -0,0 +1,281 @@
+"""
+Tier 3: AsyncOpencodeClient - asyncio HTTP Client for OpenCode Server
+
+asyncio variant of OpencodeClient built on one shared httpx.AsyncClient,
+so many in-flight generations can be awaited on a single event loop
+(see async_runtime.BackgroundLoop) over a pooled, keep-alive connection set.
+
+Server lifecycle (starting `opencode serve`) stays with the synchronous
+OpencodeClient, which owns the subprocess.
+"""
+
+from __future__ import annotations
+import asyncio
+from typing import Any, Callable
+
+import httpx
+
+from .opencode_client import OpencodeConfig, get_opencode_client
+from .metrics import opencode_retries, record_opencode_response_async
+from .tracing import trace_span
+
+
+def _record_status(span: Any, response: httpx.Response) -> None:
+    """Attach the HTTP status to a tracing span."""
+    if span is not None:
+        span.attrs["status"] = response.status_code
+
+
+class AsyncOpencodeClient:
+    """
+    Async HTTP client for OpenCode Server API.
+
+    Mirrors the OpencodeClient API with coroutine methods. The underlying
+    httpx.AsyncClient binds to the event loop it is first used on, so one
+    instance should be used from one loop.
+    """
+
+    def __init__(self, config: OpencodeConfig | None = None) -> None:
+        self._config = config
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def config(self) -> OpencodeConfig:
+        """Explicit config, or the one shared with the synchronous client."""
+        return self._config or get_opencode_client()._config
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Lazy-initialized pooled HTTP client."""
+        if self._client is None:
+            config = self.config
+            self._client = httpx.AsyncClient(
+                base_url=config.base_url,
+                timeout=config.timeout,
+                limits=config.limits,
+                event_hooks={"response": [record_opencode_response_async]},
+            )
+        return self._client
+
+    async def is_server_running(self) -> bool:
+        """Check if OpenCode Server is running and healthy."""
+        try:
+            response = await self.client.get("/config")
+            return response.status_code == 200
+        except Exception:
+            return False
+
+    async def ensure_server_running(self) -> bool:
+        """
+        Ensure OpenCode Server is running, starting it if necessary.
+
+        Startup is delegated to the synchronous client in a worker thread.
+        """
+        with trace_span("opencode.ensure_server_running") as span:
+            if await self.is_server_running():
+                return True
+            if span is not None:
+                span.attrs["started"] = True
+            return await asyncio.to_thread(get_opencode_client().ensure_server_running)
+
+    async def create_session(self, title: str | None = None) -> dict[str, Any] | None:
+        """Create a new session on OpenCode Server."""
+        with trace_span("opencode.create_session") as span:
+            try:
+                payload = {}
+                if title:
+                    payload["title"] = title
+
+                response = await self.client.post("/session", json=payload)
+                _record_status(span, response)
+                if response.status_code == 200:
+                    return response.json()
+            except Exception:
+                pass
+            return None
+
+    async def get_session(self, session_id: str) -> dict[str, Any] | None:
+        """Get session details from OpenCode Server."""
+        try:
+            response = await self.client.get(f"/session/{session_id}")
+            if response.status_code == 200:
+                return response.json()
+        except Exception:
+            pass
+        return None
+
+    async def list_sessions(self) -> list[dict[str, Any]]:
+        """List all sessions."""
+        try:
+            response = await self.client.get("/session")
+            if response.status_code == 200:
+                return response.json()
+        except Exception:
+            pass
+        return []
+
+    async def send_message(
+        self,
+        session_id: str,
+        content: str,
+        system: str | None = None,
+    ) -> dict[str, Any] | None:
+        """
+        Send a message to a session.
+
+        Args:
+            session_id: The session ID
+            content: Message content text
+            system: Optional system prompt
+
+        Returns:
+            Response data or None on failure
+        """
+        with trace_span("opencode.send_message") as span:
+            try:
+                payload: dict[str, Any] = {
+                    "parts": [
+                        {
+                            "type": "text",
+                            "text": content,
+                        }
+                    ],
+                }
+
+                if system:
+                    payload["system"] = system
+
+                response = await self.client.post(
+                    f"/session/{session_id}/message",
+                    json=payload,
+                    timeout=self.config.message_timeout,
+                )
+                _record_status(span, response)
+                if response.status_code == 200:
+                    return response.json()
+            except Exception:
+                pass
+            return None
+
+    async def abort_session(self, session_id: str) -> bool:
+        """Abort any ongoing AI processing in a session."""
+        try:
+            response = await self.client.post(f"/session/{session_id}/abort")
+            return response.status_code == 200
+        except Exception:
+            return False
+
+    async def delete_session(self, session_id: str) -> bool:
+        """Delete a session and its messages."""
+        try:
+            response = await self.client.delete(f"/session/{session_id}")
+            return response.status_code == 200
+        except Exception:
+            return False
+
+    async def get_messages(self, session_id: str, limit: int | None = None) -> list[dict[str, Any]]:
+        """Get messages for a session (only the most recent ``limit`` if given)."""
+        with trace_span("opencode.get_messages", limit=limit) as span:
+            try:
+                params = {"limit": limit} if limit else None
+                response = await self.client.get(f"/session/{session_id}/message", params=params)
+                _record_status(span, response)
+                if response.status_code == 200:
+                    return response.json()
+            except Exception:
+                pass
+            return []
+
+    async def get_messages_since(
+        self,
+        session_id: str,
+        message_id: str | None,
+        page_size: int = 8,
+    ) -> list[dict[str, Any]]:
+        """
+        Get the messages that follow ``message_id`` in a session.
+
+        Fetches the tail of the transcript, doubling the window until the
+        marker message is found, so the cost tracks the number of new
+        messages rather than the conversation length. Without a marker the
+        most recent ``page_size`` messages are returned.
+        """
+        limit = page_size
+        while True:
+            messages = await self.get_messages(session_id, limit=limit)
+            if message_id is None:
+                return messages
+            for index, message in enumerate(messages):
+                if (message.get("info") or {}).get("id") == message_id:
+                    return messages[index + 1:]
+            if len(messages) < limit:
+                # Whole transcript fetched and the marker is not in it
+                return messages
+            limit *= 2
+            opencode_retries().inc(kind="messages_refetch")
+
+    async def stream_events(
+        self,
+        on_delta: Callable[[str], None] | None = None,
+        on_complete: Callable[[], None] | None = None,
+        on_open: Callable[[], None] | None = None,
+    ) -> None:
+        """
+        Stream events from OpenCode Server using SSE.
+
+        Runs until the server closes the stream or the task is cancelled.
+        """
+        try:
+            timeout = httpx.Timeout(self.config.timeout, read=None)
+            async with self.client.stream("GET", "/global/event", timeout=timeout) as response:
+                if response.status_code != 200:
+                    return
+                if on_open:
+                    on_open()
+                async for line in response.aiter_lines():
+                    if line.startswith("data:"):
+                        data = line[5:].strip()
+                        if on_delta:
+                            on_delta(data)
+
+                if on_complete:
+                    on_complete()
+        except Exception:
+            pass
+
+    async def get_config(self) -> dict[str, Any] | None:
+        """Get OpenCode configuration."""
+        try:
+            response = await self.client.get("/config")
+            if response.status_code == 200:
+                return response.json()
+        except Exception:
+            pass
+        return None
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    def configure(self, config: OpencodeConfig) -> None:
+        """
+        Update client configuration.
+
+        The old pool is dropped; call close() first to release it cleanly.
+        """
+        self._config = config
+        self._client = None
+
+
+# Global singleton instance
+_async_opencode_client: AsyncOpencodeClient | None = None
+
+
+def get_async_opencode_client() -> AsyncOpencodeClient:
+    """Get the global AsyncOpencodeClient instance."""
+    global _async_opencode_client
+    if _async_opencode_client is None:
+        _async_opencode_client = AsyncOpencodeClient()
+    return _async_opencode_client
@@ -0,0 +1,77 @@
+"""
+Tier 3: BackgroundLoop - Shared asyncio Event Loop
+
+Runs one asyncio event loop on a daemon thread so coroutine-based work
+(AsyncOpencodeClient requests, generation jobs) can be submitted from
+Flask/SocketIO handler threads without parking an OS thread per request.
+"""
+
+from __future__ import annotations
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, TypeVar
+
+T = TypeVar("T")
+
+
+class BackgroundLoop:
+    """
+    An asyncio event loop running forever on a dedicated daemon thread.
+
+    The loop is started lazily on first use and shared process-wide.
+    """
+
+    def __init__(self, name: str = "prompt-skills-loop") -> None:
+        self._name = name
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Lazy-started event loop."""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    ready = threading.Event()
+                    loop = asyncio.new_event_loop()
+
+                    def run() -> None:
+                        asyncio.set_event_loop(loop)
+                        loop.call_soon(ready.set)
+                        loop.run_forever()
+
+                    self._thread = threading.Thread(target=run, name=self._name, daemon=True)
+                    self._thread.start()
+                    ready.wait()
+                    self._loop = loop
+        return self._loop
+
+    def in_loop_thread(self) -> bool:
+        """Return True when called from the loop's own thread."""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Coroutine[Any, Any, T]) -> Future[T]:
+        """Schedule a coroutine on the loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine[Any, Any, T], timeout: float | None = None) -> T:
+        """Run a coroutine on the loop and block the calling thread for its result."""
+        return self.submit(coro).result(timeout)
+
+    def call_soon(self, callback: Any, *args: Any) -> None:
+        """Schedule a plain callback on the loop from any thread."""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+
+# Global singleton instance
+_background_loop: BackgroundLoop | None = None
+
+
+def get_background_loop() -> BackgroundLoop:
+    """Get the global BackgroundLoop instance."""
+    global _background_loop
+    if _background_loop is None:
+        _background_loop = BackgroundLoop()
+    return _background_loop
@@ -5,14 +5,23 @@ Provides centralized debug logging that can be enabled via environment variable:
     COMFYUI_PROMPT_SKILLS_DEBUG=1
 
 Supports both console output and WebSocket emission to frontend.
+
+Logging is cheap when nothing would be shown: messages may be passed as
+``%``-style format strings with arguments or as zero-argument callables,
+and are only rendered after the level check passed. Messages for the
+frontend are queued and emitted to each room in batches (``debug_logs``
+events) by a background thread instead of one emit per message.
 """
 
 from __future__ import annotations
 import os
 import sys
 import logging
+import threading
+import time
+from collections import deque
 from datetime import datetime
-from typing import Any, Callable
+from typing import Any, Callable, Union
 
 # Check if debug mode is enabled
 DEBUG_MODE = os.environ.get("COMFYUI_PROMPT_SKILLS_DEBUG", "0") == "1"
@@ -53,6 +62,117 @@ def setup_logging() -> logging.Logger:
 # Global logger instance
 logger = setup_logging()
 
+# A message is either final text, a %-format string or a callable producing the text
+Message = Union[str, Callable[[], str]]
+
+_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARN": logging.WARNING,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+}
+
+
+def render_message(message: Message, args: tuple[Any, ...] = ()) -> str:
+    """Produce the text of a deferred message."""
+    if callable(message):
+        return message()
+    if args:
+        return message % args
+    return message
+
+
+EmitFunc = Callable[[str, dict, str], None]
+
+
+class DebugLogQueue:
+    """
+    Batches frontend debug messages per room.
+
+    ``put`` only appends to a bounded deque; a daemon thread wakes up on
+    the first queued message, waits ``flush_interval`` to collect more and
+    emits them as one ``debug_logs`` event per room. When messages arrive
+    faster than they can be sent, the oldest are dropped.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 0.1,
+        max_pending: int = 2000,
+        max_batch: int = 100,
+    ) -> None:
+        self._flush_interval = flush_interval
+        self._max_batch = max_batch
+        self._pending: deque[tuple[EmitFunc, str, dict[str, Any]]] = deque(maxlen=max_pending)
+        self._wake = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def put(self, emit_func: EmitFunc, room: str, entry: dict[str, Any]) -> None:
+        """Queue an entry for room; returns immediately."""
+        self._pending.append((emit_func, room, entry))
+        if self._thread is None:
+            self._start()
+        if not self._wake.is_set():
+            self._wake.set()
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="prompt-skills-debug-log", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            time.sleep(self._flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Emit everything queued so far; returns the number of entries sent."""
+        with self._flush_lock:
+            batches: dict[tuple[EmitFunc, str], list[dict[str, Any]]] = {}
+            while self._pending:
+                try:
+                    emit_func, room, entry = self._pending.popleft()
+                except IndexError:
+                    break
+                entry["timestamp"] = datetime.fromtimestamp(entry["timestamp"]).isoformat()
+                batches.setdefault((emit_func, room), []).append(entry)
+
+            sent = 0
+            for (emit_func, room), entries in batches.items():
+                for start in range(0, len(entries), self._max_batch):
+                    chunk = entries[start:start + self._max_batch]
+                    try:
+                        emit_func("debug_logs", {"session_id": room, "entries": chunk}, room)
+                    except Exception as e:
+                        logger.warning(f"Failed to emit debug_logs: {e}")
+                        continue
+                    sent += len(chunk)
+            return sent
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+
+# Global singleton instance
+_debug_log_queue: DebugLogQueue | None = None
+
+
+def get_debug_log_queue() -> DebugLogQueue:
+    """Get the global DebugLogQueue instance."""
+    global _debug_log_queue
+    if _debug_log_queue is None:
+        _debug_log_queue = DebugLogQueue()
+    return _debug_log_queue
+
 
 class DebugEmitter:
     """
@@ -62,63 +182,74 @@ class DebugEmitter:
         debug = DebugEmitter(socketio, session_id)
         debug.info("SocketHandler", "Connected to session")
         debug.error("OpenCode", "Failed to connect")
+        debug.debug("OpenCode", "Raw messages: %r", messages)  # formatted lazily
     """
     
     def __init__(
         self, 
-        emit_func: Callable[[str, dict, str], None] | None = None,
+        emit_func: EmitFunc | None = None,
         session_id: str | None = None
     ) -> None:
         self._emit_func = emit_func
         self._session_id = session_id
     
-    def _log(self, level: str, module: str, message: str, **kwargs: Any) -> None:
-        """Internal method to log and emit debug message."""
-        # Always log to console
-        log_func = getattr(logger, level.lower(), logger.info)
-        log_func(f"[{module}] {message}")
+    def _log(self, level: str, module: str, message: Message, args: tuple[Any, ...], **kwargs: Any) -> None:
+        """Internal method to log and queue a debug message."""
+        levelno = _LEVELS.get(level, logging.INFO)
+        to_console = logger.isEnabledFor(levelno)
+        to_room = self._emit_func is not None and self._session_id is not None
+        if not (to_console or to_room):
+            return
+        text = render_message(message, args)
+        
+        if to_console:
+            logger.log(levelno, "[%s] %s", module, text)
         
-        # Emit to WebSocket if available
-        if self._emit_func and self._session_id:
-            try:
-                self._emit_func("debug_log", {
-                    "level": level.upper(),
-                    "module": module,
-                    "message": message,
-                    "timestamp": datetime.now().isoformat(),
-                    **kwargs
-                }, self._session_id)
-            except Exception as e:
-                logger.warning(f"Failed to emit debug_log: {e}")
-    
-    def debug(self, module: str, message: str, **kwargs: Any) -> None:
+        # Queue for batched WebSocket emission
+        if to_room:
+            get_debug_log_queue().put(self._emit_func, self._session_id, {
+                "level": level,
+                "module": module,
+                "message": text,
+                "timestamp": time.time(),
+                **kwargs
+            })
+    
+    def debug(self, module: str, message: Message, *args: Any, **kwargs: Any) -> None:
         """Log DEBUG level message (only in debug mode)."""
         if DEBUG_MODE:
-            self._log("DEBUG", module, message, **kwargs)
+            self._log("DEBUG", module, message, args, **kwargs)
     
-    def info(self, module: str, message: str, **kwargs: Any) -> None:
+    def info(self, module: str, message: Message, *args: Any, **kwargs: Any) -> None:
         """Log INFO level message."""
-        self._log("INFO", module, message, **kwargs)
+        self._log("INFO", module, message, args, **kwargs)
     
-    def warn(self, module: str, message: str, **kwargs: Any) -> None:
+    def warn(self, module: str, message: Message, *args: Any, **kwargs: Any) -> None:
         """Log WARNING level message."""
-        self._log("WARN", module, message, **kwargs)
+        self._log("WARN", module, message, args, **kwargs)
     
-    def error(self, module: str, message: str, **kwargs: Any) -> None:
+    def error(self, module: str, message: Message, *args: Any, **kwargs: Any) -> None:
         """Log ERROR level message."""
-        self._log("ERROR", module, message, **kwargs)
+        self._log("ERROR", module, message, args, **kwargs)
+    
+    def flush(self) -> None:
+        """Send queued frontend messages now (e.g. when a generation ends)."""
+        if self._emit_func is not None:
+            get_debug_log_queue().flush()
     
     def trace_call(self, func_name: str, **args: Any) -> None:
         """Log function call with arguments (debug mode only)."""
         if DEBUG_MODE:
-            args_str = ", ".join(f"{k}={repr(v)[:50]}" for k, v in args.items())
-            self._log("DEBUG", "Trace", f"→ {func_name}({args_str})")
+            self._log("DEBUG", "Trace", lambda: "→ %s(%s)" % (
+                func_name, ", ".join(f"{k}={repr(v)[:50]}" for k, v in args.items())
+            ), ())
     
     def trace_return(self, func_name: str, result: Any = None) -> None:
         """Log function return (debug mode only)."""
         if DEBUG_MODE:
-            result_str = repr(result)[:100] if result is not None else "None"
-            self._log("DEBUG", "Trace", f"← {func_name} returned: {result_str}")
+            self._log("DEBUG", "Trace", lambda: "← %s returned: %s" % (
+                func_name, repr(result)[:100] if result is not None else "None"
+            ), ())
 
 
 def get_debug_emitter(
@@ -130,12 +261,18 @@ def get_debug_emitter(
 
 
 # Convenience function for simple console logging
-def debug_log(module: str, message: str, level: str = "INFO") -> None:
-    """Simple debug logging without WebSocket emission."""
+def debug_log(module: str, message: Message, *args: Any, level: str = "INFO") -> None:
+    """
+    Simple debug logging without WebSocket emission.
+    
+    message may be a %-format string with args or a callable; it is only
+    rendered if the level is enabled.
+    """
     if level == "DEBUG" and not DEBUG_MODE:
         return
-    log_func = getattr(logger, level.lower(), logger.info)
-    log_func(f"[{module}] {message}")
+    levelno = _LEVELS.get(level, logging.INFO)
+    if logger.isEnabledFor(levelno):
+        logger.log(levelno, "[%s] %s", module, render_message(message, args))
 
 
 # Log startup info
@@ -0,0 +1,169 @@
+"""
+Tier 3: EventStreamRouter - Real-time OpenCode Event Routing
+
+Consumes the OpenCode Server SSE stream (/global/event) on a single
+background thread and routes assistant text deltas to subscribers keyed
+by OpenCode session ID, so tokens reach the UI while the model is still
+generating.
+"""
+
+from __future__ import annotations
+import json
+import time
+import threading
+from typing import Any, Callable
+
+from .metrics import opencode_retries
+from .opencode_client import OpencodeClient, get_opencode_client
+
+
+DeltaCallback = Callable[[str], None]
+
+
+class EventStreamRouter:
+    """
+    Routes OpenCode SSE events to per-session delta callbacks.
+
+    The stream is opened lazily on the first subscription and shared by
+    all sessions. Only text parts of assistant messages are forwarded;
+    the echoed user prompt is filtered out.
+    """
+
+    def __init__(
+        self,
+        client: OpencodeClient | None = None,
+        reconnect_delay: float = 1.0,
+    ) -> None:
+        self._client = client
+        self._reconnect_delay = reconnect_delay
+        self._subscribers: dict[str, list[DeltaCallback]] = {}
+        # OpenCode session ID -> assistant message IDs seen on the stream
+        self._assistant_messages: dict[str, set[str]] = {}
+        # OpenCode session ID -> {part ID: characters already forwarded}
+        self._part_offsets: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._connected = threading.Event()
+        self._attempted = threading.Event()
+
+    @property
+    def client(self) -> OpencodeClient:
+        return self._client or get_opencode_client()
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected.is_set()
+
+    def subscribe(self, opencode_session_id: str, on_delta: DeltaCallback) -> None:
+        """Register a callback for assistant text deltas of a session."""
+        with self._lock:
+            self._subscribers.setdefault(opencode_session_id, []).append(on_delta)
+            self._assistant_messages.setdefault(opencode_session_id, set())
+            self._part_offsets.setdefault(opencode_session_id, {})
+            if self._thread is None:
+                self._attempted.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="opencode-event-stream", daemon=True
+                )
+                self._thread.start()
+
+    def unsubscribe(self, opencode_session_id: str, on_delta: DeltaCallback) -> None:
+        """Remove a previously registered callback."""
+        with self._lock:
+            callbacks = self._subscribers.get(opencode_session_id, [])
+            if on_delta in callbacks:
+                callbacks.remove(on_delta)
+            if not callbacks:
+                self._subscribers.pop(opencode_session_id, None)
+                self._assistant_messages.pop(opencode_session_id, None)
+                self._part_offsets.pop(opencode_session_id, None)
+
+    def wait_until_ready(self, timeout: float) -> bool:
+        """
+        Wait until the stream is connected or the first attempt has failed.
+
+        Returns True if the stream is connected.
+        """
+        if self._connected.is_set():
+            return True
+        self._attempted.wait(timeout)
+        return self._connected.is_set()
+
+    def handle_event(self, event: dict[str, Any]) -> None:
+        """Dispatch a decoded SSE event to the matching subscribers."""
+        # /global/event wraps the bus event as {"directory": ..., "payload": {...}}
+        payload = event.get("payload", event)
+        event_type = payload.get("type")
+        properties = payload.get("properties") or {}
+
+        if event_type == "message.updated":
+            info = properties.get("info") or {}
+            if info.get("role") != "assistant":
+                return
+            with self._lock:
+                message_ids = self._assistant_messages.get(info.get("sessionID"))
+                if message_ids is not None:
+                    message_ids.add(info.get("id"))
+
+        elif event_type == "message.part.updated":
+            part = properties.get("part") or {}
+            if part.get("type") != "text" or part.get("synthetic"):
+                return
+            with self._lock:
+                session_id = part.get("sessionID")
+                message_ids = self._assistant_messages.get(session_id)
+                if not message_ids or part.get("messageID") not in message_ids:
+                    return
+                offsets = self._part_offsets[session_id]
+                text = part.get("text", "")
+                offset = offsets.get(part.get("id"), 0)
+                delta = properties.get("delta")
+                if delta is None:
+                    # Older servers only send the accumulated text
+                    delta = text[offset:]
+                offsets[part.get("id")] = max(offset + len(delta), len(text))
+                callbacks = list(self._subscribers.get(session_id, []))
+
+            if delta:
+                for callback in callbacks:
+                    callback(delta)
+
+    def _handle_data(self, data: str) -> None:
+        """Decode one SSE ``data:`` payload."""
+        try:
+            event = json.loads(data)
+        except json.JSONDecodeError:
+            return
+        if isinstance(event, dict):
+            self.handle_event(event)
+
+    def _on_open(self) -> None:
+        self._connected.set()
+        self._attempted.set()
+
+    def _run(self) -> None:
+        """Keep the SSE stream open while there are subscribers."""
+        while True:
+            self.client.stream_events(on_delta=self._handle_data, on_open=self._on_open)
+            self._connected.clear()
+            self._attempted.set()
+
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+
+            opencode_retries().inc(kind="event_stream_reconnect")
+            time.sleep(self._reconnect_delay)
+
+
+# Global singleton instance
+_event_router: EventStreamRouter | None = None
+
+
+def get_event_router() -> EventStreamRouter:
+    """Get the global EventStreamRouter instance."""
+    global _event_router
+    if _event_router is None:
+        _event_router = EventStreamRouter()
+    return _event_router
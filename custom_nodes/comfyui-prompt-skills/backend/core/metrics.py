@@ -0,0 +1,401 @@
+"""
+Tier 3: Metrics - Counters, Gauges and Histograms in Prometheus Format
+
+A small, dependency-free metrics registry. Instrumented code updates
+counters and histograms as things happen; state that already lives
+elsewhere (scheduler queues, sessions, caches) is read by collectors
+only when the registry is rendered, so it costs nothing between scrapes.
+
+``MetricsRegistry.render`` produces the Prometheus text exposition
+format (version 0.0.4) served by the ``/metrics`` route.
+
+Configuration via environment variables:
+    COMFYUI_PROMPT_SKILLS_METRICS  0 disables the /metrics route (default 1)
+"""
+
+from __future__ import annotations
+import math
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+
+# Latency buckets in seconds, from a cache hit to a slow LLM turn
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+# Buckets for in-process steps such as formatting
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+# (metric name, type, help, [(sample suffix, labels, value)])
+Family = tuple[str, str, str, list[tuple[str, dict[str, str], float]]]
+Collector = Callable[[], list[Family]]
+
+_ID_SEGMENT_RE = re.compile(r"^(ses|msg|prt)_|^[0-9a-f-]{16,}$")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, Any]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def family(self) -> Family:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def family(self) -> Family:
+        with self._lock:
+            samples = [("", dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+        return self.name, self.type, self.help, samples
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def family(self) -> Family:
+        with self._lock:
+            samples = [("", dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+        return self.name, self.type, self.help, samples
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> (per-bucket counts, sum, count)
+        self._values: dict[tuple[str, ...], list[Any]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observe the duration of a block."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, **labels)
+
+    def count(self, **labels: Any) -> int:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[2] if state else 0
+
+    def family(self) -> Family:
+        samples: list[tuple[str, dict[str, str], float]] = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    samples.append(("_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+                samples.append(("_bucket", {**labels, "le": "+Inf"}, count))
+                samples.append(("_sum", labels, total))
+                samples.append(("_count", labels, count))
+        return self.name, self.type, self.help, samples
+
+
+class MetricsRegistry:
+    """Named metrics plus scrape-time collectors."""
+
+    def __init__(self, enabled: bool | None = None) -> None:
+        if enabled is None:
+            enabled = os.environ.get("COMFYUI_PROMPT_SKILLS_METRICS", "1") == "1"
+        self._enabled = enabled
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: dict[str, Collector] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def _get_or_create(self, cls: type, name: str, *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.type}")
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        """Get or create a counter (names should end in ``_total``)."""
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        """Get or create a gauge."""
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        """Get or create a histogram."""
+        return self._get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+    def register_collector(self, name: str, collector: Collector) -> None:
+        """Add (or replace) a function producing metric families at scrape time."""
+        with self._lock:
+            self._collectors[name] = collector
+
+    def collect(self) -> list[Family]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+        families = [metric.family() for metric in metrics]
+        for name, collector in collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                from .debug_logger import debug_log
+                debug_log("Metrics", f"Collector {name} failed: {e}", level="WARNING")
+        return families
+
+    def render(self) -> str:
+        """Prometheus text exposition of every metric."""
+        lines: list[str] = []
+        for name, kind, help, samples in sorted(self.collect(), key=lambda family: family[0]):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def endpoint_template(path: str) -> str:
+    """Collapse ids in an OpenCode API path, e.g. /session/{id}/message."""
+    segments = path.strip("/").split("/")
+    return "/" + "/".join(
+        "{id}" if i > 0 and segments[i - 1] == "session" or _ID_SEGMENT_RE.match(segment) else segment
+        for i, segment in enumerate(segments)
+    )
+
+
+def _process_memory_bytes() -> float | None:
+    """Current resident set size of this process (Linux /proc only)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _process_peak_memory_bytes() -> float | None:
+    """Peak resident set size of this process since start, if available."""
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+def core_families() -> list[Family]:
+    """Scrape-time gauges and counters from the scheduler, sessions and caches."""
+    from .result_cache import get_result_cache
+    from .scheduler import get_generation_scheduler
+    from .session_manager import get_session_manager
+    from .skill_registry import get_skill_registry
+
+    families: list[Family] = []
+
+    scheduler = get_generation_scheduler().stats()
+    families += [
+        ("prompt_skills_jobs_running", "gauge", "Generation jobs currently running",
+         [("", {}, scheduler["running"])]),
+        ("prompt_skills_jobs_borrowed_slots", "gauge", "Extra slots held by batches fanning out",
+         [("", {}, scheduler["borrowed_slots"])]),
+        ("prompt_skills_jobs_queued", "gauge", "Generation jobs waiting in the queue",
+         [("", {}, scheduler["queued"])]),
+        ("prompt_skills_jobs_max_concurrent", "gauge", "Configured generation concurrency",
+         [("", {}, scheduler["max_concurrent"])]),
+    ]
+
+    sessions = get_session_manager().stats()
+    events = [
+        ("", {"event": name}, value)
+        for name, value in sessions.items()
+        if name.startswith(("evicted_", "spilled", "rehydrated", "dropped", "history_trimmed"))
+    ]
+    families += [
+        ("prompt_skills_sessions", "gauge", "Sessions held in memory",
+         [("", {}, sessions["sessions"])]),
+        ("prompt_skills_session_history_messages", "gauge", "Messages held in session histories",
+         [("", {}, sessions["history_messages"])]),
+        ("prompt_skills_session_history_bytes", "gauge", "Estimated memory used by session histories",
+         [("", {}, sessions["history_bytes"])]),
+        ("prompt_skills_session_events_total", "counter", "Session evictions, spills and rehydrations",
+         events),
+    ]
+
+    cache = get_result_cache().stats()
+    compiled = get_skill_registry().compiled_prompt_stats()
+    families += [
+        ("prompt_skills_cache_lookups_total", "counter", "Cache lookups by cache and result", [
+            ("", {"cache": "result", "result": "hit"}, cache["hits"]),
+            ("", {"cache": "result", "result": "miss"}, cache["misses"]),
+            ("", {"cache": "compiled_prompt", "result": "hit"}, compiled["hits"]),
+            ("", {"cache": "compiled_prompt", "result": "miss"}, compiled["misses"]),
+        ]),
+        ("prompt_skills_cache_hit_ratio", "gauge", "Cache hit ratio since start", [
+            ("", {"cache": "result"}, cache["hit_rate"]),
+            ("", {"cache": "compiled_prompt"},
+             compiled["hits"] / (compiled["hits"] + compiled["misses"])
+             if compiled["hits"] + compiled["misses"] else 0.0),
+        ]),
+        ("prompt_skills_cache_entries", "gauge", "Entries held by each cache", [
+            ("", {"cache": "result"}, cache["entries"]),
+            ("", {"cache": "compiled_prompt"}, compiled["size"]),
+        ]),
+    ]
+
+    memory = _process_memory_bytes()
+    if memory is not None:
+        families.append(("prompt_skills_process_resident_memory_bytes", "gauge",
+                         "Resident memory of the process hosting the plugin", [("", {}, memory)]))
+    peak = _process_peak_memory_bytes()
+    if peak is not None:
+        families.append(("prompt_skills_process_peak_resident_memory_bytes", "gauge",
+                         "Peak resident memory of the process hosting the plugin", [("", {}, peak)]))
+    return families
+
+
+# Global singleton instance
+_metrics_registry: MetricsRegistry | None = None
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Get the global MetricsRegistry instance."""
+    global _metrics_registry
+    if _metrics_registry is None:
+        _metrics_registry = MetricsRegistry()
+        _metrics_registry.register_collector("core", core_families)
+    return _metrics_registry
+
+
+def opencode_requests() -> Counter:
+    """OpenCode Server HTTP responses by method, endpoint and status."""
+    return get_metrics_registry().counter(
+        "prompt_skills_opencode_requests_total",
+        "OpenCode Server HTTP responses",
+        ("method", "endpoint", "status"),
+    )
+
+
+def opencode_retries() -> Counter:
+    """Repeated OpenCode calls (stream reconnects, transcript refetches)."""
+    return get_metrics_registry().counter(
+        "prompt_skills_opencode_retries_total",
+        "Repeated OpenCode Server calls",
+        ("kind",),
+    )
+
+
+def record_opencode_response(response: Any) -> None:
+    """httpx response hook: count the status code of an OpenCode call."""
+    if not get_metrics_registry().enabled:
+        return
+    request = response.request
+    opencode_requests().inc(
+        method=request.method,
+        endpoint=endpoint_template(request.url.path),
+        status=str(response.status_code),
+    )
+
+
+async def record_opencode_response_async(response: Any) -> None:
+    """Async variant of record_opencode_response for httpx.AsyncClient."""
+    record_opencode_response(response)
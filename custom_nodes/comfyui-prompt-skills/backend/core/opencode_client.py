@@ -15,6 +15,8 @@ from dataclasses import dataclass
 
 import httpx
 
+from .metrics import record_opencode_response
+
 
 @dataclass
 class OpencodeConfig:
@@ -24,12 +26,41 @@ class OpencodeConfig:
     port: int = 4096
     timeout: float = 60.0
     message_timeout: float = 300.0  # Longer timeout for AI generation
+    stream_ready_timeout: float = 2.0  # Max wait for SSE subscription before sending
     max_retries: int = 3
     config_path: str | None = None
+    # Connection pool shared by all requests of one client
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
     
     @property
     def base_url(self) -> str:
         return f"http://{self.host}:{self.port}"
+    
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+def message_role(message: dict[str, Any]) -> str | None:
+    """
+    Extract the role from an OpenCode message.
+    
+    OpenCode returns messages in nested format:
+    { "info": {"role": "assistant", ...}, "parts": [{"type": "text", "text": "..."}] }
+    """
+    return (message.get("info") or {}).get("role")
+
+
+def message_text(message: dict[str, Any]) -> str:
+    """Concatenate the text parts of an OpenCode message."""
+    parts = message.get("parts") or []
+    return "".join(p.get("text", "") for p in parts if p.get("type") == "text")
 
 
 class OpencodeClient:
@@ -52,6 +83,8 @@ class OpencodeClient:
             self._client = httpx.Client(
                 base_url=self._config.base_url,
                 timeout=self._config.timeout,
+                limits=self._config.limits,
+                event_hooks={"response": [record_opencode_response]},
             )
         return self._client
     
@@ -180,10 +213,27 @@ class OpencodeClient:
             pass
         return None
     
-    def get_messages(self, session_id: str) -> list[dict[str, Any]]:
-        """Get all messages for a session."""
+    def abort_session(self, session_id: str) -> bool:
+        """Abort any ongoing AI processing in a session."""
         try:
-            response = self.client.get(f"/session/{session_id}/message")
+            response = self.client.post(f"/session/{session_id}/abort")
+            return response.status_code == 200
+        except Exception:
+            return False
+    
+    def delete_session(self, session_id: str) -> bool:
+        """Delete a session and its messages."""
+        try:
+            response = self.client.delete(f"/session/{session_id}")
+            return response.status_code == 200
+        except Exception:
+            return False
+    
+    def get_messages(self, session_id: str, limit: int | None = None) -> list[dict[str, Any]]:
+        """Get messages for a session (only the most recent ``limit`` if given)."""
+        try:
+            params = {"limit": limit} if limit else None
+            response = self.client.get(f"/session/{session_id}/message", params=params)
             if response.status_code == 200:
                 return response.json()
         except Exception:
@@ -191,17 +241,25 @@ class OpencodeClient:
         return []
     
     def stream_events(
-        self, 
+        self,
         on_delta: Callable[[str], None] | None = None,
         on_complete: Callable[[], None] | None = None,
+        on_open: Callable[[], None] | None = None,
     ) -> None:
         """
         Stream events from OpenCode Server using SSE.
-        
+
         This is a blocking call that should be run in a separate thread.
+        ``on_open`` fires once the event stream is established.
         """
         try:
-            with self.client.stream("GET", "/global/event") as response:
+            # No read timeout: the stream stays idle between generations
+            timeout = httpx.Timeout(self._config.timeout, read=None)
+            with self.client.stream("GET", "/global/event", timeout=timeout) as response:
+                if response.status_code != 200:
+                    return
+                if on_open:
+                    on_open()
                 for line in response.iter_lines():
                     if line.startswith("data:"):
                         data = line[5:].strip()
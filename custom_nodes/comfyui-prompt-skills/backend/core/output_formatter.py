@@ -5,6 +5,12 @@ Formats LLM-generated prompts into multiple output formats:
 - Comma-separated English
 - Structured JSON
 - Bilingual (Chinese/English)
+
+The response is parsed once: a single linear scan finds balanced JSON
+object candidates, the best one is decoded, and every output format (and
+model-specific transform) works from that one dict. While a response is
+still streaming, StreamingPromptParser follows the JSON as it grows and
+yields a provisional prompt as soon as the positive_prompt field is done.
 """
 
 from __future__ import annotations
@@ -13,6 +19,46 @@ import re
 from typing import Any
 from dataclasses import dataclass
 
+from .tracing import trace_span
+
+
+# Keys that mark a candidate object as the prompt payload
+PROMPT_KEYS = ("positive_prompt", "prompt")
+
+
+def scan_json_objects(text: str) -> list[tuple[int, int]]:
+    """
+    Find the outermost balanced ``{...}`` spans in text in one pass.
+    
+    String literals are tracked inside objects so braces in JSON strings
+    are ignored. An unmatched ``{`` in surrounding prose does not hide a
+    complete object that follows it. Returns (start, end) slices in order.
+    """
+    spans: list[tuple[int, int]] = []
+    stack: list[int] = []
+    in_string = False
+    escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == "{":
+            stack.append(i)
+        elif ch == "}":
+            if stack:
+                start = stack.pop()
+                # Spans closed earlier inside this one are nested in it
+                while spans and spans[-1][0] > start:
+                    spans.pop()
+                spans.append((start, i + 1))
+        elif ch == '"' and stack:
+            in_string = True
+    return spans
+
 
 @dataclass
 class FormattedOutput:
@@ -23,49 +69,156 @@ class FormattedOutput:
     prompt_bilingual: str
     raw_response: str
     
-    def to_dict(self) -> dict[str, str]:
-        return {
+    def to_dict(self, include_raw: bool = True) -> dict[str, str]:
+        data = {
             "prompt_english": self.prompt_english,
             "prompt_json": self.prompt_json,
             "prompt_bilingual": self.prompt_bilingual,
-            "raw_response": self.raw_response,
         }
+        if include_raw:
+            data["raw_response"] = self.raw_response
+        return data
 
 
-class OutputFormatter:
+class StreamingPromptParser:
     """
-    Formats LLM responses into multiple output formats for ComfyUI nodes.
+    Incremental parser for a streamed LLM response.
+    
+    Deltas are consumed as they arrive and each character is examined once
+    by a small state machine that tracks objects, arrays and strings. When
+    the string value of ``field`` in the top-level object is complete, it
+    becomes the provisional prompt; the rest of the stream is then ignored.
+    
+    Like ``scan_json_objects``, a ``{`` in prose does not hide the object
+    that follows: the top level of a candidate is checked against the JSON
+    grammar, and a candidate that stops being JSON is dropped, restarting
+    at the next ``{``.
     """
     
-    def __init__(self) -> None:
-        self._json_pattern = re.compile(r'```json\s*(.*?)\s*```', re.DOTALL)
+    def __init__(self, field: str = "positive_prompt") -> None:
+        self._field = field
+        # Open containers ("{" or "[") of the current candidate object
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escaped = False
+        # Literal of the string being read in the top-level object
+        self._literal: list[str] = []
+        # What the top-level object expects next: key, colon, value, literal, next
+        self._state = "key"
+        self._key: str | None = None
+        self.prompt: str | None = None
     
-    def _extract_json(self, text: str) -> dict[str, Any] | None:
-        """Extract JSON from markdown code blocks or raw text."""
-        # Try markdown code block first
-        match = self._json_pattern.search(text)
-        if match:
-            try:
-                return json.loads(match.group(1))
-            except json.JSONDecodeError:
-                pass
-        
-        # Try parsing the whole text as JSON
+    @property
+    def done(self) -> bool:
+        return self.prompt is not None
+    
+    def feed(self, delta: str) -> str | None:
+        """Consume a delta. Returns the prompt once, when it completes."""
+        if self.prompt is not None:
+            return None
+        for ch in delta:
+            top_level = len(self._stack) == 1
+            if self._in_string:
+                if top_level:
+                    self._literal.append(ch)
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                    if top_level and self._end_string():
+                        return self.prompt
+            elif not self._stack:
+                # Prose around the object; only "{" matters here
+                if ch == "{":
+                    self._open()
+            elif top_level:
+                self._top_level(ch)
+            elif ch in "{[":
+                self._stack.append(ch)
+            elif ch in "}]":
+                self._stack.pop()
+                if len(self._stack) == 1:
+                    self._state = "next"
+            elif ch == '"':
+                self._in_string = True
+        return None
+    
+    def _open(self) -> None:
+        """Start a candidate object at a "{"."""
+        self._stack = ["{"]
+        self._state = "key"
+        self._key = None
+    
+    def _top_level(self, ch: str) -> None:
+        """Advance the top-level object by one character outside strings."""
+        state = self._state
+        if ch.isspace():
+            if state == "literal":
+                self._state = "next"
+        elif ch == '"' and state in ("key", "value"):
+            self._in_string = True
+            self._literal = [ch]
+        elif ch == ":" and state == "colon":
+            self._state = "value"
+        elif ch == "," and state in ("literal", "next"):
+            self._state = "key"
+        elif ch == "}" and state in ("key", "literal", "next"):
+            # Closed without the field; later objects are candidates again
+            self._stack = []
+        elif ch in "{[" and state == "value":
+            self._stack.append(ch)
+        elif state in ("value", "literal") and (ch.isalnum() or ch in "+-."):
+            self._state = "literal"
+        else:
+            # Not JSON after all (e.g. a stray brace in prose): restart here
+            self._stack = []
+            if ch == "{":
+                self._open()
+    
+    def _end_string(self) -> bool:
+        """Handle a completed top-level string; True if it is the prompt."""
+        is_key = self._state == "key"
+        self._state = "colon" if is_key else "next"
         try:
-            return json.loads(text)
+            value = json.loads("".join(self._literal))
         except json.JSONDecodeError:
-            pass
+            return False
+        if is_key:
+            self._key = value
+            return False
+        if self._key == self._field and value.strip():
+            self.prompt = value.strip()
+            return True
+        return False
+
+
+class OutputFormatter:
+    """
+    Formats LLM responses into multiple output formats for ComfyUI nodes.
+    """
+    
+    def _extract_json(self, text: str) -> dict[str, Any] | None:
+        """
+        Extract the best JSON object from markdown code blocks or raw text.
         
-        # Try finding JSON-like structure
-        start = text.find("{")
-        end = text.rfind("}") + 1
-        if start >= 0 and end > start:
+        Candidates carrying a prompt key win over other objects; among
+        equals the largest wins.
+        """
+        best: dict[str, Any] | None = None
+        best_rank: tuple[bool, int] | None = None
+        for start, end in scan_json_objects(text):
             try:
-                return json.loads(text[start:end])
+                data = json.loads(text[start:end])
             except json.JSONDecodeError:
-                pass
-        
-        return None
+                continue
+            if not isinstance(data, dict):
+                continue
+            rank = (any(key in data for key in PROMPT_KEYS), end - start)
+            if best_rank is None or rank > best_rank:
+                best, best_rank = data, rank
+        return best
     
     def _to_comma_separated(self, data: dict[str, Any]) -> str:
         """Convert structured data to comma-separated string."""
@@ -151,22 +304,41 @@ class OutputFormatter:
         
         return ", ".join(pairs) if pairs else self._to_comma_separated(data)
     
-    def format(self, raw_response: str) -> FormattedOutput:
+    def format(self, raw_response: str, model_target: str | None = None) -> FormattedOutput:
         """
         Format raw LLM response into multiple output formats.
         
         Args:
             raw_response: Raw text from LLM
+            model_target: Apply this model's adjustments (none if omitted)
             
         Returns:
             FormattedOutput with all format variants
         """
-        # Try to extract structured JSON
-        data = self._extract_json(raw_response)
-        
+        with trace_span("format", chars=len(raw_response)):
+            # Try to extract structured JSON (the only parse of the response)
+            data = self._extract_json(raw_response)
+            return self._format_data(raw_response, data, model_target)
+    
+    def _apply_model(self, data: dict[str, Any], model_target: str | None) -> dict[str, Any]:
+        """Model-specific view of the parsed data for the JSON output."""
+        if model_target == "z-image-turbo" and "negative_prompt" in data:
+            # Z-Image Turbo: Remove negative prompt, emphasize tech specs
+            return {k: v for k, v in data.items() if k != "negative_prompt"}
+        # SDXL: Keep negative prompt; weight syntax like (word:1.5) is
+        # already expected in the prompt
+        return data
+    
+    def _format_data(
+        self,
+        raw_response: str,
+        data: dict[str, Any] | None,
+        model_target: str | None,
+    ) -> FormattedOutput:
+        """Build all output formats from already-parsed data."""
         if data:
             prompt_english = self._to_comma_separated(data)
-            prompt_json = json.dumps(data, ensure_ascii=False, indent=2)
+            prompt_json = json.dumps(self._apply_model(data, model_target), ensure_ascii=False, indent=2)
             prompt_bilingual = self._to_bilingual(data)
         else:
             # Plain text fallback
@@ -202,21 +374,7 @@ class OutputFormatter:
         Returns:
             FormattedOutput optimized for the target model
         """
-        output = self.format(raw_response)
-        
-        if model_target == "z-image-turbo":
-            # Z-Image Turbo: Remove negative prompt, emphasize tech specs
-            data = self._extract_json(raw_response)
-            if data and "negative_prompt" in data:
-                del data["negative_prompt"]
-                output.prompt_json = json.dumps(data, ensure_ascii=False, indent=2)
-        
-        elif model_target == "sdxl":
-            # SDXL: Keep negative prompt, add weight syntax if not present
-            # Weight syntax like (word:1.5) is already expected in the prompt
-            pass
-        
-        return output
+        return self.format(raw_response, model_target)
 
 
 # Global singleton instance
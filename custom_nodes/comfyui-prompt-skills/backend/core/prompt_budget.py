@@ -0,0 +1,278 @@
+"""
+Tier 3: PromptBudget - Token-Budgeted Prompt Assembly
+
+Assembles the system prompt from named sections, estimates their size in
+tokens offline and keeps the total under a configurable budget. When the
+budget is exceeded, sections are reduced deterministically, lowest priority
+first:
+
+1. Compact markdown: long tables are cut to a few rows and example /
+   reference subsections are removed.
+2. Drop optional sections entirely.
+3. Truncate the remaining compactable sections at a line boundary.
+
+A stable prefix can be assembled once and extended per request with an
+optional section that is kept only if it fits the remaining budget.
+
+Configuration via environment variables:
+    COMFYUI_PROMPT_SKILLS_PROMPT_TOKEN_BUDGET  (default 8000, 0 disables)
+"""
+
+from __future__ import annotations
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any
+
+
+_CJK_RE = re.compile(r"[　-〿㐀-䶿一-鿿＀-￯]")
+_HEADING_RE = re.compile(r"^(#{2,6})\s+(.*)$")
+
+# Subsections under these headings are the first to go when over budget
+LOW_PRIORITY_HEADINGS = ("示例", "例子", "范例", "案例", "参考", "常见错误", "example", "reference")
+
+TRUNCATION_MARKER = "…(内容因长度限制已省略)"
+
+
+@lru_cache(maxsize=512)
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the token count of text without a tokenizer.
+
+    CJK characters count as one token each; other text as one token per
+    four non-space characters, which is close for English and markup.
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    other = len(text) - cjk - text.count(" ") - text.count("\n")
+    return cjk + math.ceil(max(other, 0) / 4)
+
+
+def compact_markdown(text: str, max_table_rows: int = 6) -> str:
+    """Remove example/reference subsections and shorten long tables."""
+    out: list[str] = []
+    skip_level: int | None = None
+    table_rows = 0
+    for line in text.split("\n"):
+        heading = _HEADING_RE.match(line)
+        if heading:
+            level = len(heading.group(1))
+            if skip_level is not None and level <= skip_level:
+                skip_level = None
+            title = heading.group(2).lower()
+            if skip_level is None and any(word in title for word in LOW_PRIORITY_HEADINGS):
+                skip_level = level
+        if skip_level is not None:
+            continue
+
+        if line.lstrip().startswith("|"):
+            table_rows += 1
+            # Header and separator rows plus max_table_rows data rows
+            if table_rows == max_table_rows + 3:
+                out.append("| … |")
+            if table_rows > max_table_rows + 2:
+                continue
+        else:
+            table_rows = 0
+        out.append(line)
+    return "\n".join(out)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep whole lines from the start of text within max_tokens."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # Reserve room for the marker and a closing code fence
+    budget = max_tokens - estimate_tokens(TRUNCATION_MARKER) - estimate_tokens("```") - 2
+    kept: list[str] = []
+    used = 0
+    for line in text.split("\n"):
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    if sum(1 for line in kept if line.lstrip().startswith("```")) % 2:
+        # Do not leave a code fence open
+        kept.append("```")
+    kept.append(TRUNCATION_MARKER)
+    return "\n".join(kept)
+
+
+@dataclass
+class PromptSection:
+    """A named part of the system prompt."""
+
+    name: str
+    text: str
+    # Higher priority sections are reduced last
+    priority: int = 50
+    # Required sections are never dropped
+    required: bool = False
+    # Compactable sections may be shortened
+    compactable: bool = False
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+@dataclass
+class AssembledPrompt:
+    """Result of prompt assembly with per-section accounting."""
+
+    text: str
+    total_tokens: int
+    budget: int
+    sections: list[dict[str, Any]] = field(default_factory=list)
+    # Final text of each kept section by name, in prompt order
+    parts: dict[str, str] = field(default_factory=dict, repr=False)
+
+    @property
+    def reduced(self) -> bool:
+        return any(section["action"] != "kept" for section in self.sections)
+
+    def summary(self) -> str:
+        """One-line size report for the debug channel."""
+        parts = []
+        for section in self.sections:
+            entry = f"{section['name']}={section['tokens']}t"
+            if section["action"] != "kept":
+                entry += f" ({section['action']} from {section['original_tokens']}t)"
+            parts.append(entry)
+        limit = self.budget if self.budget > 0 else "∞"
+        return f"{', '.join(parts)}; total={self.total_tokens}t / budget={limit}"
+
+
+class PromptAssembler:
+    """Join prompt sections while enforcing a token budget."""
+
+    def __init__(
+        self,
+        budget: int | None = None,
+        max_table_rows: int = 6,
+        separator: str = "\n\n",
+    ) -> None:
+        if budget is None:
+            budget = int(os.environ.get("COMFYUI_PROMPT_SKILLS_PROMPT_TOKEN_BUDGET", 8000))
+        self._budget = budget
+        self._max_table_rows = max_table_rows
+        self._separator = separator
+
+    @property
+    def budget(self) -> int:
+        return self._budget
+
+    def assemble(self, sections: list[PromptSection]) -> AssembledPrompt:
+        """Join non-empty sections, reducing them until the budget is met."""
+        sections = [s for s in sections if s.text]
+        texts = {i: s.text for i, s in enumerate(sections)}
+        actions = {i: "kept" for i in texts}
+        separator_tokens = estimate_tokens(self._separator.strip())
+
+        def total() -> int:
+            return sum(estimate_tokens(text) for text in texts.values()) + separator_tokens * max(len(texts) - 1, 0)
+
+        # Lowest priority first; among equals, later sections first
+        order = sorted(range(len(sections)), key=lambda i: (sections[i].priority, -i))
+
+        if self._budget > 0 and total() > self._budget:
+            for i in order:
+                if total() <= self._budget:
+                    break
+                if sections[i].compactable:
+                    compacted = compact_markdown(texts[i], self._max_table_rows)
+                    if compacted != texts[i]:
+                        texts[i] = compacted
+                        actions[i] = "compacted"
+
+            for i in order:
+                if total() <= self._budget:
+                    break
+                if not sections[i].required:
+                    del texts[i]
+                    actions[i] = "dropped"
+
+            for i in order:
+                over = total() - self._budget
+                if over <= 0:
+                    break
+                if i in texts and sections[i].compactable:
+                    allowed = max(estimate_tokens(texts[i]) - over, 0)
+                    texts[i] = truncate_to_tokens(texts[i], allowed)
+                    actions[i] = "truncated"
+
+        report = [
+            {
+                "name": section.name,
+                "tokens": estimate_tokens(texts[i]) if i in texts else 0,
+                "original_tokens": section.tokens,
+                "action": actions[i],
+            }
+            for i, section in enumerate(sections)
+        ]
+        text = self._separator.join(texts[i] for i in sorted(texts))
+        return AssembledPrompt(
+            text=text,
+            total_tokens=total(),
+            budget=self._budget,
+            sections=report,
+            parts={sections[i].name: texts[i] for i in sorted(texts)},
+        )
+
+    def extend(
+        self,
+        base: AssembledPrompt,
+        section: PromptSection,
+        before: str | None = None,
+    ) -> AssembledPrompt:
+        """
+        Add an optional section to an assembled prompt if it still fits.
+
+        ``base`` is left untouched, so a stable prefix can be assembled once
+        and extended per request. The section goes before the part named
+        ``before`` (at the end if there is none) or is reported as dropped.
+        """
+        if not section.text:
+            return base
+        separator_tokens = estimate_tokens(self._separator.strip())
+        total = base.total_tokens + section.tokens + (separator_tokens if base.parts else 0)
+        fits = self._budget <= 0 or total <= self._budget
+
+        names = list(base.parts)
+        position = names.index(before) if before in base.parts else len(names)
+        parts = dict(base.parts)
+        if fits:
+            items = list(base.parts.items())
+            parts = dict(items[:position] + [(section.name, section.text)] + items[position:])
+
+        report = list(base.sections)
+        index = next((i for i, s in enumerate(report) if s["name"] == before), len(report))
+        report.insert(index, {
+            "name": section.name,
+            "tokens": section.tokens if fits else 0,
+            "original_tokens": section.tokens,
+            "action": "kept" if fits else "dropped",
+        })
+        return AssembledPrompt(
+            text=self._separator.join(parts.values()),
+            total_tokens=total if fits else base.total_tokens,
+            budget=self._budget,
+            sections=report,
+            parts=parts,
+        )
+
+
+# Global singleton instance
+_prompt_assembler: PromptAssembler | None = None
+
+
+def get_prompt_assembler() -> PromptAssembler:
+    """Get the global PromptAssembler instance."""
+    global _prompt_assembler
+    if _prompt_assembler is None:
+        _prompt_assembler = PromptAssembler()
+    return _prompt_assembler
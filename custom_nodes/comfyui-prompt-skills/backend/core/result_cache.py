@@ -0,0 +1,279 @@
+"""
+Tier 3: ResultCache - Cross-Session Generation Result Cache
+
+Caches formatted generation outputs so that repeated requests with the
+same skills skip the LLM round trip. Entries are keyed by the normalized
+request text, the compiled skill prompt fingerprint, the model target and
+the library styles matched for the request. Only context-free requests
+(the first turn of a conversation) are cached.
+
+- Memory tier: bounded LRU of recent results.
+- Disk tier (optional): SQLite table that survives restarts; memory misses
+  fall through to it and hits are promoted back into memory. Disk I/O
+  runs under its own lock, so memory hits never wait for it; callers on
+  the event loop store results with ``asyncio.to_thread``. The table is
+  trimmed to its newest entries only once it grows past the cap.
+
+The cache is opt-in because identical requests then always return the
+same prompt instead of a fresh variation.
+
+Configuration via environment variables:
+    COMFYUI_PROMPT_SKILLS_RESULT_CACHE            1 enables the cache (default off)
+    COMFYUI_PROMPT_SKILLS_RESULT_CACHE_SIZE       memory entries (default 256)
+    COMFYUI_PROMPT_SKILLS_RESULT_CACHE_TTL        seconds, 0 = no expiry (default 604800)
+    COMFYUI_PROMPT_SKILLS_RESULT_CACHE_DB         disk tier path (default none)
+    COMFYUI_PROMPT_SKILLS_RESULT_CACHE_DISK_SIZE  disk entries (default 4096)
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .debug_logger import debug_log
+
+
+_SPACE_RE = re.compile(r"\s+")
+_SEPARATOR_RE = re.compile(r"\s*([,;、])\s*")
+_TRAILING_PUNCTUATION = ".。!！?？,;、~～ "
+
+
+def normalize_request(text: str) -> str:
+    """
+    Normalize request text so trivially different requests share a key.
+
+    Full-width characters are folded (NFKC), case and whitespace are
+    normalized and trailing punctuation is ignored.
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = _SPACE_RE.sub(" ", text).strip()
+    text = _SEPARATOR_RE.sub(r"\1 ", text)
+    return text.rstrip(_TRAILING_PUNCTUATION)
+
+
+def make_cache_key(request: str, prompt_fingerprint: str, model_target: str, styles: str = "") -> str:
+    """Build the cache key for a request under a compiled skill prompt and matched styles."""
+    material = "\0".join((normalize_request(request), prompt_fingerprint, model_target, styles))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ResultCacheConfig:
+    """Settings for the generation result cache."""
+
+    enabled: bool = False
+    max_entries: int = 256
+    ttl: float = 7 * 86400
+    disk_path: str = ""
+    max_disk_entries: int = 4096
+
+    @classmethod
+    def from_env(cls) -> ResultCacheConfig:
+        return cls(
+            enabled=os.environ.get("COMFYUI_PROMPT_SKILLS_RESULT_CACHE", "0") == "1",
+            max_entries=int(os.environ.get("COMFYUI_PROMPT_SKILLS_RESULT_CACHE_SIZE", 256)),
+            ttl=float(os.environ.get("COMFYUI_PROMPT_SKILLS_RESULT_CACHE_TTL", 7 * 86400)),
+            disk_path=os.environ.get("COMFYUI_PROMPT_SKILLS_RESULT_CACHE_DB", ""),
+            max_disk_entries=int(
+                os.environ.get("COMFYUI_PROMPT_SKILLS_RESULT_CACHE_DISK_SIZE", 4096)
+            ),
+        )
+
+
+class ResultCache:
+    """LRU cache of formatted outputs with an optional SQLite tier."""
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            key TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    """
+
+    _INDEX = "CREATE INDEX IF NOT EXISTS results_created_at ON results (created_at)"
+
+    def __init__(self, config: ResultCacheConfig | None = None) -> None:
+        self._config = config or ResultCacheConfig.from_env()
+        # key -> (created_at, output)
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+        # Guards the connection and the row count; never taken inside _lock
+        self._disk_lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        # Upper bound on disk rows (replaced keys count twice until the next trim)
+        self._disk_rows = 0
+        self._metrics = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+        }
+        if self._config.enabled and self._config.disk_path:
+            self._open_disk(Path(self._config.disk_path))
+
+    def _open_disk(self, path: Path) -> None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(path), timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(self._SCHEMA)
+            conn.execute(self._INDEX)
+            conn.commit()
+            self._disk_rows = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        except (OSError, sqlite3.Error) as e:
+            debug_log("ResultCache", f"Cannot open {path}, disk tier disabled: {e}", level="ERROR")
+            return
+        self._conn = conn
+
+    @property
+    def enabled(self) -> bool:
+        return self._config.enabled
+
+    @property
+    def config(self) -> ResultCacheConfig:
+        return self._config
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self._config.ttl > 0 and now - created_at > self._config.ttl
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """Return a copy of the cached output for key, or None."""
+        if not self._config.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._entries.move_to_end(key)
+                    self._metrics["hits"] += 1
+                    return dict(entry[1])
+                del self._entries[key]
+
+        entry = self._load_disk(key)
+        with self._lock:
+            if entry is None or self._expired(entry[0], now):
+                self._metrics["misses"] += 1
+                return None
+            self._metrics["hits"] += 1
+            self._metrics["disk_hits"] += 1
+            self._insert_locked(key, entry)
+            return dict(entry[1])
+
+    def put(self, key: str, output: dict[str, Any]) -> None:
+        """Store a formatted output under key (blocks on the disk tier if enabled)."""
+        if not self._config.enabled:
+            return
+        entry = (time.time(), dict(output))
+        with self._lock:
+            self._insert_locked(key, entry)
+            self._metrics["stores"] += 1
+        self._store_disk(key, entry)
+
+    def _insert_locked(self, key: str, entry: tuple[float, dict[str, Any]]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._config.max_entries:
+            self._entries.popitem(last=False)
+            self._metrics["evictions"] += 1
+
+    def _load_disk(self, key: str) -> tuple[float, dict[str, Any]] | None:
+        with self._disk_lock:
+            if self._conn is None:
+                return None
+            try:
+                row = self._conn.execute(
+                    "SELECT created_at, data FROM results WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                debug_log("ResultCache", f"Disk lookup failed: {e}", level="ERROR")
+                return None
+        return (row[0], json.loads(row[1])) if row else None
+
+    def _store_disk(self, key: str, entry: tuple[float, dict[str, Any]]) -> None:
+        data = json.dumps(entry[1], ensure_ascii=False)
+        with self._disk_lock:
+            if self._conn is None:
+                return
+            try:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO results (key, data, created_at) VALUES (?, ?, ?)",
+                        (key, data, entry[0]),
+                    )
+                self._disk_rows += 1
+                if self._disk_rows > self._config.max_disk_entries:
+                    self._trim_disk_locked()
+            except sqlite3.Error as e:
+                debug_log("ResultCache", f"Disk write failed: {e}", level="ERROR")
+
+    def _trim_disk_locked(self) -> None:
+        """Drop the oldest rows beyond the cap (uses the created_at index)."""
+        rows = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        excess = rows - self._config.max_disk_entries
+        if excess > 0:
+            with self._conn:
+                self._conn.execute(
+                    "DELETE FROM results WHERE key IN "
+                    "(SELECT key FROM results ORDER BY created_at LIMIT ?)",
+                    (excess,),
+                )
+            rows -= excess
+        self._disk_rows = rows
+
+    def clear(self) -> None:
+        """Remove all cached results from both tiers."""
+        with self._lock:
+            self._entries.clear()
+        with self._disk_lock:
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM results")
+                self._disk_rows = 0
+
+    def stats(self) -> dict[str, Any]:
+        """Report cache size and hit/miss counters."""
+        disk_entries = 0
+        with self._disk_lock:
+            if self._conn is not None:
+                disk_entries = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        with self._lock:
+            lookups = self._metrics["hits"] + self._metrics["misses"]
+            return {
+                "enabled": self._config.enabled,
+                "entries": len(self._entries),
+                "max_entries": self._config.max_entries,
+                "disk_entries": disk_entries,
+                "hit_rate": self._metrics["hits"] / lookups if lookups else 0.0,
+                **self._metrics,
+            }
+
+    def close(self) -> None:
+        """Close the disk tier."""
+        with self._disk_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Global singleton instance
+_result_cache: ResultCache | None = None
+
+
+def get_result_cache() -> ResultCache:
+    """Get the global ResultCache instance."""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
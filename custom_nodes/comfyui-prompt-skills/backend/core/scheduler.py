@@ -0,0 +1,380 @@
+"""
+Tier 3: GenerationScheduler - Fair Scheduling of Generation Jobs
+
+Replaces the fixed thread pool with per-session queues drained round-robin
+under a global concurrency cap. Jobs are coroutines executed on the shared
+BackgroundLoop, so a waiting generation costs no OS thread.
+
+A running job can borrow further slots under the same cap to fan out
+(batch variants, batch node items); borrowed slots are handed out only
+when no queued job is waiting to start.
+
+Configuration via environment variables:
+    COMFYUI_PROMPT_SKILLS_MAX_CONCURRENT        (default 4)
+    COMFYUI_PROMPT_SKILLS_MAX_QUEUED            (default 64)
+    COMFYUI_PROMPT_SKILLS_MAX_QUEUED_PER_SESSION (default 8)
+"""
+
+from __future__ import annotations
+import asyncio
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from .async_runtime import BackgroundLoop, get_background_loop
+from .debug_logger import debug_log
+
+
+@dataclass
+class SchedulerConfig:
+    """Limits for the generation scheduler."""
+
+    max_concurrent: int = 4
+    max_queued: int = 64
+    max_queued_per_session: int = 8
+
+    @classmethod
+    def from_env(cls) -> SchedulerConfig:
+        return cls(
+            max_concurrent=int(os.environ.get("COMFYUI_PROMPT_SKILLS_MAX_CONCURRENT", 4)),
+            max_queued=int(os.environ.get("COMFYUI_PROMPT_SKILLS_MAX_QUEUED", 64)),
+            max_queued_per_session=int(
+                os.environ.get("COMFYUI_PROMPT_SKILLS_MAX_QUEUED_PER_SESSION", 8)
+            ),
+        )
+
+
+@dataclass
+class GenerationJob:
+    """A queued or running unit of generation work for one session."""
+
+    session_id: str
+    run: Callable[[GenerationJob], Awaitable[None]]
+    id: str = field(default_factory=lambda: f"job_{uuid.uuid4().hex[:12]}")
+    enqueued_at: float = field(default_factory=time.monotonic)
+    started_at: float | None = None
+    finished_at: float | None = None
+    cancelled: bool = False
+    committed: bool = False
+    _task: asyncio.Task | None = field(default=None, repr=False)
+    _state_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def cancel(self) -> bool:
+        """
+        Mark the job cancelled unless its result was already committed.
+
+        Returns True if the job is now cancelled.
+        """
+        with self._state_lock:
+            if self.committed:
+                return False
+            self.cancelled = True
+            return True
+
+    def try_commit(self) -> bool:
+        """
+        Claim the right to publish results.
+
+        Returns False if the job was cancelled; after a successful commit
+        the job can no longer be cancelled, so results are published
+        exactly when no abort won the race.
+        """
+        with self._state_lock:
+            if self.cancelled:
+                return False
+            self.committed = True
+            return True
+
+    @property
+    def queue_wait(self) -> float | None:
+        """Seconds spent queued before starting."""
+        if self.started_at is None:
+            return None
+        return self.started_at - self.enqueued_at
+
+
+# Called with (job, position, queued_total); position 0 means the job started
+QueueListener = Callable[[GenerationJob, int, int], None]
+
+
+class GenerationScheduler:
+    """
+    Round-robin scheduler for generation jobs.
+
+    - One FIFO queue per session; sessions are served in turn so one busy
+      session cannot starve the others.
+    - At most one running job per session (OpenCode sessions are reused
+      across turns and must not receive concurrent prompts).
+    - At most ``max_concurrent`` running jobs plus borrowed slots overall.
+    - Bounded queues: ``submit`` returns None instead of queueing when full.
+    """
+
+    def __init__(
+        self,
+        config: SchedulerConfig | None = None,
+        loop: BackgroundLoop | None = None,
+    ) -> None:
+        self._config = config or SchedulerConfig.from_env()
+        self._loop = loop
+        self._queues: OrderedDict[str, deque[GenerationJob]] = OrderedDict()
+        self._running: dict[str, GenerationJob] = {}
+        # Extra slots held by running jobs, futures waiting for one, and
+        # futures granted a slot that their waiter has not picked up yet
+        self._borrowed = 0
+        self._slot_waiters: deque[asyncio.Future] = deque()
+        self._granted: set[asyncio.Future] = set()
+        self._listener: QueueListener | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def config(self) -> SchedulerConfig:
+        return self._config
+
+    @property
+    def loop(self) -> BackgroundLoop:
+        return self._loop or get_background_loop()
+
+    def set_queue_listener(self, listener: QueueListener | None) -> None:
+        """Register the callback notified of queue position changes."""
+        self._listener = listener
+
+    def _queued_count(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def has_capacity(self, session_id: str) -> bool:
+        """Return True if a job for this session would currently be accepted."""
+        with self._lock:
+            return self._accepts(session_id)
+
+    def _accepts(self, session_id: str) -> bool:
+        if self._queued_count() >= self._config.max_queued:
+            return False
+        session_queue = self._queues.get(session_id)
+        return session_queue is None or len(session_queue) < self._config.max_queued_per_session
+
+    def submit(
+        self,
+        session_id: str,
+        run: Callable[[GenerationJob], Awaitable[None]],
+    ) -> GenerationJob | None:
+        """
+        Queue a job for a session.
+
+        Returns the job, or None if the queue is full (caller reports busy).
+        """
+        with self._lock:
+            if not self._accepts(session_id):
+                debug_log("Scheduler", f"Rejected job for {session_id}: queue full", level="WARNING")
+                return None
+            job = GenerationJob(session_id=session_id, run=run)
+            self._queues.setdefault(session_id, deque()).append(job)
+            started = self._dispatch_locked()
+            updates = self._positions_locked()
+
+        self._notify(started, updates)
+        return job
+
+    def _in_use_locked(self) -> int:
+        return len(self._running) + self._borrowed
+
+    def _dispatch_locked(self) -> list[GenerationJob]:
+        """Start queued jobs round-robin, then lend what is left of the cap."""
+        started = []
+        while self._in_use_locked() < self._config.max_concurrent:
+            job = None
+            for session_id in list(self._queues):
+                if session_id in self._running:
+                    continue
+                queue = self._queues[session_id]
+                job = queue.popleft()
+                if queue:
+                    # Served sessions go to the back of the rotation
+                    self._queues.move_to_end(session_id)
+                else:
+                    del self._queues[session_id]
+                break
+            if job is None:
+                break
+            job.started_at = time.monotonic()
+            self._running[job.session_id] = job
+            started.append(job)
+            self.loop.submit(self._execute(job))
+        # Queued jobs that could start have; spare slots go to borrowers
+        while self._slot_waiters and self._in_use_locked() < self._config.max_concurrent:
+            waiter = self._slot_waiters.popleft()
+            if waiter.done():
+                continue
+            self._borrowed += 1
+            self._granted.add(waiter)
+            waiter.get_loop().call_soon_threadsafe(self._grant, waiter)
+        return started
+
+    @staticmethod
+    def _grant(waiter: asyncio.Future) -> None:
+        if not waiter.done():
+            waiter.set_result(None)
+
+    async def acquire_slot(self) -> None:
+        """
+        Borrow a concurrency slot for extra work of a running job.
+
+        Waits while the cap is reached or queued jobs are ready to start,
+        so fanning out never delays other sessions. Pair with release_slot.
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self._slot_waiters.append(waiter)
+            started = self._dispatch_locked()
+        if started:
+            self._notify(started, self._positions())
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._slot_waiters:
+                    self._slot_waiters.remove(waiter)
+                granted = waiter in self._granted
+                self._granted.discard(waiter)
+            if granted:
+                # Granted as the waiter was cancelled: give the slot back
+                self.release_slot()
+            raise
+        with self._lock:
+            self._granted.discard(waiter)
+
+    def release_slot(self) -> None:
+        """Return a slot taken with acquire_slot."""
+        with self._lock:
+            self._borrowed = max(self._borrowed - 1, 0)
+            started = self._dispatch_locked()
+            updates = self._positions_locked()
+        if started:
+            self._notify(started, updates)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold a borrowed concurrency slot for the duration of the block."""
+        await self.acquire_slot()
+        try:
+            yield
+        finally:
+            self.release_slot()
+
+    def _positions(self) -> list[tuple[GenerationJob, int]]:
+        with self._lock:
+            return self._positions_locked()
+
+    def _dispatch_order_locked(self) -> list[GenerationJob]:
+        """Queued jobs in the order they will be started."""
+        order = []
+        queues = [list(queue) for queue in self._queues.values()]
+        depth = max((len(queue) for queue in queues), default=0)
+        for i in range(depth):
+            for queue in queues:
+                if i < len(queue):
+                    order.append(queue[i])
+        return order
+
+    def _positions_locked(self) -> list[tuple[GenerationJob, int]]:
+        return [(job, index + 1) for index, job in enumerate(self._dispatch_order_locked())]
+
+    def _notify(
+        self,
+        started: list[GenerationJob],
+        updates: list[tuple[GenerationJob, int]],
+    ) -> None:
+        listener = self._listener
+        if listener is None:
+            return
+        total = len(updates)
+        try:
+            for job in started:
+                listener(job, 0, total)
+            for job, position in updates:
+                listener(job, position, total)
+        except Exception as e:
+            debug_log("Scheduler", f"Queue listener failed: {e}", level="WARNING")
+
+    async def _execute(self, job: GenerationJob) -> None:
+        job._task = asyncio.current_task()
+        try:
+            # Cancelled between dispatch and start: never run
+            if not job.cancelled:
+                await job.run(job)
+        except asyncio.CancelledError:
+            debug_log("Scheduler", f"Job {job.id} cancelled")
+        except Exception as e:
+            debug_log("Scheduler", f"Job {job.id} raised: {e}", level="ERROR")
+        finally:
+            job.finished_at = time.monotonic()
+            with self._lock:
+                if self._running.get(job.session_id) is job:
+                    del self._running[job.session_id]
+                if job.session_id in self._queues:
+                    # The session just had its turn; others go first
+                    self._queues.move_to_end(job.session_id)
+                started = self._dispatch_locked()
+                updates = self._positions_locked()
+            self._notify(started, updates)
+
+    def cancel_session(self, session_id: str) -> list[GenerationJob]:
+        """
+        Cancel every queued and running job of a session.
+
+        Queued jobs are dropped; the running job's task is cancelled on the
+        loop, which aborts its in-flight HTTP request. Returns the jobs that
+        were cancelled.
+        """
+        with self._lock:
+            cancelled = [job for job in self._queues.pop(session_id, ()) if job.cancel()]
+            running = self._running.get(session_id)
+            if running is not None and running.cancel():
+                cancelled.append(running)
+                if running._task is not None:
+                    self.loop.call_soon(running._task.cancel)
+            updates = self._positions_locked()
+
+        self._notify([], updates)
+        return cancelled
+
+    def queue_position(self, job_id: str) -> int | None:
+        """1-based position of a queued job, 0 if running, None if unknown."""
+        with self._lock:
+            if any(job.id == job_id for job in self._running.values()):
+                return 0
+            for job, position in self._positions_locked():
+                if job.id == job_id:
+                    return position
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        """Snapshot of scheduler load."""
+        with self._lock:
+            return {
+                "running": len(self._running),
+                "borrowed_slots": self._borrowed,
+                "queued": self._queued_count(),
+                "max_concurrent": self._config.max_concurrent,
+                "max_queued": self._config.max_queued,
+                "max_queued_per_session": self._config.max_queued_per_session,
+                "sessions": {
+                    session_id: len(queue) for session_id, queue in self._queues.items()
+                },
+            }
+
+
+# Global singleton instance
+_generation_scheduler: GenerationScheduler | None = None
+
+
+def get_generation_scheduler() -> GenerationScheduler:
+    """Get the global GenerationScheduler instance."""
+    global _generation_scheduler
+    if _generation_scheduler is None:
+        _generation_scheduler = GenerationScheduler()
+    return _generation_scheduler
@@ -2,15 +2,72 @@
 Tier 3: SessionManager - Global Session State Management
 
 Implements singleton pattern to manage all session states across the application.
-Sessions persist in memory for the lifetime of the ComfyUI process.
+Sessions live in memory and are written through to a SessionStore, so they
+are rehydrated lazily on first access after a ComfyUI restart.
+
+Memory is bounded: idle sessions expire, the least recently used sessions
+are evicted beyond a cap, and per-session history is trimmed by message
+count and size. Evicted sessions stay in a durable store (spill) unless
+spilling is disabled.
+
+Every client-visible change bumps the session's version and is kept in a
+short change log, so clients receive small deltas and can catch up from
+the version they last saw instead of reloading the whole history.
+
+Configuration via environment variables:
+    COMFYUI_PROMPT_SKILLS_MAX_SESSIONS       (default 256)
+    COMFYUI_PROMPT_SKILLS_SESSION_TTL        idle seconds (default 86400, 0 disables)
+    COMFYUI_PROMPT_SKILLS_MAX_HISTORY        messages per session (default 200)
+    COMFYUI_PROMPT_SKILLS_MAX_HISTORY_BYTES  bytes per session (default 524288)
+    COMFYUI_PROMPT_SKILLS_SPILL_EVICTED      1/0 (default 1)
 """
 
 from __future__ import annotations
+import json
+import os
+import time
 import uuid
 import threading
+from collections import OrderedDict, deque
 from typing import Any, Callable
 from dataclasses import dataclass, field
 
+from .session_store import SessionStore, get_session_store
+from .debug_logger import debug_log
+
+
+# Changes kept per session for "changes since version N" catch-up
+CHANGE_LOG_SIZE = 256
+
+# Called with (session_id, change); change carries "version" and "op"
+ChangeListener = Callable[[str, dict[str, Any]], None]
+
+
+def _message_size(message: dict[str, Any]) -> int:
+    """Approximate serialized size of a history message in bytes."""
+    return len(json.dumps(message, ensure_ascii=False).encode("utf-8"))
+
+
+@dataclass
+class SessionLimits:
+    """Memory bounds for SessionManager."""
+    
+    max_sessions: int = 256
+    idle_ttl: float = 86400.0
+    max_history: int = 200
+    max_history_bytes: int = 512 * 1024
+    spill_evicted: bool = True
+    
+    @classmethod
+    def from_env(cls) -> SessionLimits:
+        return cls(
+            max_sessions=int(os.environ.get("COMFYUI_PROMPT_SKILLS_MAX_SESSIONS", 256)),
+            idle_ttl=float(os.environ.get("COMFYUI_PROMPT_SKILLS_SESSION_TTL", 86400)),
+            max_history=int(os.environ.get("COMFYUI_PROMPT_SKILLS_MAX_HISTORY", 200)),
+            max_history_bytes=int(os.environ.get("COMFYUI_PROMPT_SKILLS_MAX_HISTORY_BYTES", 512 * 1024)),
+            spill_evicted=os.environ.get("COMFYUI_PROMPT_SKILLS_SPILL_EVICTED", "1") == "1",
+        )
+
 
 @dataclass
 class Session:
@@ -24,11 +81,23 @@ class Session:
     # OpenCode session ID - persistent across messages
     opencode_session_id: str | None = None
     # Store latest generated output for ComfyUI node
-    last_output: dict[str, str] = field(default_factory=lambda: {
+    # (a batch adds "variants", the list of all formatted outputs)
+    last_output: dict[str, Any] = field(default_factory=lambda: {
         "prompt_english": "",
         "prompt_json": "",
         "prompt_bilingual": "",
     })
+    # Incremented whenever last_output changes content (drives node caching)
+    output_version: int = 0
+    # prompt_english parsed from a reply still streaming; never persisted and
+    # kept out of last_output/output_version until the reply is final
+    provisional_output: str = ""
+    # Incremented on every change that clients see
+    version: int = 0
+    # Bookkeeping for memory bounds and delta sync (not persisted)
+    history_bytes: int = field(default=0, repr=False)
+    last_access: float = field(default_factory=time.monotonic, repr=False)
+    changes: deque = field(default_factory=lambda: deque(maxlen=CHANGE_LOG_SIZE), repr=False)
     
     def to_dict(self) -> dict[str, Any]:
         """Serialize session to dictionary for WebSocket sync."""
@@ -39,7 +108,57 @@ class Session:
             "config": {k: v for k, v in self.config.items() if k != "api_key"},
             "status": self.status,
             "opencode_session_id": self.opencode_session_id,
+            "provisional_output": self.provisional_output,
+            "version": self.version,
+        }
+    
+    def to_record(self) -> dict[str, Any]:
+        """Snapshot the durable state for the session store (no API key, no status)."""
+        return {
+            "id": self.id,
+            "history": list(self.history),
+            "skills": list(self.skills),
+            "config": {k: v for k, v in self.config.items() if k != "api_key"},
+            "opencode_session_id": self.opencode_session_id,
+            "last_output": dict(self.last_output),
+            "output_version": self.output_version,
+            "version": self.version,
         }
+    
+    @classmethod
+    def from_record(cls, record: dict[str, Any]) -> Session:
+        """Rebuild a session from a stored snapshot."""
+        session = cls(
+            id=record["id"],
+            history=list(record.get("history", [])),
+            skills=list(record.get("skills", [])),
+            config=dict(record.get("config", {})),
+            opencode_session_id=record.get("opencode_session_id"),
+            output_version=record.get("output_version", 0),
+            version=record.get("version", 0),
+        )
+        session.last_output.update(record.get("last_output", {}))
+        session.history_bytes = sum(_message_size(m) for m in session.history)
+        return session
+    
+    def record_change(self, op: str, **data: Any) -> dict[str, Any]:
+        """Bump the version and log a change (caller holds the manager lock)."""
+        self.version += 1
+        change = {"version": self.version, "op": op, **data}
+        self.changes.append(change)
+        return change
+    
+    def changes_since(self, version: int) -> list[dict[str, Any]] | None:
+        """Changes after ``version``, or None if a snapshot is needed instead."""
+        if version == self.version:
+            return []
+        if version > self.version or not self.changes or self.changes[0]["version"] > version + 1:
+            return None
+        changes = [change for change in self.changes if change["version"] > version]
+        # A reset carries no data; the client has to reload the session
+        if any(change["op"] == "reset" for change in changes):
+            return None
+        return changes
 
 
 class SessionManager:
@@ -63,14 +182,132 @@ class SessionManager:
     def __init__(self) -> None:
         if self._initialized:
             return
-        self._sessions: dict[str, Session] = {}
+        # Ordered by last access, least recent first
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
         self._listeners: dict[str, list[Callable]] = {}
+        self._store: SessionStore | None = None
+        self._change_listener: ChangeListener | None = None
+        self._limits = SessionLimits.from_env()
+        # Signalled when an output or status changes (see wait_for_output)
+        self._output_changed = threading.Condition(self._lock)
+        self._metrics = {
+            "evicted_lru": 0,
+            "evicted_ttl": 0,
+            "spilled": 0,
+            "dropped": 0,
+            "rehydrated": 0,
+            "history_trimmed": 0,
+        }
         self._initialized = True
     
+    @property
+    def limits(self) -> SessionLimits:
+        return self._limits
+    
+    def set_limits(self, limits: SessionLimits) -> None:
+        """Replace the memory bounds; applied on the next access."""
+        self._limits = limits
+    
+    def set_change_listener(self, listener: ChangeListener | None) -> None:
+        """Register the callback notified of every versioned session change."""
+        self._change_listener = listener
+    
+    def _notify(self, session_id: str, changes: list[dict[str, Any]]) -> None:
+        listener = self._change_listener
+        if listener is None:
+            return
+        for change in changes:
+            try:
+                listener(session_id, change)
+            except Exception as e:
+                debug_log("SessionManager", f"Change listener failed: {e}", level="WARNING")
+    
+    def changes_since(self, session_id: str, version: int) -> list[dict[str, Any]] | None:
+        """
+        Changes of a session after ``version``.
+        
+        Returns None when a full snapshot is needed (unknown session, or the
+        version is older than the change log).
+        """
+        session = self.get_session(session_id)
+        if session is None:
+            return None
+        with self._lock:
+            return session.changes_since(version)
+    
+    @property
+    def store(self) -> SessionStore:
+        """Persistence backend (the global SessionStore unless replaced)."""
+        if self._store is None:
+            self._store = get_session_store()
+        return self._store
+    
+    def set_store(self, store: SessionStore) -> None:
+        """Replace the persistence backend; in-memory sessions are dropped."""
+        with self._lock:
+            self._store = store
+            self._sessions.clear()
+    
+    def _persist(self, session: Session) -> None:
+        """Queue a snapshot of the session for the store."""
+        self.store.save(session.id, session.to_record())
+    
+    def _rehydrate(self, session_id: str) -> Session | None:
+        """Load a session from the store into memory."""
+        record = self.store.load(session_id)
+        if record is None:
+            return None
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = Session.from_record(record)
+                self._sessions[session_id] = session
+                self._metrics["rehydrated"] += 1
+                debug_log("SessionManager", f"Rehydrated session {session_id} ({len(session.history)} messages)")
+            evicted = self._evict_locked(time.monotonic())
+        self._release(evicted)
+        return session
+    
+    def _evict_locked(self, now: float) -> list[tuple[Session, str]]:
+        """Pop expired and over-cap sessions from the LRU end."""
+        limits = self._limits
+        evicted = []
+        # Sessions with a generation in flight are skipped (rotated to the back)
+        for _ in range(len(self._sessions)):
+            session_id, session = next(iter(self._sessions.items()))
+            if limits.idle_ttl > 0 and now - session.last_access > limits.idle_ttl:
+                reason = "ttl"
+            elif len(self._sessions) > limits.max_sessions:
+                reason = "lru"
+            else:
+                break
+            if session.status == "working":
+                self._sessions.move_to_end(session_id)
+                continue
+            del self._sessions[session_id]
+            self._metrics[f"evicted_{reason}"] += 1
+            evicted.append((session, reason))
+        return evicted
+    
+    def _release(self, evicted: list[tuple[Session, str]]) -> None:
+        """Spill evicted sessions to the store, or drop them."""
+        for session, reason in evicted:
+            if self._limits.spill_evicted and self.store.durable:
+                self._metrics["spilled"] += 1
+            else:
+                self.store.delete(session.id)
+                self._metrics["dropped"] += 1
+            debug_log("SessionManager", f"Evicted session {session.id} ({reason})")
+
+    
     def create_session(self, session_id: str | None = None) -> Session:
         """Create a new session with optional custom ID."""
         if session_id is None:
             session_id = f"ses_{uuid.uuid4().hex[:12]}"
+        else:
+            existing = self.get_session(session_id)
+            if existing is not None:
+                return existing
         
         with self._lock:
             if session_id in self._sessions:
@@ -78,11 +315,26 @@ class SessionManager:
             
             session = Session(id=session_id)
             self._sessions[session_id] = session
-            return session
+            evicted = self._evict_locked(time.monotonic())
+        
+        self._persist(session)
+        self._release(evicted)
+        return session
     
     def get_session(self, session_id: str) -> Session | None:
-        """Retrieve a session by ID."""
-        return self._sessions.get(session_id)
+        """Retrieve a session by ID, rehydrating it from the store if needed."""
+        now = time.monotonic()
+        with self._lock:
+            # Sweep first so an expired session is not revived by this access
+            evicted = self._evict_locked(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_access = now
+                self._sessions.move_to_end(session_id)
+        self._release(evicted)
+        if session is None:
+            session = self._rehydrate(session_id)
+        return session
     
     def get_or_create_session(self, session_id: str) -> Session:
         """Get existing session or create new one."""
@@ -103,14 +355,20 @@ class SessionManager:
         if session is None:
             return None
         
+        fields: dict[str, Any] = {}
         with self._lock:
             if api_key is not None:
                 session.config["api_key"] = api_key
             if skills is not None:
                 session.skills = skills
+                fields["skills"] = skills
             if model_target is not None:
                 session.config["model_target"] = model_target
+                fields["config"] = {k: v for k, v in session.config.items() if k != "api_key"}
+            changes = [session.record_change("set", fields=fields)] if fields else []
         
+        self._persist(session)
+        self._notify(session_id, changes)
         return session
     
     def set_opencode_session(self, session_id: str, opencode_session_id: str) -> None:
@@ -119,6 +377,9 @@ class SessionManager:
         if session:
             with self._lock:
                 session.opencode_session_id = opencode_session_id
+                change = session.record_change("set", fields={"opencode_session_id": opencode_session_id})
+            self._persist(session)
+            self._notify(session_id, [change])
     
     def get_opencode_session(self, session_id: str) -> str | None:
         """Get the OpenCode session ID for a session."""
@@ -131,6 +392,27 @@ class SessionManager:
         if session:
             with self._lock:
                 session.opencode_session_id = None
+                change = session.record_change("set", fields={"opencode_session_id": None})
+            self._persist(session)
+            self._notify(session_id, [change])
+    
+    def _trim_history_locked(self, session: Session) -> int:
+        """Drop the oldest messages over the caps, always keeping the newest one."""
+        limits = self._limits
+        history = session.history
+        trim = 0
+        trimmed_bytes = 0
+        while len(history) - trim > 1 and (
+            len(history) - trim > limits.max_history
+            or session.history_bytes - trimmed_bytes > limits.max_history_bytes
+        ):
+            trimmed_bytes += _message_size(history[trim])
+            trim += 1
+        if trim:
+            del history[:trim]
+            session.history_bytes -= trimmed_bytes
+            self._metrics["history_trimmed"] += trim
+        return trim
     
     def add_message(
         self, 
@@ -138,11 +420,11 @@ class SessionManager:
         role: str, 
         content: str,
         metadata: dict[str, Any] | None = None,
-    ) -> None:
-        """Add a message to session history."""
+    ) -> dict[str, Any] | None:
+        """Add a message to session history. Returns the stored message."""
         session = self.get_session(session_id)
         if session is None:
-            return
+            return None
         
         message = {
             "role": role,
@@ -151,8 +433,45 @@ class SessionManager:
         if metadata:
             message["metadata"] = metadata
         
+        size = _message_size(message)
         with self._lock:
             session.history.append(message)
+            session.history_bytes += size
+            changes = [session.record_change("append", message=message)]
+            trim = self._trim_history_locked(session)
+            if trim:
+                changes.append(session.record_change("trim", count=trim))
+        self._persist(session)
+        self._notify(session_id, changes)
+        return message
+    
+    def replace_history(
+        self,
+        session_id: str,
+        history: list[dict[str, Any]],
+        last_output: dict[str, str] | None = None,
+    ) -> Session | None:
+        """Replace the whole history (new or switched OpenCode session)."""
+        session = self.get_session(session_id)
+        if session is None:
+            return None
+        
+        with self._lock:
+            session.history = list(history)
+            session.history_bytes = sum(_message_size(m) for m in session.history)
+            self._trim_history_locked(session)
+            self._set_output_locked(session, {
+                "prompt_english": "",
+                "prompt_json": "",
+                "prompt_bilingual": "",
+                **(last_output or {}),
+            })
+            # Only a marker: a copy of the history would make the change log
+            # outgrow the per-session byte cap
+            change = session.record_change("reset")
+        self._persist(session)
+        self._notify(session_id, [change])
+        return session
     
     def set_status(self, session_id: str, status: str) -> None:
         """Update session status (idle, working, error)."""
@@ -160,6 +479,21 @@ class SessionManager:
         if session:
             with self._lock:
                 session.status = status
+                self._output_changed.notify_all()
+    
+    def stats(self) -> dict[str, Any]:
+        """Snapshot of memory usage and eviction counters."""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "history_messages": sum(len(s.history) for s in self._sessions.values()),
+                "history_bytes": sum(s.history_bytes for s in self._sessions.values()),
+                "max_sessions": self._limits.max_sessions,
+                "idle_ttl": self._limits.idle_ttl,
+                "max_history": self._limits.max_history,
+                "max_history_bytes": self._limits.max_history_bytes,
+                **self._metrics,
+            }
     
     def list_sessions(self) -> list[str]:
         """List all active session IDs."""
@@ -168,15 +502,17 @@ class SessionManager:
     def delete_session(self, session_id: str) -> bool:
         """Delete a session and release resources."""
         with self._lock:
-            if session_id in self._sessions:
-                del self._sessions[session_id]
-                return True
-        return False
+            deleted = self._sessions.pop(session_id, None) is not None
+        if not deleted and self.store.load(session_id) is not None:
+            deleted = True
+        self.store.delete(session_id)
+        return deleted
     
     def clear_all(self) -> None:
         """Clear all sessions (for testing purposes)."""
         with self._lock:
             self._sessions.clear()
+        self.store.clear()
     
     def set_output(
         self,
@@ -184,18 +520,48 @@ class SessionManager:
         prompt_english: str,
         prompt_json: str,
         prompt_bilingual: str,
+        variants: list[dict[str, str]] | None = None,
     ) -> None:
-        """Store generated output for ComfyUI node to retrieve."""
+        """
+        Store generated output for ComfyUI node to retrieve.
+        
+        For a batch, the first variant fills the prompt fields and
+        ``variants`` keeps every variant in order.
+        """
+        session = self.get_session(session_id)
+        if session:
+            output: dict[str, Any] = {
+                "prompt_english": prompt_english,
+                "prompt_json": prompt_json,
+                "prompt_bilingual": prompt_bilingual,
+            }
+            if variants is not None:
+                output["variants"] = [dict(v) for v in variants]
+            with self._lock:
+                self._set_output_locked(session, output)
+            self._persist(session)
+    
+    def _set_output_locked(self, session: Session, output: dict[str, Any]) -> None:
+        """Replace last_output, bumping output_version only if the content changed."""
+        if output != session.last_output:
+            session.output_version += 1
+            self._output_changed.notify_all()
+        session.last_output = output
+        session.provisional_output = ""
+    
+    def set_provisional_output(self, session_id: str, prompt_english: str) -> None:
+        """
+        Record the prompt parsed so far from a streaming reply ("" clears it).
+        
+        Unlike set_output this neither bumps output_version nor persists,
+        so an aborted or failed generation leaves the last output intact.
+        """
         session = self.get_session(session_id)
         if session:
             with self._lock:
-                session.last_output = {
-                    "prompt_english": prompt_english,
-                    "prompt_json": prompt_json,
-                    "prompt_bilingual": prompt_bilingual,
-                }
+                session.provisional_output = prompt_english
     
-    def get_output(self, session_id: str) -> dict[str, str]:
+    def get_output(self, session_id: str) -> dict[str, Any]:
         """
         Get the latest generated output for a session.
         Returns immediately with current output (no waiting).
@@ -208,6 +574,65 @@ class SessionManager:
             "prompt_json": "",
             "prompt_bilingual": "",
         }
+    
+    def get_output_version(self, session_id: str) -> int:
+        """
+        Get the output version of a session (0 if unknown).
+        
+        The version only changes when a different output is stored, so it
+        can serve as a cache key for the ComfyUI node.
+        """
+        session = self.get_session(session_id)
+        return session.output_version if session else 0
+    
+    def wait_for_output(
+        self,
+        session_id: str,
+        since_version: int | None = None,
+        timeout: float | None = None,
+        settled: bool = True,
+    ) -> dict[str, Any] | None:
+        """
+        Block until the session has an output newer than ``since_version``.
+        
+        Args:
+            session_id: Session to watch
+            since_version: Output version the caller already has; None
+                waits for the next output
+            timeout: Seconds to wait at most (None waits indefinitely)
+            settled: Also wait for the generation to finish before
+                returning a new output
+            
+        Returns:
+            {"output", "output_version", "status", "changed"}; ``changed``
+            is False on timeout or when a generation ended without a new
+            output. None if the session does not exist.
+        """
+        session = self.get_session(session_id)
+        if session is None:
+            return None
+        
+        with self._output_changed:
+            if since_version is None:
+                since_version = session.output_version
+            was_working = session.status == "working"
+            
+            def has_new_output() -> bool:
+                if session.output_version <= since_version:
+                    return False
+                return not (settled and session.status == "working")
+            
+            def finished() -> bool:
+                # A generation that ended (or failed) without a new output
+                return was_working and session.status != "working"
+            
+            self._output_changed.wait_for(lambda: has_new_output() or finished(), timeout)
+            return {
+                "output": dict(session.last_output),
+                "output_version": session.output_version,
+                "status": session.status,
+                "changed": has_new_output(),
+            }
 
 
 # Global singleton instance
@@ -0,0 +1,304 @@
+"""
+Tier 3: SessionStore - Durable Session Persistence
+
+Pluggable persistence backends for SessionManager so session history, the
+OpenCode session mapping and the last generated output survive a ComfyUI
+restart.
+
+- SQLiteSessionStore (default): SQLite in WAL mode. Writes are coalesced
+  per session and committed in batches by a background writer thread, so
+  the request path only records a snapshot in memory.
+- MemorySessionStore: process-local, used for tests and when persistence
+  is disabled.
+
+Configuration via environment variables:
+    COMFYUI_PROMPT_SKILLS_SESSION_STORE  sqlite | memory (default sqlite,
+                                         memory when COMFYUI_PROMPT_SKILLS_TESTING=1)
+    COMFYUI_PROMPT_SKILLS_SESSION_DB     database path (default data/sessions.db)
+    COMFYUI_PROMPT_SKILLS_SESSION_FLUSH_INTERVAL  seconds between batches (default 0.2)
+"""
+
+from __future__ import annotations
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any
+
+from .debug_logger import debug_log
+
+
+class SessionStore(ABC):
+    """Interface for session persistence backends."""
+
+    # Whether stored sessions survive a restart (evicted sessions can spill here)
+    durable = False
+
+    @abstractmethod
+    def load(self, session_id: str) -> dict[str, Any] | None:
+        """Return the stored record for a session, or None."""
+
+    @abstractmethod
+    def save(self, session_id: str, record: dict[str, Any]) -> None:
+        """Store a session snapshot (may be written asynchronously)."""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Remove a stored session."""
+
+    @abstractmethod
+    def list_ids(self) -> list[str]:
+        """List the IDs of all stored sessions."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every stored session."""
+
+    def flush(self, timeout: float | None = 5.0) -> bool:
+        """Block until pending writes are durable. Returns False on timeout."""
+        return True
+
+    def close(self) -> None:
+        """Flush and release resources."""
+
+
+class MemorySessionStore(SessionStore):
+    """Process-local store (no durability)."""
+
+    def __init__(self) -> None:
+        self._records: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            return self._records.get(session_id)
+
+    def save(self, session_id: str, record: dict[str, Any]) -> None:
+        with self._lock:
+            self._records[session_id] = record
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._records.pop(session_id, None)
+
+    def list_ids(self) -> list[str]:
+        with self._lock:
+            return list(self._records)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite (WAL) session store with batched background writes.
+
+    ``save`` and ``delete`` only record the latest snapshot (or a deletion)
+    per session; the writer thread serializes and commits all pending
+    changes in one transaction every ``flush_interval`` seconds. Reads see
+    pending changes before they reach the database.
+    """
+
+    durable = True
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """
+
+    def __init__(self, path: Path | str, flush_interval: float = 0.2) -> None:
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._flush_interval = flush_interval
+        # session_id -> record, or None for a pending delete
+        self._pending: dict[str, dict[str, Any] | None] = {}
+        # Batch currently being committed (still visible to readers)
+        self._inflight: dict[str, dict[str, Any] | None] = {}
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._closed = False
+
+        self._read_lock = threading.Lock()
+        self._read_conn = self._connect()
+        self._read_conn.execute(self._SCHEMA)
+        self._read_conn.commit()
+
+        self._writer = threading.Thread(
+            target=self._run, name="session-store-writer", daemon=True
+        )
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self._path), timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def load(self, session_id: str) -> dict[str, Any] | None:
+        with self._cond:
+            for overlay in (self._pending, self._inflight):
+                if session_id in overlay:
+                    return overlay[session_id]
+        try:
+            with self._read_lock:
+                row = self._read_conn.execute(
+                    "SELECT data FROM sessions WHERE id = ?", (session_id,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            debug_log("SessionStore", f"Failed to load {session_id}: {e}", level="ERROR")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def save(self, session_id: str, record: dict[str, Any]) -> None:
+        with self._cond:
+            self._pending[session_id] = record
+            self._cond.notify()
+
+    def delete(self, session_id: str) -> None:
+        with self._cond:
+            self._pending[session_id] = None
+            self._cond.notify()
+
+    def list_ids(self) -> list[str]:
+        with self._read_lock:
+            ids = {row[0] for row in self._read_conn.execute("SELECT id FROM sessions")}
+        with self._cond:
+            for overlay in (self._inflight, self._pending):
+                for session_id, record in overlay.items():
+                    if record is None:
+                        ids.discard(session_id)
+                    else:
+                        ids.add(session_id)
+        return sorted(ids)
+
+    def clear(self) -> None:
+        self.flush()
+        with self._cond:
+            self._pending.clear()
+        with self._read_lock:
+            self._read_conn.execute("DELETE FROM sessions")
+            self._read_conn.commit()
+
+    def flush(self, timeout: float | None = 5.0) -> bool:
+        self._wake.set()
+        with self._cond:
+            self._cond.notify_all()
+            return self._cond.wait_for(
+                lambda: not self._pending and not self._inflight, timeout
+            )
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._wake.set()
+        self._writer.join(timeout=5)
+        with self._read_lock:
+            self._read_conn.close()
+
+    def _run(self) -> None:
+        conn = self._connect()
+        try:
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._pending or self._closed)
+                    if self._closed and not self._pending:
+                        return
+                # Let more changes accumulate into this batch
+                self._wake.wait(self._flush_interval)
+                self._wake.clear()
+                with self._cond:
+                    self._inflight, self._pending = self._pending, {}
+                    batch = self._inflight
+                try:
+                    self._write_batch(conn, batch)
+                except sqlite3.OperationalError as e:
+                    # Locked or busy database: transient, so retry the batch
+                    debug_log("SessionStore", f"Batch write failed, retrying: {e}", level="ERROR")
+                    with self._cond:
+                        # Keep the data; newer snapshots take precedence
+                        for session_id, record in batch.items():
+                            self._pending.setdefault(session_id, record)
+                    time.sleep(self._flush_interval)
+                except sqlite3.Error as e:
+                    debug_log("SessionStore", f"Batch write failed, dropping {len(batch)} change(s): {e}", level="ERROR")
+                finally:
+                    with self._cond:
+                        self._inflight = {}
+                        self._cond.notify_all()
+        finally:
+            conn.close()
+
+    def _write_batch(
+        self,
+        conn: sqlite3.Connection,
+        batch: dict[str, dict[str, Any] | None],
+    ) -> None:
+        now = time.time()
+        upserts = []
+        for session_id, record in batch.items():
+            if record is None:
+                continue
+            try:
+                upserts.append((session_id, json.dumps(record, ensure_ascii=False), now))
+            except (TypeError, ValueError) as e:
+                # Retrying cannot fix it; skip the record, not the whole batch
+                debug_log("SessionStore", f"Cannot serialize {session_id}, not saved: {e}", level="ERROR")
+        deletes = [(session_id,) for session_id, record in batch.items() if record is None]
+        with conn:
+            if upserts:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO sessions (id, data, updated_at) VALUES (?, ?, ?)",
+                    upserts,
+                )
+            if deletes:
+                conn.executemany("DELETE FROM sessions WHERE id = ?", deletes)
+        debug_log("SessionStore", f"Committed {len(upserts)} session(s), deleted {len(deletes)}")
+
+
+def create_session_store() -> SessionStore:
+    """Create the session store selected by environment variables."""
+    testing = os.environ.get("COMFYUI_PROMPT_SKILLS_TESTING") == "1"
+    backend = os.environ.get(
+        "COMFYUI_PROMPT_SKILLS_SESSION_STORE", "memory" if testing else "sqlite"
+    )
+    if backend == "memory":
+        return MemorySessionStore()
+
+    default_path = Path(__file__).parent.parent.parent / "data" / "sessions.db"
+    path = os.environ.get("COMFYUI_PROMPT_SKILLS_SESSION_DB", str(default_path))
+    flush_interval = float(os.environ.get("COMFYUI_PROMPT_SKILLS_SESSION_FLUSH_INTERVAL", 0.2))
+    try:
+        return SQLiteSessionStore(path, flush_interval=flush_interval)
+    except (OSError, sqlite3.Error) as e:
+        debug_log("SessionStore", f"Cannot open {path}, sessions will not persist: {e}", level="ERROR")
+        return MemorySessionStore()
+
+
+# Global singleton instance
+_session_store: SessionStore | None = None
+
+
+def get_session_store() -> SessionStore:
+    """Get the global SessionStore instance."""
+    global _session_store
+    if _session_store is None:
+        _session_store = create_session_store()
+    return _session_store
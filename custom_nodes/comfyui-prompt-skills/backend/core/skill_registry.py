@@ -2,14 +2,36 @@
 Tier 3: SkillRegistry - Dynamic Skill Loading and Management
 
 Manages skill discovery, loading, and execution for multi-role prompt generation.
+
+Skills are held in an in-memory index that is refreshed incrementally from
+file modification times, so listing costs no filesystem work and edits to
+SKILL.md files are picked up without restarting ComfyUI.
+
+Combined system prompts are memoized per skill combination and keyed by each
+skill's content hash, and carry a fingerprint that identifies the exact text.
+
+Configuration via environment variables:
+    COMFYUI_PROMPT_SKILLS_SKILL_RELOAD_INTERVAL  seconds between mtime checks
+                                                 (default 2.0, 0 checks on every call)
 """
 
 from __future__ import annotations
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
 from dataclasses import dataclass, field
 from typing import Any
 
+from .debug_logger import debug_log
+from .tracing import trace_span
+
+
+# Placed between skill blocks in the combined prompt
+SKILL_SEPARATOR = "\n\n---\n\n"
+
 
 @dataclass
 class Skill:
@@ -21,6 +43,23 @@ class Skill:
     description: str
     content: str
     file_path: Path
+    style_categories: list[str] = field(default_factory=list)
+    # (mtime_ns, size) of the file this was parsed from
+    file_stamp: tuple[int, int] = (0, 0)
+    # Hash of everything that goes into the prompt
+    content_hash: str = ""
+    
+    def __post_init__(self) -> None:
+        if not self.content_hash:
+            digest = hashlib.sha256(
+                "\0".join((self.name, self.name_zh, self.content)).encode("utf-8")
+            )
+            self.content_hash = digest.hexdigest()[:16]
+    
+    @property
+    def prompt_block(self) -> str:
+        """This skill's part of the combined system prompt."""
+        return f"## Skill: {self.name} ({self.name_zh})\n\n{self.content}"
     
     def to_dict(self) -> dict[str, Any]:
         """Serialize skill metadata (without content)."""
@@ -32,22 +71,62 @@ class Skill:
         }
 
 
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """A combined system prompt for an ordered set of skills."""
+    
+    text: str
+    # Stable hash of the text, for result caches and provider prefix caches
+    fingerprint: str
+    skill_ids: tuple[str, ...]
+
+
 class SkillRegistry:
     """
     Registry for dynamically loading and managing skills.
     
-    Skills are loaded from the skills/ directory on-demand.
+    Skills are indexed from the skills/ directory and re-parsed only when
+    their SKILL.md changes (checked at most every ``reload_interval`` seconds).
     """
     
-    def __init__(self, skills_dir: Path | str | None = None) -> None:
+    def __init__(
+        self,
+        skills_dir: Path | str | None = None,
+        reload_interval: float | None = None,
+        max_compiled_prompts: int = 64,
+    ) -> None:
         if skills_dir is None:
             # Default to skills/ directory relative to this file
             skills_dir = Path(__file__).parent.parent.parent / "skills"
+        if reload_interval is None:
+            reload_interval = float(os.environ.get("COMFYUI_PROMPT_SKILLS_SKILL_RELOAD_INTERVAL", 2.0))
         self._skills_dir = Path(skills_dir)
-        self._cache: dict[str, Skill] = {}
+        self._reload_interval = reload_interval
+        # skill_id -> parsed skill; only directories containing a SKILL.md
+        self._index: dict[str, Skill] = {}
+        # Candidate skill directories and the skills/ mtime they were listed at
+        self._skill_dirs: list[Path] = []
+        self._dir_mtime: int | None = None
+        self._listing: list[dict[str, Any]] = []
+        self._checked_at: float | None = None
+        self._lock = threading.Lock()
+        # ((skill_id, content_hash), ...) -> CompiledPrompt, least recently used first
+        self._compiled: OrderedDict[tuple[tuple[str, str], ...], CompiledPrompt] = OrderedDict()
+        self._max_compiled = max_compiled_prompts
+        self._compiled_hits = 0
+        self._compiled_misses = 0
+    
+    @staticmethod
+    def _stamp(path: Path) -> tuple[int, int] | None:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
     
     def _parse_skill_file(self, file_path: Path) -> Skill | None:
         """Parse a SKILL.md file and extract metadata and content."""
+        stamp = self._stamp(file_path)
         try:
             content = file_path.read_text(encoding="utf-8")
         except Exception:
@@ -57,6 +136,7 @@ class SkillRegistry:
         name = file_path.parent.name
         name_zh = name
         description = ""
+        style_categories: list[str] = []
         
         lines = content.split("\n")
         if lines and lines[0].strip() == "---":
@@ -71,6 +151,9 @@ class SkillRegistry:
                             name_zh = fm_line.split(":", 1)[1].strip().strip("\"'")
                         elif fm_line.startswith("description:"):
                             description = fm_line.split(":", 1)[1].strip().strip("\"'")
+                        elif fm_line.startswith("style_categories:"):
+                            value = fm_line.split(":", 1)[1]
+                            style_categories = [c.strip() for c in value.split(",") if c.strip()]
                     # Content is after frontmatter
                     content = "\n".join(lines[i+1:])
                     break
@@ -84,71 +167,162 @@ class SkillRegistry:
             description=description,
             content=content.strip(),
             file_path=file_path,
+            style_categories=style_categories,
+            file_stamp=stamp or (0, 0),
         )
     
-    def discover_skills(self) -> list[str]:
-        """Discover all available skills from the skills directory."""
-        if not self._skills_dir.exists():
-            return []
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Bring the index up to date with the skills directory.
         
-        skill_ids = []
-        for item in self._skills_dir.iterdir():
-            if item.is_dir() and not item.name.startswith("."):
-                skill_file = item / "SKILL.md"
-                if skill_file.exists():
-                    skill_ids.append(item.name)
+        Re-lists skills/ only when its mtime changed and re-parses only the
+        SKILL.md files whose mtime or size changed. Returns True if anything
+        changed.
+        """
+        now = time.monotonic()
+        if (
+            not force
+            and self._checked_at is not None
+            and now - self._checked_at < self._reload_interval
+        ):
+            return False
         
-        return sorted(skill_ids)
+        with self._lock:
+            self._checked_at = now
+            changed = False
+            
+            dir_stamp = self._stamp(self._skills_dir)
+            dir_mtime = dir_stamp[0] if dir_stamp else None
+            if force or dir_mtime != self._dir_mtime:
+                self._dir_mtime = dir_mtime
+                self._skill_dirs = []
+                if dir_stamp is not None:
+                    self._skill_dirs = sorted(
+                        item for item in self._skills_dir.iterdir()
+                        if item.is_dir() and not item.name.startswith(".")
+                    )
+            
+            seen = set()
+            for skill_dir in self._skill_dirs:
+                skill_id = skill_dir.name
+                skill_file = skill_dir / "SKILL.md"
+                stamp = self._stamp(skill_file)
+                if stamp is None:
+                    continue
+                seen.add(skill_id)
+                current = self._index.get(skill_id)
+                if current is not None and current.file_stamp == stamp and not force:
+                    continue
+                skill = self._parse_skill_file(skill_file)
+                if skill is None:
+                    continue
+                self._index[skill_id] = skill
+                changed = True
+                debug_log("SkillRegistry", f"{'Reloaded' if current else 'Indexed'} skill: {skill_id}")
+            
+            for skill_id in set(self._index) - seen:
+                del self._index[skill_id]
+                changed = True
+                debug_log("SkillRegistry", f"Removed skill: {skill_id}")
+            
+            if changed or force:
+                self._listing = [self._index[skill_id].to_dict() for skill_id in sorted(self._index)]
+            return changed
+    
+    def discover_skills(self) -> list[str]:
+        """Discover all available skills from the skills directory."""
+        self.refresh()
+        return sorted(self._index)
     
     def load_skill(self, skill_id: str) -> Skill | None:
-        """Load a skill by ID, using cache if available."""
-        if skill_id in self._cache:
-            return self._cache[skill_id]
-        
-        skill_file = self._skills_dir / skill_id / "SKILL.md"
-        if not skill_file.exists():
-            return None
-        
-        skill = self._parse_skill_file(skill_file)
-        if skill:
-            self._cache[skill_id] = skill
-        
-        return skill
+        """Load a skill by ID from the index."""
+        self.refresh()
+        return self._index.get(skill_id)
     
     def load_skills(self, skill_ids: list[str]) -> list[Skill]:
         """Load multiple skills by ID."""
-        skills = []
-        for skill_id in skill_ids:
-            skill = self.load_skill(skill_id)
-            if skill:
-                skills.append(skill)
-        return skills
+        with trace_span("skills.load", requested=len(skill_ids)):
+            skills = []
+            for skill_id in skill_ids:
+                skill = self.load_skill(skill_id)
+                if skill:
+                    skills.append(skill)
+            return skills
     
-    def get_combined_prompt(self, skill_ids: list[str]) -> str:
-        """Combine multiple skill contents into a single system prompt."""
+    def compile_prompt(self, skill_ids: list[str]) -> CompiledPrompt:
+        """
+        Combine multiple skill contents into a single system prompt.
+        
+        Results are memoized by the ordered skill IDs and their content
+        hashes, so an edited skill produces a new entry automatically.
+        """
+        with trace_span("skills.compile") as span:
+            return self._compile_prompt(skill_ids, span)
+    
+    def _compile_prompt(self, skill_ids: list[str], span: Any) -> CompiledPrompt:
         skills = self.load_skills(skill_ids)
-        if not skills:
-            return ""
+        key = tuple((skill.id, skill.content_hash) for skill in skills)
         
-        parts = []
-        for skill in skills:
-            parts.append(f"## Skill: {skill.name} ({skill.name_zh})\n\n{skill.content}")
+        with self._lock:
+            compiled = self._compiled.get(key)
+            if compiled is not None:
+                self._compiled.move_to_end(key)
+                self._compiled_hits += 1
+                if span is not None:
+                    span.attrs["cached"] = True
+                return compiled
         
-        return "\n\n---\n\n".join(parts)
+        text = SKILL_SEPARATOR.join(skill.prompt_block for skill in skills)
+        compiled = CompiledPrompt(
+            text=text,
+            fingerprint=hashlib.sha256(text.encode("utf-8")).hexdigest()[:16],
+            skill_ids=tuple(skill.id for skill in skills),
+        )
+        
+        with self._lock:
+            self._compiled_misses += 1
+            self._compiled[key] = compiled
+            while len(self._compiled) > self._max_compiled:
+                self._compiled.popitem(last=False)
+        return compiled
+    
+    def get_combined_prompt(self, skill_ids: list[str]) -> str:
+        """Combine multiple skill contents into a single system prompt."""
+        return self.compile_prompt(skill_ids).text
+    
+    def get_prompt_fingerprint(self, skill_ids: list[str]) -> str:
+        """Stable fingerprint of the combined prompt for these skills."""
+        return self.compile_prompt(skill_ids).fingerprint
+    
+    def compiled_prompt_stats(self) -> dict[str, int]:
+        """Hit/miss counters of the combined prompt cache."""
+        with self._lock:
+            return {
+                "size": len(self._compiled),
+                "hits": self._compiled_hits,
+                "misses": self._compiled_misses,
+            }
+    
+    def get_style_categories(self, skill_ids: list[str]) -> list[str]:
+        """Style library categories declared by the given skills."""
+        categories: list[str] = []
+        for skill in self.load_skills(skill_ids):
+            for category in skill.style_categories:
+                if category not in categories:
+                    categories.append(category)
+        return categories
     
     def list_all(self) -> list[dict[str, Any]]:
         """List all available skills with metadata."""
-        skill_ids = self.discover_skills()
-        result = []
-        for skill_id in skill_ids:
-            skill = self.load_skill(skill_id)
-            if skill:
-                result.append(skill.to_dict())
-        return result
+        self.refresh()
+        return [dict(entry) for entry in self._listing]
     
     def clear_cache(self) -> None:
-        """Clear the skill cache (for reloading)."""
-        self._cache.clear()
+        """Drop the index and rebuild it from disk."""
+        with self._lock:
+            self._index.clear()
+            self._compiled.clear()
+        self.refresh(force=True)
 
 
 # Global singleton instance  
@@ -0,0 +1,233 @@
+"""
+Tier 3: StyleIndex - Local Style Retrieval over z_styles_db.json
+
+Builds an in-memory inverted index over the style library so the backend
+can pre-select the best matching styles for a request and inject them into
+the prompt, instead of having the LLM read and search the JSON file with a
+tool call on every generation.
+
+Matching works on mixed Chinese/English text: English is split into words,
+Chinese into character bigrams, and a small glossary maps common Chinese
+style terms onto the English vocabulary of the library.
+"""
+
+from __future__ import annotations
+import json
+import math
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+
+# Field weights: names identify a style best, tech specs least
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "name_zh": 3.0,
+    "id": 2.0,
+    "keywords": 2.0,
+    "tech_specs": 1.0,
+}
+
+# Common Chinese request terms -> English library vocabulary
+ZH_GLOSSARY: dict[str, list[str]] = {
+    "复古": ["vintage", "retro", "film"],
+    "胶片": ["film", "analog"],
+    "电影": ["cinematic", "movie"],
+    "人像": ["portrait"],
+    "写真": ["portrait", "studio"],
+    "街拍": ["street", "candid"],
+    "街头": ["street", "urban"],
+    "城市": ["urban", "city"],
+    "夕阳": ["golden", "sunset"],
+    "黄昏": ["golden", "sunset"],
+    "日落": ["golden", "sunset"],
+    "逆光": ["backlight", "rim"],
+    "黑白": ["noir", "monochrome"],
+    "夜晚": ["night", "neon"],
+    "霓虹": ["neon", "cyberpunk"],
+    "科幻": ["cyberpunk", "futuristic"],
+    "动漫": ["anime"],
+    "二次元": ["anime"],
+    "漫画": ["anime", "manga"],
+    "宫崎骏": ["ghibli"],
+    "插画": ["illustration", "vector"],
+    "扁平": ["flat", "vector"],
+    "水墨": ["ink", "wash"],
+    "油画": ["oil", "impasto"],
+    "手办": ["figure", "toy"],
+    "盲盒": ["toy", "chibi"],
+    "公仔": ["toy", "figure"],
+    "像素": ["voxel", "pixel"],
+    "黏土": ["clay", "claymation"],
+    "粘土": ["clay", "claymation"],
+    "古风": ["hanfu", "traditional", "chinese"],
+    "中国风": ["guofeng", "chinese"],
+    "国潮": ["guofeng", "chinese"],
+    "仙侠": ["xianxia", "fantasy"],
+    "武侠": ["wuxia", "martial"],
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_CJK_RE = re.compile(r"[一-鿿]+")
+
+_STOPWORDS = frozenset({"a", "an", "and", "of", "the", "with", "in", "on", "at", "style"})
+
+
+def tokenize(text: str) -> list[str]:
+    """Split mixed Chinese/English text into index terms."""
+    lowered = text.lower()
+    terms = [w for w in _WORD_RE.findall(lowered) if w not in _STOPWORDS]
+    for run in _CJK_RE.findall(lowered):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def expand_query(text: str) -> list[str]:
+    """Tokenize a request and add English glossary terms for Chinese phrases."""
+    terms = tokenize(text)
+    for phrase, english in ZH_GLOSSARY.items():
+        if phrase in text:
+            terms.extend(english)
+    return terms
+
+
+@dataclass
+class StyleMatch:
+    """A retrieved style with its relevance score."""
+
+    category: str
+    style: dict[str, Any]
+    score: float
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"category": self.category, "score": round(self.score, 3), **self.style}
+
+
+class StyleIndex:
+    """
+    Inverted keyword index over the style library.
+
+    The JSON file is loaded and indexed lazily on first search and reloaded
+    when its modification time changes.
+    """
+
+    def __init__(self, db_path: Path | str | None = None, top_k: int = 3) -> None:
+        if db_path is None:
+            db_path = Path(__file__).parent.parent.parent / "data" / "z_styles_db.json"
+        self._db_path = Path(db_path)
+        self._top_k = top_k
+        self._styles: list[tuple[str, dict[str, Any]]] = []
+        # term -> {style index: weight}
+        self._postings: dict[str, dict[int, float]] = {}
+        self._mtime: float | None = None
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self) -> None:
+        try:
+            mtime = self._db_path.stat().st_mtime
+        except OSError:
+            mtime = None
+        if mtime == self._mtime and (self._styles or mtime is None):
+            return
+        with self._lock:
+            if mtime != self._mtime or not self._styles:
+                self._build(mtime)
+
+    def _build(self, mtime: float | None) -> None:
+        styles: list[tuple[str, dict[str, Any]]] = []
+        if mtime is not None:
+            try:
+                data = json.loads(self._db_path.read_text(encoding="utf-8"))
+                for category, entries in (data.get("styles") or {}).items():
+                    styles.extend((category, entry) for entry in entries)
+            except Exception:
+                styles = []
+
+        postings: dict[str, dict[int, float]] = defaultdict(dict)
+        for index, (_, style) in enumerate(styles):
+            for field_name, weight in FIELD_WEIGHTS.items():
+                value = style.get(field_name)
+                if isinstance(value, list):
+                    value = " ".join(str(v) for v in value)
+                if not value:
+                    continue
+                for term in tokenize(str(value).replace("_", " ")):
+                    postings[term][index] = postings[term].get(index, 0.0) + weight
+
+        self._styles = styles
+        self._postings = dict(postings)
+        self._mtime = mtime
+
+    def search(
+        self,
+        query: str,
+        model_target: str | None = None,
+        categories: list[str] | None = None,
+        top_k: int | None = None,
+    ) -> list[StyleMatch]:
+        """
+        Return the best matching styles for a request.
+
+        Args:
+            query: Free-text user request (Chinese and/or English)
+            model_target: Only styles supporting this model
+            categories: Restrict to these library categories (all if empty)
+            top_k: Number of results (defaults to the index setting)
+        """
+        self._ensure_loaded()
+        styles, postings = self._styles, self._postings
+        if not styles:
+            return []
+
+        scores: dict[int, float] = defaultdict(float)
+        for term in set(expand_query(query)):
+            matches = postings.get(term)
+            if not matches:
+                continue
+            idf = math.log(1 + len(styles) / len(matches))
+            for index, weight in matches.items():
+                scores[index] += weight * idf
+
+        results = []
+        for index, score in scores.items():
+            category, style = styles[index]
+            if categories and category not in categories:
+                continue
+            if model_target and model_target not in style.get("model_target", [model_target]):
+                continue
+            results.append(StyleMatch(category=category, style=style, score=score))
+
+        results.sort(key=lambda match: (-match.score, match.style.get("id", "")))
+        return results[: top_k or self._top_k]
+
+    def format_for_prompt(self, matches: list[StyleMatch]) -> str:
+        """Render matched styles as a compact prompt section."""
+        if not matches:
+            return ""
+        lines = ["## 风格库匹配 (已预选)", ""]
+        for match in matches:
+            style = match.style
+            lines.append(
+                f"- {style.get('id')} ({style.get('name_zh', '')}, {match.category}): "
+                f"keywords: {', '.join(style.get('keywords', []))}; "
+                f"tech_specs: {style.get('tech_specs', '')}"
+            )
+        return "\n".join(lines)
+
+
+# Global singleton instance
+_style_index: StyleIndex | None = None
+
+
+def get_style_index() -> StyleIndex:
+    """Get the global StyleIndex instance."""
+    global _style_index
+    if _style_index is None:
+        _style_index = StyleIndex()
+    return _style_index
@@ -0,0 +1,274 @@
+"""
+Tier 3: Tracing - Per-Request Timing Spans
+
+Records where a generation spends its time. The socket layer starts a
+trace per request (the id is always generated here, so reused client
+request ids cannot collide; the client's id is kept as an attribute) and
+activates it for the generation coroutine; instrumented components
+(skill registry, OpenCode client, formatter) then add spans through
+``trace_span`` without any extra parameters. Spans recorded outside an
+active trace are no-ops.
+
+Finished traces are kept in an in-memory ring buffer and can be exported
+as JSON or in Chrome trace event format (chrome://tracing, Perfetto).
+
+Configuration via environment variables:
+    COMFYUI_PROMPT_SKILLS_TRACING       0 disables tracing (default 1)
+    COMFYUI_PROMPT_SKILLS_TRACE_BUFFER  finished traces kept (default 200)
+"""
+
+from __future__ import annotations
+import contextvars
+import itertools
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+
+@dataclass
+class Span:
+    """A timed step of a trace; times are time.monotonic() seconds."""
+
+    id: int
+    name: str
+    start: float
+    end: float | None = None
+    parent: int | None = None
+    attrs: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.monotonic()) - self.start
+
+
+class Trace:
+    """Spans of one request."""
+
+    def __init__(self, name: str, session_id: str | None = None) -> None:
+        self.id = f"req_{uuid.uuid4().hex[:12]}"
+        self.name = name
+        self.session_id = session_id
+        self.wall_start = time.time()
+        self.start = time.monotonic()
+        self.end: float | None = None
+        self.status = "running"
+        self.attrs: dict[str, Any] = {}
+        self.spans: list[Span] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.monotonic()) - self.start
+
+    def add_span(
+        self,
+        name: str,
+        start: float,
+        end: float | None = None,
+        parent: int | None = None,
+        **attrs: Any,
+    ) -> Span:
+        """Record a span with known times (e.g. the queue wait)."""
+        with self._lock:
+            span = Span(next(self._ids), name, start, end, parent, attrs)
+            self.spans.append(span)
+        return span
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON form; span times are milliseconds from the trace start."""
+        with self._lock:
+            spans = list(self.spans)
+
+        def ms(value: float) -> float:
+            return round(value * 1000, 3)
+
+        return {
+            "trace_id": self.id,
+            "name": self.name,
+            "session_id": self.session_id,
+            "status": self.status,
+            "started_at": self.wall_start,
+            "duration_ms": ms(self.duration),
+            "attrs": dict(self.attrs),
+            "spans": [
+                {
+                    "id": span.id,
+                    "name": span.name,
+                    "parent": span.parent,
+                    "start_ms": ms(span.start - self.start),
+                    "duration_ms": ms(span.duration),
+                    "attrs": span.attrs,
+                }
+                for span in spans
+            ],
+        }
+
+    def to_chrome_events(self, pid: int = 1, tid: int = 1) -> list[dict[str, Any]]:
+        """Complete ("X") events on a track named after the trace id."""
+        data = self.to_dict()
+        base = self.wall_start * 1_000_000
+        events: list[dict[str, Any]] = [{
+            "name": "thread_name",
+            "ph": "M",
+            "pid": pid,
+            "tid": tid,
+            "args": {"name": self.id},
+        }, {
+            "name": self.name,
+            "cat": "request",
+            "ph": "X",
+            "ts": base,
+            "dur": data["duration_ms"] * 1000,
+            "pid": pid,
+            "tid": tid,
+            "args": {"trace_id": self.id, "session_id": self.session_id, "status": self.status, **self.attrs},
+        }]
+        for span in data["spans"]:
+            events.append({
+                "name": span["name"],
+                "cat": span["name"].split(".")[0],
+                "ph": "X",
+                "ts": base + span["start_ms"] * 1000,
+                "dur": span["duration_ms"] * 1000,
+                "pid": pid,
+                "tid": tid,
+                "args": span["attrs"],
+            })
+        return events
+
+
+_current_trace: contextvars.ContextVar[Trace | None] = contextvars.ContextVar(
+    "prompt_skills_trace", default=None
+)
+_current_span: contextvars.ContextVar[int | None] = contextvars.ContextVar(
+    "prompt_skills_span", default=None
+)
+
+
+def current_trace() -> Trace | None:
+    """The trace active in this context, if any."""
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_span(name: str, **attrs: Any) -> Iterator[Span | None]:
+    """
+    Time a block as a span of the active trace.
+
+    Yields the span (None without an active trace) so the block can add
+    attributes, e.g. ``span.attrs["status"] = 200``.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    span = trace.add_span(name, time.monotonic(), parent=_current_span.get(), **attrs)
+    token = _current_span.set(span.id)
+    try:
+        yield span
+    except BaseException as e:
+        span.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end = time.monotonic()
+
+
+class Tracer:
+    """Creates traces and keeps the finished ones in a ring buffer."""
+
+    def __init__(self, enabled: bool | None = None, capacity: int | None = None) -> None:
+        if enabled is None:
+            enabled = os.environ.get("COMFYUI_PROMPT_SKILLS_TRACING", "1") == "1"
+        if capacity is None:
+            capacity = int(os.environ.get("COMFYUI_PROMPT_SKILLS_TRACE_BUFFER", 200))
+        self._enabled = enabled
+        self._finished: deque[Trace] = deque(maxlen=max(capacity, 1))
+        self._active: dict[str, Trace] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def start_trace(self, name: str, session_id: str | None = None, **attrs: Any) -> Trace:
+        """Begin a trace with a fresh id; it is recorded only if tracing is enabled."""
+        trace = Trace(name, session_id)
+        trace.attrs.update(attrs)
+        if self._enabled:
+            with self._lock:
+                self._active[trace.id] = trace
+        return trace
+
+    @contextmanager
+    def activate(self, trace: Trace) -> Iterator[Trace]:
+        """Make trace the target of ``trace_span`` in this context."""
+        if not self._enabled:
+            yield trace
+            return
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(None)
+        try:
+            yield trace
+        finally:
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+
+    def finish(self, trace: Trace, status: str = "ok") -> None:
+        """Close a trace and move it into the ring buffer."""
+        if trace.end is not None:
+            return
+        trace.end = time.monotonic()
+        trace.status = status
+        if not self._enabled:
+            return
+        with self._lock:
+            self._active.pop(trace.id, None)
+            self._finished.append(trace)
+
+    def get(self, trace_id: str) -> Trace | None:
+        """Look up a running or finished trace."""
+        with self._lock:
+            if trace_id in self._active:
+                return self._active[trace_id]
+            for trace in self._finished:
+                if trace.id == trace_id:
+                    return trace
+        return None
+
+    def recent(self, limit: int | None = None, session_id: str | None = None) -> list[Trace]:
+        """Finished traces, newest first."""
+        with self._lock:
+            traces = [t for t in reversed(self._finished) if session_id is None or t.session_id == session_id]
+        return traces[:limit] if limit else traces
+
+    def clear(self) -> None:
+        with self._lock:
+            self._finished.clear()
+            self._active.clear()
+
+
+def export_chrome(traces: list[Trace]) -> dict[str, Any]:
+    """Chrome trace event format document for traces."""
+    events: list[dict[str, Any]] = []
+    for tid, trace in enumerate(traces, start=1):
+        events.extend(trace.to_chrome_events(tid=tid))
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+# Global singleton instance
+_tracer: Tracer | None = None
+
+
+def get_tracer() -> Tracer:
+    """Get the global Tracer instance."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
@@ -0,0 +1,111 @@
+"""
+Tier 3: OpencodeWarmup - Background OpenCode Server Start-up
+
+Starting (or waiting for) OpenCode Server can take up to the client's
+start-up timeout. The warm-up runs it on a daemon thread so the plugin
+import and the Socket.IO server never wait for the LLM server; readiness
+is reported to a status listener (the socket layer broadcasts it).
+
+States: idle (not started) -> starting -> ready | unavailable
+"""
+
+from __future__ import annotations
+import threading
+import time
+from typing import Any, Callable
+
+from .debug_logger import debug_log
+from .opencode_client import OpencodeConfig, get_opencode_client
+
+
+StatusListener = Callable[[dict[str, Any]], None]
+
+
+class OpencodeWarmup:
+    """Runs OpenCode start-up once in the background and tracks readiness."""
+
+    def __init__(self) -> None:
+        self._state = "idle"
+        self._started_at: float | None = None
+        self._finished_at: float | None = None
+        self._listener: StatusListener | None = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def set_status_listener(self, listener: StatusListener | None) -> None:
+        """Call listener(status) on every state change."""
+        self._listener = listener
+
+    def start(self, config_path: str | None = None) -> bool:
+        """
+        Start warming up OpenCode Server in the background.
+
+        Returns False if a warm-up is already running or has finished.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self._thread = threading.Thread(
+                target=self._run, args=(config_path,), name="opencode-warmup", daemon=True
+            )
+        self._set_state("starting")
+        self._thread.start()
+        return True
+
+    def _run(self, config_path: str | None) -> None:
+        client = get_opencode_client()
+        if config_path:
+            client.configure(OpencodeConfig(config_path=config_path))
+        try:
+            ready = client.ensure_server_running()
+        except Exception as e:
+            debug_log("Warmup", f"OpenCode start-up failed: {e}", level="ERROR")
+            ready = False
+        self._set_state("ready" if ready else "unavailable")
+        self._done.set()
+
+    def _set_state(self, state: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._state = state
+            if state == "starting":
+                self._started_at = now
+            else:
+                self._finished_at = now
+        status = self.status()
+        debug_log("Warmup", f"OpenCode {state} ({status['elapsed']:.2f}s)")
+        if self._listener is not None:
+            try:
+                self._listener(status)
+            except Exception as e:
+                debug_log("Warmup", f"Status listener failed: {e}", level="WARNING")
+
+    def status(self) -> dict[str, Any]:
+        """Current state and seconds spent warming up."""
+        with self._lock:
+            elapsed = 0.0
+            if self._started_at is not None:
+                elapsed = (self._finished_at or time.monotonic()) - self._started_at
+            return {"state": self._state, "elapsed": round(elapsed, 3)}
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until the warm-up finished; True if OpenCode is ready."""
+        self._done.wait(timeout)
+        return self._state == "ready"
+
+
+# Global singleton instance
+_opencode_warmup: OpencodeWarmup | None = None
+
+
+def get_opencode_warmup() -> OpencodeWarmup:
+    """Get the global OpencodeWarmup instance."""
+    global _opencode_warmup
+    if _opencode_warmup is None:
+        _opencode_warmup = OpencodeWarmup()
+    return _opencode_warmup
@@ -1,10 +1,14 @@
 """Tier 2: Logic Layer - Flask + SocketIO"""
 
 from .app import create_app, socketio
+from .server import ServerConfig, get_connection_limiter, run_server
 from .socket_handlers import register_handlers
 
 __all__ = [
     "create_app",
     "socketio",
     "register_handlers",
+    "ServerConfig",
+    "get_connection_limiter",
+    "run_server",
 ]
@@ -9,6 +9,8 @@ from __future__ import annotations
 from flask import Flask
 from flask_socketio import SocketIO
 
+from .server import ServerConfig, get_connection_limiter
+
 # Global SocketIO instance (needed for handlers registration)
 socketio = SocketIO(
     cors_allowed_origins="*",
@@ -18,13 +20,19 @@ socketio = SocketIO(
 )
 
 
-def create_app(debug: bool = False, testing: bool = False) -> Flask:
+def create_app(
+    debug: bool = False,
+    testing: bool = False,
+    server_config: ServerConfig | None = None,
+) -> Flask:
     """
     Application factory for Flask app.
     
     Args:
         debug: Enable debug mode
         testing: Enable testing mode (no real network calls)
+        server_config: Ping and connection settings
+            (no connection cap when omitted)
         
     Returns:
         Configured Flask application instance
@@ -41,7 +49,11 @@ def create_app(debug: bool = False, testing: bool = False) -> Flask:
     app.register_blueprint(routes_bp)
     
     # Initialize SocketIO with app
-    socketio.init_app(app)
+    if server_config is not None:
+        socketio.init_app(app, **server_config.socketio_options())
+        get_connection_limiter().set_limit(server_config.max_connections)
+    else:
+        socketio.init_app(app)
     
     # Register WebSocket event handlers
     from .socket_handlers import register_handlers
@@ -0,0 +1,367 @@
+"""
+Tier 2: Generation Helpers
+
+Prompt templates and the building blocks shared by the chat handler, batch
+generation and the batch ComfyUI node: system prompt assembly and one-shot
+generation in a short-lived OpenCode session.
+
+Configuration via environment variables:
+    COMFYUI_PROMPT_SKILLS_MAX_BATCH       variants per batch (default 8)
+    COMFYUI_PROMPT_SKILLS_BATCH_PARALLEL  concurrent requests per batch (default 4)
+"""
+
+from __future__ import annotations
+import asyncio
+import os
+import threading
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable
+
+from ..core import (
+    get_async_opencode_client,
+    get_generation_scheduler,
+    get_output_formatter,
+    get_prompt_assembler,
+    get_skill_registry,
+    get_style_index,
+    AssembledPrompt,
+    GenerationJob,
+    GenerationScheduler,
+    PromptSection,
+    Skill,
+    debug_log,
+    message_role,
+    message_text,
+)
+
+# Skill context and output instructions travel in the `system` field, which
+# OpenCode applies to the turn without storing it in the transcript, so the
+# reused session grows only by the short user request per turn.
+# The system prompt is assembled as header, skills, matched styles, footer;
+# the stable parts come first so provider prefix caches can be reused.
+SYSTEM_PROMPT_HEADER = "你是一个专业的AI图像提示词工程师。"
+
+SYSTEM_PROMPT_FOOTER = """请根据上述技能、风格和用户请求，生成高质量的提示词。输出JSON格式，包含以下字段:
+- positive_prompt: 英文提示词（逗号分隔）
+- subject_zh/subject_en: 主体描述（中英双语）
+- style: 风格描述
+- tech_specs: 技术参数"""
+
+USER_PROMPT_TEMPLATE = """用户请求: {content}
+目标模型: {model_target}"""
+
+# A new OpenCode session has not seen earlier turns of the conversation
+# (answered from the result cache, or before the OpenCode session was
+# replaced), so the most recent ones are replayed ahead of the request.
+RECAP_PROMPT_TEMPLATE = """之前的对话:
+{recap}
+
+"""
+
+RECAP_MESSAGES = 6
+RECAP_MESSAGE_CHARS = 500
+
+# Batch variants: each runs in its own short-lived OpenCode session and is
+# steered towards a different aspect so the results actually differ.
+BATCH_PROMPT_TEMPLATE = """用户请求: {content}
+目标模型: {model_target}
+这是 {count} 个变体中的第 {index} 个，请在保持主题的前提下，重点在「{focus}」上做出与其他变体不同的选择。"""
+
+BATCH_VARIANT_FOCUS = ["构图", "光线", "色彩", "镜头与景深", "氛围", "材质细节", "时间与天气", "风格化程度"]
+
+# Upper bound on variants per batch, and on OpenCode requests one batch runs at
+# once (all but one of them borrow scheduler slots, see run_with_slots)
+MAX_BATCH_VARIANTS = int(os.environ.get("COMFYUI_PROMPT_SKILLS_MAX_BATCH", 8))
+BATCH_PARALLELISM = int(os.environ.get("COMFYUI_PROMPT_SKILLS_BATCH_PARALLEL", 4))
+
+# How long run_prompt_batch waits past its timeout for cancelled items to clean up
+BATCH_CLEANUP_SECONDS = 30
+
+
+# Assembled skill prompts kept per (compiled prompt fingerprint, token budget)
+MAX_SKILL_PROMPTS = 32
+
+_skill_prompts: OrderedDict[tuple[str, int], AssembledPrompt] = OrderedDict()
+_skill_prompts_lock = threading.Lock()
+
+
+def build_skill_prompt(skills: list[Skill], fingerprint: str) -> AssembledPrompt:
+    """
+    Assemble instructions, skills and output format within the token budget.
+    
+    ``fingerprint`` is the CompiledPrompt fingerprint of ``skills``; the
+    result is memoized per fingerprint and budget, so compaction and
+    truncation run once per skill combination rather than on every turn.
+    The instructions are always kept; skills may be compacted or truncated
+    (later skills first).
+    """
+    assembler = get_prompt_assembler()
+    key = (fingerprint, assembler.budget)
+    with _skill_prompts_lock:
+        assembled = _skill_prompts.get(key)
+        if assembled is not None:
+            _skill_prompts.move_to_end(key)
+            return assembled
+    
+    sections = [PromptSection("instructions", SYSTEM_PROMPT_HEADER, priority=100, required=True)]
+    for index, skill in enumerate(skills):
+        sections.append(PromptSection(
+            f"skill:{skill.id}",
+            # Later skills carry the separator so joined skills match compile_prompt()
+            skill.prompt_block if index == 0 else "---\n\n" + skill.prompt_block,
+            priority=60 - index,
+            required=True,
+            compactable=True,
+        ))
+    sections.append(PromptSection("output_format", SYSTEM_PROMPT_FOOTER, priority=100, required=True))
+    assembled = assembler.assemble(sections)
+    
+    with _skill_prompts_lock:
+        _skill_prompts[key] = assembled
+        while len(_skill_prompts) > MAX_SKILL_PROMPTS:
+            _skill_prompts.popitem(last=False)
+    return assembled
+
+
+def build_system_prompt(skills: list[Skill], styles: str, fingerprint: str) -> AssembledPrompt:
+    """
+    The turn's system prompt: the memoized skill prompt plus matched styles.
+    
+    Styles go before the output format and are dropped if they do not fit
+    the budget left by the skills.
+    """
+    return get_prompt_assembler().extend(
+        build_skill_prompt(skills, fingerprint),
+        PromptSection("styles", styles, priority=40),
+        before="output_format",
+    )
+
+
+def build_turn_system(content: str, model_target: str, skill_ids: list[str]) -> AssembledPrompt:
+    """System prompt for a request: the skills plus library styles matching it."""
+    skill_registry = get_skill_registry()
+    style_index = get_style_index()
+    style_matches = style_index.search(
+        content,
+        model_target=model_target,
+        categories=skill_registry.get_style_categories(skill_ids),
+    )
+    return build_system_prompt(
+        skill_registry.load_skills(skill_ids),
+        style_index.format_for_prompt(style_matches),
+        skill_registry.compile_prompt(skill_ids).fingerprint,
+    )
+
+
+def format_recap(history: list[dict[str, Any]]) -> str:
+    """Recap of the last turns for a fresh OpenCode session ("" without history)."""
+    lines = []
+    for message in history[-RECAP_MESSAGES:]:
+        if message.get("role") == "user":
+            lines.append(f"用户: {message.get('content', '')[:RECAP_MESSAGE_CHARS]}")
+        elif message.get("role") == "assistant":
+            # The formatted prompt is shorter than the raw reply and is what the user saw
+            text = (message.get("metadata") or {}).get("prompt_english") or message.get("content", "")
+            lines.append(f"助手: {text[:RECAP_MESSAGE_CHARS]}")
+    return RECAP_PROMPT_TEMPLATE.format(recap="\n".join(lines)) if lines else ""
+
+
+def parse_batch_count(value: Any, default: int = 4) -> int:
+    """Clamp a requested variant count to 1..MAX_BATCH_VARIANTS."""
+    try:
+        count = int(value) if value is not None else default
+    except (TypeError, ValueError):
+        count = default
+    return max(1, min(count, MAX_BATCH_VARIANTS))
+
+
+async def run_with_slots(
+    scheduler: GenerationScheduler,
+    count: int,
+    work: Callable[[int], Awaitable[None]],
+    parallelism: int,
+) -> None:
+    """
+    Call ``work(0..count-1)`` from a running job, up to ``parallelism`` at once.
+    
+    The first worker runs on the job's own scheduler slot; the others
+    borrow a slot per item, so the fan-out counts against the global
+    concurrency cap and yields to queued jobs of other sessions.
+    """
+    pending = deque(range(count))
+    # Borrowing workers currently working on an item
+    busy: set[int] = set()
+    
+    async def worker(number: int) -> None:
+        while pending:
+            if number == 0:
+                await work(pending.popleft())
+                continue
+            async with scheduler.slot():
+                # Take the item only once the slot is ours
+                if not pending:
+                    return
+                index = pending.popleft()
+                busy.add(number)
+                try:
+                    await work(index)
+                finally:
+                    busy.discard(number)
+    
+    workers = [asyncio.ensure_future(worker(i)) for i in range(max(min(parallelism, count), 1))]
+    try:
+        await workers[0]
+        # Every item is taken: stop borrowers still waiting for a slot
+        for number, task in enumerate(workers[1:], start=1):
+            if number not in busy:
+                task.cancel()
+        for result in await asyncio.gather(*workers[1:], return_exceptions=True):
+            if isinstance(result, Exception):
+                raise result
+    finally:
+        for task in workers:
+            task.cancel()
+        # Let cancelled items delete their OpenCode sessions
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def generate_oneshot(
+    turn_content: str,
+    system: str,
+    model_target: str,
+    title: str = "PromptSkills-oneshot",
+) -> dict[str, str] | None:
+    """
+    Generate one prompt in a fresh OpenCode session, deleted afterwards.
+    
+    Returns the formatted output (including ``raw_response``) or None.
+    """
+    opencode_client = get_async_opencode_client()
+    opencode_session = await opencode_client.create_session(title=title)
+    if not opencode_session:
+        return None
+    try:
+        response = await opencode_client.send_message(
+            session_id=opencode_session["id"],
+            content=turn_content,
+            system=system,
+        )
+        raw_response = message_text(response) if response and message_role(response) == "assistant" else ""
+        if response and not raw_response:
+            parent_id = (response.get("info") or {}).get("parentID")
+            messages = await opencode_client.get_messages_since(opencode_session["id"], parent_id)
+            replies = [m for m in messages if message_role(m) == "assistant"]
+            raw_response = message_text(replies[-1]) if replies else ""
+    finally:
+        await opencode_client.delete_session(opencode_session["id"])
+    if not raw_response:
+        return None
+    return get_output_formatter().format_for_model(raw_response, model_target).to_dict()
+
+
+async def generate_prompts(
+    requests: list[str],
+    skill_ids: list[str],
+    model_target: str,
+    concurrency: int = 2,
+    timeout: float | None = None,
+    scheduler: GenerationScheduler | None = None,
+) -> list[dict[str, str] | None]:
+    """
+    Generate one prompt per request with at most ``concurrency`` in flight.
+    
+    Meant to run as a scheduler job (see run_prompt_batch): items beyond
+    the first borrow slots from ``scheduler``, so they count against the
+    global concurrency cap. Results keep the order of ``requests``. Items
+    that failed, or had not finished within ``timeout`` seconds (they are
+    cancelled), are None.
+    """
+    if not requests:
+        return []
+    if not await get_async_opencode_client().ensure_server_running():
+        debug_log("Generation", "OpenCode Server is not available", level="ERROR")
+        return [None] * len(requests)
+    
+    results: list[dict[str, str] | None] = [None] * len(requests)
+    finished = 0
+    
+    async def generate(index: int) -> None:
+        nonlocal finished
+        content = requests[index]
+        try:
+            results[index] = await generate_oneshot(
+                USER_PROMPT_TEMPLATE.format(content=content, model_target=model_target),
+                build_turn_system(content, model_target, skill_ids).text,
+                model_target,
+                title=f"PromptSkills-list-{index + 1}",
+            )
+        except Exception as e:
+            debug_log("Generation", f"Item {index + 1}/{len(requests)} raised: {e}", level="ERROR")
+        finished += 1
+        debug_log("Generation", f"Item {index + 1}/{len(requests)} {'done' if results[index] else 'failed'}")
+    
+    try:
+        await asyncio.wait_for(
+            run_with_slots(scheduler or get_generation_scheduler(), len(requests), generate, concurrency),
+            timeout,
+        )
+    except asyncio.TimeoutError:
+        debug_log(
+            "Generation",
+            f"Timed out, cancelled {len(requests) - finished} of {len(requests)} items",
+            level="WARNING",
+        )
+    return results
+
+
+def run_prompt_batch(
+    requests: list[str],
+    skill_ids: list[str],
+    model_target: str,
+    concurrency: int = 2,
+    timeout: float = 600,
+    scheduler: GenerationScheduler | None = None,
+) -> list[dict[str, str] | None]:
+    """
+    Blocking wrapper running generate_prompts as one scheduler job.
+    
+    The batch queues behind chat and batch jobs like any other session and
+    fans out under the global cap. ``timeout`` covers queueing as well;
+    on expiry the job is cancelled. Every item is None if the queue is
+    full or the job never started.
+    """
+    scheduler = scheduler or get_generation_scheduler()
+    empty: list[dict[str, str] | None] = [None] * len(requests)
+    done: Future[list[dict[str, str] | None]] = Future()
+    
+    async def run(job: GenerationJob) -> None:
+        try:
+            remaining = max(timeout - (job.queue_wait or 0.0), 0.0)
+            done.set_result(await generate_prompts(
+                requests, skill_ids, model_target,
+                concurrency=concurrency, timeout=remaining, scheduler=scheduler,
+            ))
+        finally:
+            if not done.done():
+                done.set_result(empty)
+    
+    # Each node run is its own scheduler session
+    job = scheduler.submit(f"node-batch-{uuid.uuid4().hex[:12]}", run)
+    if job is None:
+        debug_log("Generation", "Batch rejected: generation queue is full", level="WARNING")
+        return empty
+    try:
+        return done.result(timeout)
+    except FutureTimeoutError:
+        pass
+    if job.started_at is not None:
+        # generate_prompts enforces the timeout; the margin covers cleanup
+        try:
+            return done.result(BATCH_CLEANUP_SECONDS)
+        except FutureTimeoutError:
+            pass
+    debug_log("Generation", f"Batch job {job.id} timed out, cancelling", level="WARNING")
+    scheduler.cancel_session(job.session_id)
+    return empty
@@ -7,20 +7,29 @@ independently from ComfyUI.
 
 from __future__ import annotations
 from pathlib import Path
-from flask import Blueprint, jsonify, request, send_from_directory
+from flask import Blueprint, Response, jsonify, request, send_from_directory
 
 from ..core import (
     get_session_manager,
     get_skill_registry,
     get_opencode_client,
+    get_generation_scheduler,
+    get_result_cache,
+    get_opencode_warmup,
+    get_tracer,
+    export_chrome,
+    get_metrics_registry,
     debug_log,
 )
+from .server import connection_families, get_connection_limiter
 
 bp = Blueprint("routes", __name__)
 
 # Standalone directory path
 STANDALONE_DIR = Path(__file__).parent.parent.parent / "standalone"
 
+get_metrics_registry().register_collector("connections", connection_families)
+
 
 @bp.route("/health")
 def health_check():
@@ -30,6 +39,8 @@ def health_check():
         "status": "ok",
         "service": "prompt-skills-logic-layer",
         "version": "2.0.0",
+        "opencode": get_opencode_warmup().status(),
+        "server": get_connection_limiter().stats(),
     })
 
 
@@ -47,6 +58,13 @@ def list_sessions():
     return jsonify({"sessions": sessions})
 
 
+@bp.route("/api/sessions/stats")
+def session_stats():
+    """Session memory usage and eviction counters."""
+    debug_log("Routes", "→ /api/sessions/stats")
+    return jsonify(get_session_manager().stats())
+
+
 @bp.route("/api/sessions/<session_id>")
 def get_session(session_id: str):
     """Get a specific session."""
@@ -58,6 +76,57 @@ def get_session(session_id: str):
     return jsonify({"error": "Session not found"}), 404
 
 
+@bp.route("/api/sessions/<session_id>/output")
+def wait_for_output(session_id: str):
+    """
+    Long-poll for a session's output.
+    
+    Query parameters:
+        since:   output version the client already has (omit to wait for
+                 the next output)
+        timeout: seconds to wait, capped at 120 (default 30)
+    
+    Returns as soon as an output newer than ``since`` is stored and the
+    generation has finished, or when the timeout expires (``changed`` is
+    False).
+    """
+    since = request.args.get("since", type=int)
+    timeout = min(max(request.args.get("timeout", 30, type=float), 0), 120)
+    debug_log("Routes", f"→ /api/sessions/{session_id}/output since={since} timeout={timeout}")
+    result = get_session_manager().wait_for_output(session_id, since, timeout)
+    if result is None:
+        return jsonify({"error": "Session not found"}), 404
+    return jsonify(result)
+
+
+@bp.route("/api/sessions/<session_id>/batch", methods=["POST"])
+def generate_batch(session_id: str):
+    """
+    Start generating several prompt variants for one request.
+    
+    Results stream to the session room as ``batch_result`` events and are
+    stored in the session's ``last_output["variants"]``.
+    """
+    from .app import socketio
+    from .generation import parse_batch_count
+    from .socket_handlers import submit_batch
+    
+    data = request.get_json(silent=True) or {}
+    content = data.get("content", "")
+    count = parse_batch_count(data.get("count"))
+    debug_log("Routes", f"→ /api/sessions/{session_id}/batch count={count}")
+    
+    if not content:
+        return jsonify({"error": "content is required"}), 400
+    if not get_session_manager().get_session(session_id):
+        return jsonify({"error": "Session not found"}), 404
+    
+    job = submit_batch(socketio, session_id, content, data.get("model_target", "z-image-turbo"), count)
+    if job is None:
+        return jsonify({"error": "Generation queue is full, please retry shortly"}), 429
+    return jsonify({"session_id": session_id, "batch_id": job.id, "count": count}), 202
+
+
 @bp.route("/api/skills")
 def list_skills():
     """List all available skills."""
@@ -81,6 +150,57 @@ def opencode_status():
     })
 
 
+@bp.route("/api/scheduler")
+def scheduler_stats():
+    """Report generation queue load."""
+    debug_log("Routes", "→ /api/scheduler")
+    return jsonify(get_generation_scheduler().stats())
+
+
+@bp.route("/api/cache/stats")
+def result_cache_stats():
+    """Report generation result cache size and hit rate."""
+    debug_log("Routes", "→ /api/cache/stats")
+    return jsonify(get_result_cache().stats())
+
+
+@bp.route("/api/traces")
+def list_traces():
+    """
+    Recent finished generation traces, newest first.
+    
+    Query: session_id (optional), limit (default 50),
+    format=json|chrome (Chrome trace event format for chrome://tracing / Perfetto).
+    """
+    debug_log("Routes", "→ /api/traces")
+    limit = request.args.get("limit", 50, type=int)
+    traces = get_tracer().recent(limit=max(limit, 1), session_id=request.args.get("session_id"))
+    if request.args.get("format") == "chrome":
+        return jsonify(export_chrome(traces))
+    return jsonify({"traces": [trace.to_dict() for trace in traces]})
+
+
+@bp.route("/api/traces/<trace_id>")
+def get_trace(trace_id: str):
+    """One trace (running or finished) by its trace id."""
+    debug_log("Routes", f"→ /api/traces/{trace_id}")
+    trace = get_tracer().get(trace_id)
+    if trace is None:
+        return jsonify({"error": "Trace not found"}), 404
+    if request.args.get("format") == "chrome":
+        return jsonify(export_chrome([trace]))
+    return jsonify(trace.to_dict())
+
+
+@bp.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint (text exposition format 0.0.4)."""
+    registry = get_metrics_registry()
+    if not registry.enabled:
+        return jsonify({"error": "Metrics disabled"}), 404
+    return Response(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @bp.route("/test/echo", methods=["POST"])
 def test_echo():
     """Echo endpoint for testing."""
@@ -0,0 +1,141 @@
+"""
+Tier 2: Server - Serving the Logic Layer
+
+Runs the Flask + Socket.IO app on Werkzeug with a thread per connection,
+the same way inside ComfyUI and standalone. Debug mode is off unless
+explicitly enabled, and concurrent Socket.IO clients are capped.
+
+Configuration via environment variables:
+    COMFYUI_PROMPT_SKILLS_HOST             bind address (default 0.0.0.0)
+    COMFYUI_PROMPT_SKILLS_PORT             bind port (default 8189)
+    COMFYUI_PROMPT_SKILLS_SERVER_DEBUG     1 enables Flask debug mode (default off)
+    COMFYUI_PROMPT_SKILLS_MAX_CONNECTIONS  concurrent Socket.IO clients, 0 = unlimited (default 500)
+    COMFYUI_PROMPT_SKILLS_PING_INTERVAL    Socket.IO ping interval in seconds (default 25)
+    COMFYUI_PROMPT_SKILLS_PING_TIMEOUT     Socket.IO ping timeout in seconds (default 20)
+"""
+
+from __future__ import annotations
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+from flask import Flask
+
+from ..core import debug_log
+
+
+@dataclass
+class ServerConfig:
+    """Settings for serving the Logic Layer."""
+
+    host: str = "0.0.0.0"
+    port: int = 8189
+    debug: bool = False
+    max_connections: int = 500
+    ping_interval: float = 25
+    ping_timeout: float = 20
+
+    @classmethod
+    def from_env(cls, **defaults: Any) -> ServerConfig:
+        """Read the environment; keyword arguments replace the built-in defaults."""
+        base = cls(**defaults)
+        return cls(
+            host=os.environ.get("COMFYUI_PROMPT_SKILLS_HOST", base.host),
+            port=int(os.environ.get("COMFYUI_PROMPT_SKILLS_PORT", base.port)),
+            debug=os.environ.get("COMFYUI_PROMPT_SKILLS_SERVER_DEBUG", "1" if base.debug else "0") == "1",
+            max_connections=int(
+                os.environ.get("COMFYUI_PROMPT_SKILLS_MAX_CONNECTIONS", base.max_connections)
+            ),
+            ping_interval=float(
+                os.environ.get("COMFYUI_PROMPT_SKILLS_PING_INTERVAL", base.ping_interval)
+            ),
+            ping_timeout=float(
+                os.environ.get("COMFYUI_PROMPT_SKILLS_PING_TIMEOUT", base.ping_timeout)
+            ),
+        )
+
+    def socketio_options(self) -> dict[str, Any]:
+        """Keyword arguments for ``SocketIO.init_app``."""
+        return {
+            "ping_interval": self.ping_interval,
+            "ping_timeout": self.ping_timeout,
+        }
+
+
+class ConnectionLimiter:
+    """Caps the number of concurrently connected Socket.IO clients."""
+
+    def __init__(self, limit: int = 0) -> None:
+        self._limit = limit
+        self._sids: set[str] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    def set_limit(self, limit: int) -> None:
+        """Set the cap; 0 means unlimited."""
+        self._limit = max(limit, 0)
+
+    def acquire(self, sid: str) -> bool:
+        """Admit a client; False if the server is full."""
+        with self._lock:
+            if self._limit and sid not in self._sids and len(self._sids) >= self._limit:
+                return False
+            self._sids.add(sid)
+            return True
+
+    def release(self, sid: str) -> None:
+        """Forget a disconnected client."""
+        with self._lock:
+            self._sids.discard(sid)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"connections": len(self._sids), "max_connections": self._limit}
+
+
+# Global singleton instance
+_connection_limiter: ConnectionLimiter | None = None
+
+
+def get_connection_limiter() -> ConnectionLimiter:
+    """Get the global ConnectionLimiter instance."""
+    global _connection_limiter
+    if _connection_limiter is None:
+        _connection_limiter = ConnectionLimiter()
+    return _connection_limiter
+
+
+def connection_families() -> list:
+    """Metrics collector for the connection limiter."""
+    stats = get_connection_limiter().stats()
+    return [
+        ("prompt_skills_socket_connections", "gauge",
+         "Connected Socket.IO clients", [("", {}, stats["connections"])]),
+        ("prompt_skills_socket_max_connections", "gauge",
+         "Socket.IO connection cap (0 = unlimited)", [("", {}, stats["max_connections"])]),
+    ]
+
+
+def run_server(app: Flask, config: ServerConfig) -> None:
+    """Serve app on Werkzeug (blocks)."""
+    from .app import socketio
+
+    debug_log(
+        "Server",
+        f"Serving on {config.host}:{config.port} (debug={config.debug}, "
+        f"max_connections={config.max_connections or 'unlimited'})",
+    )
+    # Werkzeug is the only server that runs inside ComfyUI's process
+    socketio.run(
+        app,
+        host=config.host,
+        port=config.port,
+        debug=config.debug,
+        use_reloader=False,
+        log_output=config.debug,
+        allow_unsafe_werkzeug=True,
+    )
@@ -8,25 +8,240 @@ Debug Mode: Set COMFYUI_PROMPT_SKILLS_DEBUG=1 to enable detailed logging.
 """
 
 from __future__ import annotations
+import asyncio
 import threading
-from concurrent.futures import ThreadPoolExecutor
+import time
 from typing import Any
 
 from flask import request
-from flask_socketio import SocketIO, emit, join_room, leave_room
+from flask_socketio import ConnectionRefusedError, SocketIO, emit, join_room, leave_room
 
 from ..core import (
     get_session_manager,
     get_skill_registry,
     get_opencode_client,
+    get_async_opencode_client,
     get_output_formatter,
+    get_event_router,
+    get_generation_scheduler,
+    get_style_index,
+    get_background_loop,
     get_debug_emitter,
+    get_opencode_warmup,
+    get_tracer,
+    trace_span,
+    get_metrics_registry,
+    FAST_BUCKETS,
     debug_log,
     DEBUG_MODE,
+    GenerationJob,
+    StreamingPromptParser,
+    estimate_tokens,
+    get_result_cache,
+    make_cache_key,
+    message_role,
+    message_text,
 )
+from .generation import (
+    BATCH_PARALLELISM,
+    BATCH_PROMPT_TEMPLATE,
+    BATCH_VARIANT_FOCUS,
+    USER_PROMPT_TEMPLATE,
+    build_system_prompt,
+    build_turn_system,
+    format_recap,
+    generate_oneshot,
+    parse_batch_count,
+    run_with_slots,
+)
+from .server import get_connection_limiter
+
+# Fair, bounded scheduler for generation jobs (runs on the shared event loop)
+_scheduler = get_generation_scheduler()
 
-# Thread pool for async execution
-_executor = ThreadPoolExecutor(max_workers=4)
+# Generation metrics, exposed on /metrics
+_metrics = get_metrics_registry()
+_generations = _metrics.counter(
+    "prompt_skills_generations_total", "Generation requests by outcome", ("outcome",)
+)
+_generation_seconds = _metrics.histogram(
+    "prompt_skills_generation_seconds", "Generation time from enqueue to finish"
+)
+_queue_wait_seconds = _metrics.histogram(
+    "prompt_skills_generation_queue_wait_seconds", "Time generation jobs waited for a slot"
+)
+_llm_seconds = _metrics.histogram(
+    "prompt_skills_generation_llm_seconds", "Time waiting for the OpenCode reply"
+)
+_first_delta_seconds = _metrics.histogram(
+    "prompt_skills_generation_first_delta_seconds", "Time from job start to the first streamed token"
+)
+_format_seconds = _metrics.histogram(
+    "prompt_skills_generation_format_seconds", "Time formatting the reply", buckets=FAST_BUCKETS
+)
+
+def _sync_event(session_id: str, since: int | None) -> tuple[str, dict[str, Any]]:
+    """
+    Build the catch-up event for a client at version ``since``.
+    
+    Returns ("sync_delta", changes) when the change log covers the gap,
+    otherwise ("sync_state", full snapshot).
+    """
+    session_manager = get_session_manager()
+    session = session_manager.get_or_create_session(session_id)
+    if since is not None:
+        changes = session_manager.changes_since(session_id, since)
+        if changes is not None:
+            return "sync_delta", {
+                "session_id": session_id,
+                "from_version": since,
+                "version": session.version,
+                "changes": changes,
+            }
+    return "sync_state", session.to_dict()
+
+
+def _parse_version(value: Any) -> int | None:
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def submit_batch(
+    socketio: SocketIO,
+    session_id: str,
+    content: str,
+    model_target: str,
+    count: int,
+) -> GenerationJob | None:
+    """
+    Schedule one job that generates ``count`` prompt variants.
+    
+    Variants are generated concurrently, each in its own OpenCode session
+    that is deleted afterwards, so the session's main conversation does
+    not grow. Variants beyond the first borrow scheduler slots, so they
+    count against the global concurrency cap. Each result is emitted as
+    ``batch_result`` when it finishes; all of them end up in
+    ``last_output["variants"]``.
+    
+    Returns None if the session is unknown or the queue is full.
+    """
+    session_manager = get_session_manager()
+    session = session_manager.get_session(session_id)
+    if not session or not _scheduler.has_capacity(session_id):
+        return None
+    
+    def emit_to_room(event: str, data: dict, room: str) -> None:
+        socketio.emit(event, data, room=room)
+    
+    debug = get_debug_emitter(emit_to_room, session_id)
+    # Set once the request is in the history, which happens only after
+    # the job was accepted; its reply must not land before it
+    recorded = threading.Event()
+    
+    async def generate_batch(job: GenerationJob) -> None:
+        if not recorded.is_set():
+            await asyncio.to_thread(recorded.wait)
+        try:
+            debug.info("BatchGenerator", f"Generating {count} variants for: {content[:50]}...")
+            assembled = build_turn_system(content, model_target, session.skills)
+            
+            if not await get_async_opencode_client().ensure_server_running():
+                debug.error("OpenCode", "OpenCode Server is not available")
+                socketio.emit("error", {
+                    "message": "OpenCode Server is not available. Please ensure 'opencode' is installed.",
+                }, room=session_id)
+                session_manager.set_status(session_id, "error")
+                return
+            
+            results: dict[int, dict[str, str]] = {}
+            
+            async def generate_variant(index: int) -> None:
+                turn_content = BATCH_PROMPT_TEMPLATE.format(
+                    content=content,
+                    model_target=model_target,
+                    index=index + 1,
+                    count=count,
+                    focus=BATCH_VARIANT_FOCUS[index % len(BATCH_VARIANT_FOCUS)],
+                )
+                output = await generate_oneshot(
+                    turn_content,
+                    assembled.text,
+                    model_target,
+                    title=f"PromptSkills-{session_id[:8]}-batch-{index + 1}",
+                )
+                if job.cancelled:
+                    return
+                if output is None:
+                    debug.warn("BatchGenerator", f"Variant {index + 1}/{count} failed")
+                else:
+                    results[index] = output
+                socketio.emit("batch_result", {
+                    "session_id": session_id,
+                    "batch_id": job.id,
+                    "index": index,
+                    "count": count,
+                    "ok": output is not None,
+                    **({k: v for k, v in output.items() if k != "raw_response"} if output else {}),
+                }, room=session_id)
+            
+            # Extra variants borrow scheduler slots, keeping the global cap
+            await run_with_slots(_scheduler, count, generate_variant, BATCH_PARALLELISM)
+            
+            if not job.try_commit():
+                debug.warn("BatchGenerator", "Batch aborted, discarding results")
+                return
+            
+            variants = [
+                {k: v for k, v in results[i].items() if k != "raw_response"}
+                for i in sorted(results)
+            ]
+            if variants:
+                session_manager.add_message(
+                    session_id,
+                    "assistant",
+                    "\n\n".join(results[i]["raw_response"] for i in sorted(results)),
+                    metadata={**variants[0], "variants": variants},
+                )
+                session_manager.set_output(session_id, **variants[0], variants=variants)
+            
+            debug.info("BatchGenerator", f"Batch complete: {len(variants)}/{count} variants")
+            socketio.emit("batch_complete", {
+                "session_id": session_id,
+                "batch_id": job.id,
+                "count": count,
+                "variants": variants,
+            }, room=session_id)
+            session_manager.set_status(session_id, "idle")
+            socketio.emit("status_update", {"status": "idle"}, room=session_id)
+        
+        except asyncio.CancelledError:
+            debug.warn("BatchGenerator", f"Batch cancelled: job={job.id}")
+            raise
+        except Exception as e:
+            debug.error("BatchGenerator", f"Exception: {str(e)}")
+            socketio.emit("error", {
+                "message": f"Error generating variants: {str(e)}",
+            }, room=session_id)
+            session_manager.set_status(session_id, "error")
+            socketio.emit("status_update", {"status": "error"}, room=session_id)
+        finally:
+            debug.flush()
+    
+    session_manager.set_status(session_id, "working")
+    socketio.emit("status_update", {"status": "working"}, room=session_id)
+    
+    job = _scheduler.submit(session_id, generate_batch)
+    if job is None:
+        # Queue filled up between the capacity check and submission
+        session_manager.set_status(session_id, "idle")
+        socketio.emit("status_update", {"status": "idle"}, room=session_id)
+        return None
+    session_manager.add_message(session_id, "user", content, metadata={"batch": count})
+    recorded.set()
+    debug_log("SocketHandler", f"  Submitted batch job {job.id} ({count} variants)")
+    return job
 
 
 def register_handlers(socketio: SocketIO) -> None:
@@ -34,13 +249,47 @@ def register_handlers(socketio: SocketIO) -> None:
     
     debug_log("SocketHandlers", f"Registering WebSocket handlers (debug_mode={DEBUG_MODE})")
     
+    def on_queue_update(job: GenerationJob, position: int, queued: int) -> None:
+        """Push queue position changes to the job's session room."""
+        socketio.emit("queue_update", {
+            "session_id": job.session_id,
+            "job_id": job.id,
+            "position": position,
+            "queued": queued,
+        }, room=job.session_id)
+    
+    _scheduler.set_queue_listener(on_queue_update)
+    
+    def on_session_change(session_id: str, change: dict[str, Any]) -> None:
+        """Push each versioned session change to the session room."""
+        socketio.emit("sync_delta", {
+            "session_id": session_id,
+            "from_version": change["version"] - 1,
+            "version": change["version"],
+            "changes": [change],
+        }, room=session_id)
+    
+    get_session_manager().set_change_listener(on_session_change)
+    
+    def on_opencode_status(status: dict[str, Any]) -> None:
+        """Broadcast OpenCode warm-up progress to every client."""
+        socketio.emit("opencode_status", status)
+    
+    get_opencode_warmup().set_status_listener(on_opencode_status)
+    
     @socketio.on("connect")
-    def handle_connect() -> None:
+    def handle_connect(auth: dict[str, Any] | None = None) -> None:
         """Handle new WebSocket connection."""
         session_id = request.args.get("session_id")
         client_sid = request.sid
+        # Reconnecting clients pass the last version they saw
+        since = _parse_version((auth or {}).get("since", request.args.get("since")))
+        
+        debug_log("SocketHandler", f"→ connect: session_id={session_id}, client_sid={client_sid}, since={since}")
         
-        debug_log("SocketHandler", f"→ connect: session_id={session_id}, client_sid={client_sid}")
+        if not get_connection_limiter().acquire(client_sid):
+            debug_log("SocketHandler", f"  Refused {client_sid}: connection limit reached", level="WARNING")
+            raise ConnectionRefusedError("Server is at its connection limit, retry later")
         
         if session_id:
             # Join the room for this session
@@ -52,8 +301,9 @@ def register_handlers(socketio: SocketIO) -> None:
             
             debug_log("SocketHandler", f"  Session created/retrieved: status={session.status}, skills={session.skills}")
             
-            # Send current state
-            emit("sync_state", session.to_dict())
+            # Send current state (or only what changed since the client's version)
+            event, payload = _sync_event(session_id, since)
+            emit(event, payload)
             emit("debug_log", {
                 "level": "INFO",
                 "module": "SocketHandler",
@@ -65,12 +315,30 @@ def register_handlers(socketio: SocketIO) -> None:
             skills = skill_registry.list_all()
             debug_log("SocketHandler", f"  Auto-sending skills list: {len(skills)} skills found")
             emit("skills_list", {"skills": skills})
+            
+            # OpenCode may still be warming up in the background
+            emit("opencode_status", get_opencode_warmup().status())
+    
+    @socketio.on("sync_request")
+    def handle_sync_request(data: dict[str, Any]) -> None:
+        """Send a client the changes since its version (or a full snapshot)."""
+        session_id = data.get("session_id")
+        since = _parse_version(data.get("since"))
+        debug_log("SocketHandler", f"→ sync_request: session_id={session_id}, since={since}")
+        
+        if not session_id:
+            emit("error", {"message": "session_id is required"})
+            return
+        
+        event, payload = _sync_event(session_id, since)
+        emit(event, payload)
     
     @socketio.on("disconnect")
     def handle_disconnect() -> None:
         """Handle WebSocket disconnection."""
         session_id = request.args.get("session_id")
         debug_log("SocketHandler", f"← disconnect: session_id={session_id}")
+        get_connection_limiter().release(request.sid)
         if session_id:
             leave_room(session_id)
     
@@ -109,7 +377,6 @@ def register_handlers(socketio: SocketIO) -> None:
                 "module": "SocketHandler",
                 "message": f"Configuration updated: skills={session.skills}",
             }, room=session_id)
-            emit("sync_state", session.to_dict(), room=session_id)
         else:
             debug_log("SocketHandler", f"  ERROR: Session not found: {session_id}", level="ERROR")
             emit("error", {"message": f"Session not found: {session_id}"})
@@ -123,12 +390,16 @@ def register_handlers(socketio: SocketIO) -> None:
         {
             "session_id": "...",
             "content": "用户输入的描述",
-            "model_target": "z-image-turbo"
+            "model_target": "z-image-turbo",
+            "request_id": "..."  (optional, echoed in "complete" and kept on the trace)
         }
         """
         session_id = data.get("session_id")
         content = data.get("content", "")
         model_target = data.get("model_target", "z-image-turbo")
+        request_id = data.get("request_id")
+        if not isinstance(request_id, str) or not 0 < len(request_id) <= 64:
+            request_id = None
         
         debug_log("SocketHandler", f"→ user_message: session_id={session_id}, content={content[:50]}...")
         
@@ -148,11 +419,10 @@ def register_handlers(socketio: SocketIO) -> None:
             emit("error", {"message": f"Session not found: {session_id}"})
             return
         
-        session_manager.set_status(session_id, "working")
-        emit("status_update", {"status": "working"}, room=session_id)
-        
-        # Add user message to history
-        session_manager.add_message(session_id, "user", content)
+        # Only the first turn of a conversation is independent of context
+        first_turn = not session.history
+        existing_opencode_id = session_manager.get_opencode_session(session_id)
+        context_free = first_turn and not existing_opencode_id
         
         # Create debug emitter for this request
         def emit_to_room(event: str, data: dict, room: str) -> None:
@@ -160,27 +430,159 @@ def register_handlers(socketio: SocketIO) -> None:
         
         debug = get_debug_emitter(emit_to_room, session_id)
         
-        # Execute prompt generation in thread pool
-        def generate_prompt() -> None:
+        # Per-request timing spans under a server-generated id
+        tracer = get_tracer()
+        trace = tracer.start_trace(
+            "generation", session_id, model_target=model_target, request_id=request_id
+        )
+        
+        with tracer.activate(trace):
+            # Get skill registry and build system prompt
+            skill_registry = get_skill_registry()
+            debug.debug("SkillRegistry", "Loading skills: %s", session.skills)
+            skills = skill_registry.load_skills(session.skills)
+            compiled_prompt = skill_registry.compile_prompt(session.skills)
+            
+            if compiled_prompt.text:
+                debug.info("SkillRegistry", f"Loaded {len(skills)} skills, prompt length: {len(compiled_prompt.text)}, fingerprint: {compiled_prompt.fingerprint}")
+            else:
+                debug.warn("SkillRegistry", "No skills loaded or empty system prompt")
+            
+            # Pre-select matching library styles so the agent needs no fs_read round-trip
+            style_index = get_style_index()
+            style_matches = style_index.search(
+                content,
+                model_target=model_target,
+                categories=skill_registry.get_style_categories(session.skills),
+            )
+            styles = style_index.format_for_prompt(style_matches)
+            debug.debug("StyleIndex", lambda: f"Matched styles: {[m.style.get('id') for m in style_matches]}")
+            
+            # Identical first request under the same skills and styles: reuse the
+            # stored result. Follow-ups depend on the conversation, so never cached.
+            result_cache = get_result_cache()
+            cache_key = make_cache_key(content, compiled_prompt.fingerprint, model_target, styles)
+            cached = None
+            if context_free:
+                with trace_span("cache.lookup") as span:
+                    cached = result_cache.get(cache_key)
+                    if span is not None:
+                        span.attrs["hit"] = bool(cached)
+        
+        def finish_trace(status: str, started: float) -> None:
+            tracer.finish(trace, status)
+            _generations.inc(outcome=status)
+            _generation_seconds.observe(time.monotonic() - started)
+            if tracer.enabled:
+                socketio.emit("trace", {
+                    "session_id": session_id,
+                    "trace": trace.to_dict(),
+                }, room=session_id)
+        
+        def publish_result(job: GenerationJob | None, output: dict[str, str], cached: bool = False) -> bool:
+            """Record and broadcast a formatted output. False if the job was aborted."""
+            with trace_span("emit", cached=cached):
+                return _publish_result(job, output, cached)
+        
+        def _publish_result(job: GenerationJob | None, output: dict[str, str], cached: bool) -> bool:
+            # An abort may have raced the reply; publish only if it did not win
+            if job is not None and not job.try_commit():
+                debug.warn("PromptGenerator", "Generation aborted, discarding late result")
+                return False
+            
+            # Add assistant message to history (the raw response is the content)
+            metadata = {k: v for k, v in output.items() if k != "raw_response"}
+            session_manager.add_message(
+                session_id,
+                "assistant",
+                output.get("raw_response", ""),
+                metadata=metadata,
+            )
+            
+            # Send complete event with formatted outputs
+            socketio.emit("complete", {
+                "session_id": session_id,
+                "prompt_english": output["prompt_english"],
+                "prompt_json": output["prompt_json"],
+                "prompt_bilingual": output["prompt_bilingual"],
+                "cached": cached,
+                "request_id": request_id,
+                "trace_id": trace.id,
+            }, room=session_id)
+            
+            # Store output for ComfyUI node to retrieve
+            session_manager.set_output(
+                session_id,
+                prompt_english=output["prompt_english"],
+                prompt_json=output["prompt_json"],
+                prompt_bilingual=output["prompt_bilingual"],
+            )
+            debug.debug("SessionManager", "Stored output for session_id=%s, english=%d chars", session_id, len(output["prompt_english"]))
+            
+            if cached:
+                session_manager.set_status(session_id, "idle")
+                socketio.emit("status_update", {"status": "idle"}, room=session_id)
+            return True
+        
+        if cached:
+            # Answered right away: a hit never waits in the queue behind real generations
+            debug.info("ResultCache", f"Cache hit, skipping OpenCode (key={cache_key[:12]})")
+            trace.attrs["cached"] = True
+            session_manager.add_message(session_id, "user", content)
+            with tracer.activate(trace):
+                publish_result(None, cached, cached=True)
+            finish_trace("cached", trace.start)
+            debug.flush()
+            return
+        
+        if not _scheduler.has_capacity(session_id):
+            debug_log("SocketHandler", f"  Queue full, rejecting request for {session_id}", level="WARNING")
+            tracer.finish(trace, "rejected")
+            _generations.inc(outcome="rejected")
+            emit("busy", {
+                "session_id": session_id,
+                "content": content,
+                "message": "Generation queue is full, please retry shortly",
+            })
+            return
+        
+        session_manager.set_status(session_id, "working")
+        emit("status_update", {"status": "working"}, room=session_id)
+        
+        # Add user message to history
+        user_message = session_manager.add_message(session_id, "user", content)
+        
+        # Prompt generation coroutine, run by the scheduler on the shared event loop
+        async def generate_prompt(job: GenerationJob) -> None:
+            trace.add_span("queue", job.enqueued_at, job.started_at or time.monotonic())
+            if job.queue_wait is not None:
+                _queue_wait_seconds.observe(job.queue_wait)
+            status = "ok"
+            try:
+                with tracer.activate(trace):
+                    await run_generation(job)
+            except asyncio.CancelledError:
+                status = "cancelled"
+                raise
+            finally:
+                session_manager.set_provisional_output(session_id, "")
+                current = session_manager.get_session(session_id)
+                if job.cancelled:
+                    status = "cancelled"
+                elif current is not None and current.status == "error":
+                    status = "error"
+                finish_trace(status, job.enqueued_at)
+        
+        async def run_generation(job: GenerationJob) -> None:
             try:
                 debug.info("PromptGenerator", f"Starting generation for: {content[:50]}...")
                 
-                # Get skill registry and build system prompt
-                skill_registry = get_skill_registry()
-                debug.debug("SkillRegistry", f"Loading skills: {session.skills}")
-                system_prompt = skill_registry.get_combined_prompt(session.skills)
-                
-                if system_prompt:
-                    debug.info("SkillRegistry", f"Loaded {len(session.skills)} skills, prompt length: {len(system_prompt)}")
-                else:
-                    debug.warn("SkillRegistry", "No skills loaded or empty system prompt")
-                
                 # Get OpenCode client
-                opencode_client = get_opencode_client()
-                debug.debug("OpenCode", "Checking OpenCode server status...")
+                opencode_client = get_async_opencode_client()
+                debug.debug("OpenCode", "Checking OpenCode server status (queued %.2fs)...", job.queue_wait)
                 
                 # Ensure server is running
-                if not opencode_client.ensure_server_running():
+                if not await opencode_client.ensure_server_running():
                     debug.error("OpenCode", "OpenCode Server is not available")
                     socketio.emit("error", {
                         "message": "OpenCode Server is not available. Please ensure 'opencode' is installed.",
@@ -191,14 +593,13 @@ def register_handlers(socketio: SocketIO) -> None:
                 debug.info("OpenCode", "OpenCode Server is running")
                 
                 # Get or create OpenCode session (reuse existing if available)
-                existing_opencode_id = session_manager.get_opencode_session(session_id)
-                
+                recap = ""
                 if existing_opencode_id:
                     debug.info("OpenCode", f"Reusing existing OpenCode session: {existing_opencode_id}")
                     opencode_session = {"id": existing_opencode_id}
                 else:
                     debug.debug("OpenCode", "Creating new OpenCode session...")
-                    opencode_session = opencode_client.create_session(
+                    opencode_session = await opencode_client.create_session(
                         title=f"PromptSkills-{session_id[:8]}"
                     )
                     
@@ -213,29 +614,69 @@ def register_handlers(socketio: SocketIO) -> None:
                     # Store the OpenCode session ID for future reuse
                     session_manager.set_opencode_session(session_id, opencode_session["id"])
                     debug.info("OpenCode", f"New OpenCode session created and stored: id={opencode_session.get('id', 'unknown')}")
+                    # Turns it has not seen (e.g. answered from the cache) are replayed
+                    history = list(session.history)
+                    turn_index = next((i for i, m in enumerate(history) if m is user_message), len(history))
+                    recap = format_recap(history[:turn_index])
                 
-                # Build full prompt with skills context
-                full_prompt = f"""你是一个专业的AI图像提示词工程师。
-
-{system_prompt}
-
-用户请求: {content}
-目标模型: {model_target}
-
-请根据上述技能和用户请求，生成高质量的提示词。输出JSON格式，包含以下字段:
-- positive_prompt: 英文提示词（逗号分隔）
-- subject_zh/subject_en: 主体描述（中英双语）
-- style: 风格描述
-- tech_specs: 技术参数
-"""
+                # Skills go in the system prompt; the turn itself carries only the request
+                assembled = build_system_prompt(skills, styles, compiled_prompt.fingerprint)
+                turn_system = assembled.text
+                turn_content = recap + USER_PROMPT_TEMPLATE.format(content=content, model_target=model_target)
                 
-                debug.debug("OpenCode", f"Sending message to OpenCode (length={len(full_prompt)})")
+                debug.info("PromptAssembler", f"{assembled.summary()}; request={estimate_tokens(turn_content)}t")
+                if assembled.reduced:
+                    debug.warn("PromptAssembler", f"System prompt reduced to fit the {assembled.budget} token budget")
                 
-                # Send message and get response
-                response = opencode_client.send_message(
-                    session_id=opencode_session["id"],
-                    content=full_prompt,
+                # Subscribe to the SSE stream so tokens reach the room while generating
+                streamed: list[str] = []
+                partial_parser = StreamingPromptParser()
+                
+                def on_delta(delta: str) -> None:
+                    if job.cancelled:
+                        return
+                    if not streamed:
+                        trace.attrs["first_delta_ms"] = round(trace.duration * 1000, 3)
+                        _first_delta_seconds.observe(time.monotonic() - (job.started_at or job.enqueued_at))
+                    socketio.emit("stream_delta", {
+                        "session_id": session_id,
+                        "delta": delta,
+                        "index": len(streamed),
+                    }, room=session_id)
+                    streamed.append(delta)
+                    
+                    # Publish the prompt as soon as its field is complete
+                    provisional = partial_parser.feed(delta)
+                    if provisional:
+                        debug.info("Formatter", f"Provisional prompt ready after {len(streamed)} deltas")
+                        socketio.emit("partial_output", {
+                            "session_id": session_id,
+                            "prompt_english": provisional,
+                            "provisional": True,
+                        }, room=session_id)
+                        # Not an output yet: the node and waiters keep the last final one
+                        session_manager.set_provisional_output(session_id, provisional)
+                
+                event_router = get_event_router()
+                event_router.subscribe(opencode_session["id"], on_delta)
+                stream_ready = await asyncio.to_thread(
+                    event_router.wait_until_ready, opencode_client.config.stream_ready_timeout
                 )
+                if not stream_ready:
+                    debug.warn("OpenCode", "Event stream unavailable, response will arrive in one piece")
+                
+                debug.debug("OpenCode", "Sending message to OpenCode (system=%d, content=%d)", len(turn_system), len(turn_content))
+                
+                # Send message and get response
+                try:
+                    with _llm_seconds.time():
+                        response = await opencode_client.send_message(
+                            session_id=opencode_session["id"],
+                            content=turn_content,
+                            system=turn_system,
+                        )
+                finally:
+                    event_router.unsubscribe(opencode_session["id"], on_delta)
                 
                 if not response:
                     debug.error("OpenCode", "Failed to get response from OpenCode")
@@ -247,101 +688,137 @@ def register_handlers(socketio: SocketIO) -> None:
                 
                 debug.info("OpenCode", "Response received from OpenCode")
                 
-                # Get messages to find the response
-                messages = opencode_client.get_messages(opencode_session["id"])
-                debug.debug("OpenCode", f"Retrieved {len(messages)} messages from session")
-                debug.debug("OpenCode", f"Raw messages: {messages}") # Added debug log
-                
-                # OpenCode API returns messages in nested format:
-                # { "info": {"role": "assistant", ...}, "parts": [{"type": "text", "text": "..."}] }
-                def get_message_role(m: dict) -> str | None:
-                    """Extract role from nested message format."""
-                    return m.get("info", {}).get("role")
-                
-                def get_message_text(m: dict) -> str:
-                    """Extract text content from message parts."""
-                    parts = m.get("parts", [])
-                    text_parts = [p.get("text", "") for p in parts if p.get("type") == "text"]
-                    return "".join(text_parts)
+                # The send response already carries the assistant reply
+                messages = [response]
+                if message_role(response) != "assistant" or not message_text(response):
+                    # Fall back to the messages after our prompt, not the whole transcript
+                    parent_id = (response.get("info") or {}).get("parentID")
+                    messages = await opencode_client.get_messages_since(opencode_session["id"], parent_id)
+                    debug.debug("OpenCode", "Retrieved %d new messages from session", len(messages))
+                    debug.debug("OpenCode", "Raw messages: %r", messages)
                 
-                assistant_messages = [m for m in messages if get_message_role(m) == "assistant"]
+                assistant_messages = [m for m in messages if message_role(m) == "assistant"]
                 
                 if assistant_messages:
-                    raw_response = get_message_text(assistant_messages[-1])
-                    debug.info("OpenCode", f"Assistant response: {len(raw_response)} chars")
+                    raw_response = message_text(assistant_messages[-1])
+                    debug.info("OpenCode", f"Assistant response: {len(raw_response)} chars, streamed {len(streamed)} deltas")
                     
-                    # Stream the response in chunks for typing effect
-                    chunks = [raw_response[i:i+20] for i in range(0, len(raw_response), 20)]
-                    for idx, chunk in enumerate(chunks):
-                        socketio.emit("stream_delta", {
+                    # Deliver what the stream missed (all of it without a live stream)
+                    streamed_text = "".join(streamed)
+                    if raw_response.startswith(streamed_text):
+                        if len(raw_response) > len(streamed_text):
+                            on_delta(raw_response[len(streamed_text):])
+                    else:
+                        debug.warn("OpenCode", "Streamed text diverged from the reply, resyncing clients")
+                        socketio.emit("stream_resync", {
                             "session_id": session_id,
-                            "delta": chunk,
-                            "index": idx,
+                            "text": raw_response,
                         }, room=session_id)
                     
                     # Log raw response for debugging
-                    debug.debug("OpenCode", f"Raw response first 500 chars: {raw_response[:500]}...")
+                    debug.debug("OpenCode", lambda: f"Raw response first 500 chars: {raw_response[:500]}...")
                     
                     # Format output
                     formatter = get_output_formatter()
-                    formatted = formatter.format_for_model(raw_response, model_target)
+                    with _format_seconds.time():
+                        formatted = formatter.format_for_model(raw_response, model_target)
                     
                     # Detailed debug logging
-                    debug.debug("Formatter", f"Formatted output: english={len(formatted.prompt_english)} chars")
-                    debug.debug("Formatter", f"English (first 200): {formatted.prompt_english[:200]}...")
-                    debug.debug("Formatter", f"JSON (first 200): {formatted.prompt_json[:200]}...")
-                    
-                    # Add assistant message to history
-                    session_manager.add_message(
-                        session_id, 
-                        "assistant", 
-                        raw_response,
-                        metadata=formatted.to_dict(),
-                    )
-                    
-                    # Send complete event with formatted outputs
-                    socketio.emit("complete", {
-                        "session_id": session_id,
-                        "prompt_english": formatted.prompt_english,
-                        "prompt_json": formatted.prompt_json,
-                        "prompt_bilingual": formatted.prompt_bilingual,
-                    }, room=session_id)
+                    debug.debug("Formatter", "Formatted output: english=%d chars", len(formatted.prompt_english))
+                    debug.debug("Formatter", lambda: f"English (first 200): {formatted.prompt_english[:200]}...")
+                    debug.debug("Formatter", lambda: f"JSON (first 200): {formatted.prompt_json[:200]}...")
                     
-                    # Store output for ComfyUI node to retrieve
-                    session_manager.set_output(
-                        session_id,
-                        prompt_english=formatted.prompt_english,
-                        prompt_json=formatted.prompt_json,
-                        prompt_bilingual=formatted.prompt_bilingual,
-                    )
-                    debug.debug("SessionManager", f"Stored output for session_id={session_id}, english={len(formatted.prompt_english)} chars")
+                    if not publish_result(job, formatted.to_dict()):
+                        return
+                    if context_free and formatted.prompt_english:
+                        # The disk tier writes synchronously; keep it off the event loop
+                        await asyncio.to_thread(result_cache.put, cache_key, formatted.to_dict())
                     
                     debug.info("PromptGenerator", "Generation complete!")
                 else:
                     debug.warn("OpenCode", "No assistant message found in response")
                     # Log all messages for debugging with correct nested format access
                     for i, msg in enumerate(messages):
-                        role = get_message_role(msg)
-                        text = get_message_text(msg)[:100]
+                        role = message_role(msg)
+                        text = message_text(msg)[:100]
                         debug.warn("OpenCode", f"  Message[{i}]: role={role}, content={text}...")
 
                 
                 session_manager.set_status(session_id, "idle")
                 socketio.emit("status_update", {"status": "idle"}, room=session_id)
                 
+            except asyncio.CancelledError:
+                debug.warn("PromptGenerator", f"Generation cancelled: job={job.id}")
+                raise
             except Exception as e:
+                if job.cancelled:
+                    return
                 debug.error("PromptGenerator", f"Exception: {str(e)}")
                 import traceback
-                debug.debug("PromptGenerator", f"Traceback: {traceback.format_exc()}")
+                debug.debug("PromptGenerator", lambda: f"Traceback: {traceback.format_exc()}")
                 socketio.emit("error", {
                     "message": f"Error generating prompt: {str(e)}",
                 }, room=session_id)
                 session_manager.set_status(session_id, "error")
                 socketio.emit("status_update", {"status": "error"}, room=session_id)
+            finally:
+                debug.flush()
+        
+        # Submit to scheduler
+        job = _scheduler.submit(session_id, generate_prompt)
+        if job is None:
+            # Queue filled up between the capacity check and submission
+            tracer.finish(trace, "rejected")
+            _generations.inc(outcome="rejected")
+            session_manager.set_status(session_id, "idle")
+            emit("busy", {
+                "session_id": session_id,
+                "content": content,
+                "message": "Generation queue is full, please retry shortly",
+            })
+            emit("status_update", {"status": "idle"}, room=session_id)
+            return
+        debug_log("SocketHandler", f"  Submitted generation job {job.id} to scheduler")
+    
+    @socketio.on("generate_batch")
+    def handle_generate_batch(data: dict[str, Any]) -> None:
+        """
+        Generate several prompt variants for one request.
+        
+        Expected data:
+        {
+            "session_id": "...",
+            "content": "用户输入的描述",
+            "model_target": "z-image-turbo",
+            "count": 4
+        }
+        """
+        session_id = data.get("session_id")
+        content = data.get("content", "")
+        model_target = data.get("model_target", "z-image-turbo")
+        count = parse_batch_count(data.get("count"))
+        
+        debug_log("SocketHandler", f"→ generate_batch: session_id={session_id}, count={count}, content={content[:50]}...")
         
-        # Submit to thread pool
-        debug_log("SocketHandler", "  Submitting generation task to thread pool")
-        _executor.submit(generate_prompt)
+        if not session_id:
+            emit("error", {"message": "session_id is required"})
+            return
+        
+        if not content:
+            emit("error", {"message": "content is required"})
+            return
+        
+        if not get_session_manager().get_session(session_id):
+            emit("error", {"message": f"Session not found: {session_id}"})
+            return
+        
+        job = submit_batch(socketio, session_id, content, model_target, count)
+        if job is None:
+            # Not "busy": clients add nothing optimistically for a batch, and
+            # the request enters the history only once the job is accepted
+            emit("error", {"message": "Generation queue is full, please retry shortly"})
+            return
+        emit("batch_started", {"session_id": session_id, "batch_id": job.id, "count": count})
     
     @socketio.on("list_skills")
     def handle_list_skills(data: dict[str, Any]) -> None:
@@ -363,6 +840,18 @@ def register_handlers(socketio: SocketIO) -> None:
         
         if session_id:
             session_manager = get_session_manager()
+            
+            # Drop queued jobs and cancel the running one (aborts its HTTP request)
+            cancelled = _scheduler.cancel_session(session_id)
+            if any(job.started_at is not None for job in cancelled):
+                opencode_session_id = session_manager.get_opencode_session(session_id)
+                if opencode_session_id:
+                    # Stop the model on the OpenCode side too
+                    get_background_loop().submit(
+                        get_async_opencode_client().abort_session(opencode_session_id)
+                    )
+            debug_log("SocketHandler", f"  Cancelled {len(cancelled)} job(s)")
+            
             session_manager.set_status(session_id, "idle")
             emit("status_update", {"status": "idle"}, room=session_id)
             emit("debug_log", {
@@ -391,21 +880,13 @@ def register_handlers(socketio: SocketIO) -> None:
         
         if opencode_session:
             session_manager.set_opencode_session(session_id, opencode_session["id"])
-            # Clear history since we're starting fresh
-            session = session_manager.get_session(session_id)
-            if session:
-                session.history = []
-                session.last_output = {
-                    "prompt_english": "",
-                    "prompt_json": "",
-                    "prompt_bilingual": "",
-                }
+            # Clear history since we're starting fresh (clients get the deltas)
+            session_manager.replace_history(session_id, [])
             
             debug_log("SocketHandler", f"  Created new OpenCode session: {opencode_session['id']}")
             emit("opencode_session_changed", {
                 "opencode_session_id": opencode_session["id"],
             }, room=session_id)
-            emit("sync_state", session.to_dict() if session else {}, room=session_id)
         else:
             emit("error", {"message": "Failed to create OpenCode session"})
     
@@ -432,28 +913,20 @@ def register_handlers(socketio: SocketIO) -> None:
             return
         
         # Load messages from OpenCode session
+        history: list[dict[str, Any]] = []
+        last_output: dict[str, str] = {}
         try:
             messages = opencode_client.get_messages(opencode_session_id)
             debug_log("SocketHandler", f"  Loaded {len(messages)} messages from OpenCode session")
             
-            # Helper functions for nested message format
-            def get_message_role(m: dict) -> str | None:
-                return m.get("info", {}).get("role")
-            
-            def get_message_text(m: dict) -> str:
-                parts = m.get("parts", [])
-                text_parts = [p.get("text", "") for p in parts if p.get("type") == "text"]
-                return "".join(text_parts)
-            
             # Rebuild history from OpenCode messages
-            session.history = []
             last_assistant_content = ""
             
             for msg in messages:
-                role = get_message_role(msg)
-                content = get_message_text(msg)
+                role = message_role(msg)
+                content = message_text(msg)
                 if role in ["user", "assistant"] and content:
-                    session.history.append({
+                    history.append({
                         "role": role,
                         "content": content
                     })
@@ -466,27 +939,16 @@ def register_handlers(socketio: SocketIO) -> None:
                 model_target = session.config.get("model_target", "z-image-turbo")
                 formatted = formatter.format_for_model(last_assistant_content, model_target)
                 
-                session.last_output = {
-                    "prompt_english": formatted.prompt_english,
-                    "prompt_json": formatted.prompt_json,
-                    "prompt_bilingual": formatted.prompt_bilingual,
-                }
+                last_output = formatted.to_dict(include_raw=False)
                 debug_log("SocketHandler", f"  Restored last output: english={len(formatted.prompt_english)} chars")
-            else:
-                session.last_output = {
-                    "prompt_english": "",
-                    "prompt_json": "",
-                    "prompt_bilingual": "",
-                }
                 
         except Exception as e:
             debug_log("SocketHandler", f"  Error loading messages: {e}", level="ERROR")
-            session.history = []
-            session.last_output = {
-                "prompt_english": "",
-                "prompt_json": "",
-                "prompt_bilingual": "",
-            }
+            history = []
+            last_output = {}
+        
+        # Clients receive the new history as a sync delta
+        session = session_manager.replace_history(session_id, history, last_output) or session
         
         debug_log("SocketHandler", f"  Selected OpenCode session: {opencode_session_id}, history={len(session.history)} msgs")
         emit("opencode_session_changed", {
@@ -500,7 +962,6 @@ def register_handlers(socketio: SocketIO) -> None:
                 "prompt_json": session.last_output["prompt_json"],
                 "prompt_bilingual": session.last_output["prompt_bilingual"],
             }, room=session_id)
-        emit("sync_state", session.to_dict(), room=session_id)
     
     @socketio.on("delete_opencode_session")
     def handle_delete_opencode_session(data: dict[str, Any]) -> None:
@@ -525,14 +986,8 @@ def register_handlers(socketio: SocketIO) -> None:
             current = session_manager.get_opencode_session(session_id)
             if current == opencode_session_id:
                 session_manager.clear_opencode_session(session_id)
-                session = session_manager.get_session(session_id)
-                if session:
-                    session.history = []
-                    session.last_output = {
-                        "prompt_english": "",
-                        "prompt_json": "",
-                        "prompt_bilingual": "",
-                    }
+                # Clears history and output; clients get the delta, waiters wake up
+                session_manager.replace_history(session_id, [])
                 emit("opencode_session_changed", {
                     "opencode_session_id": None,
                 }, room=session_id)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the Prompt Skills plugin.
+
+Loads the plugin package the way ComfyUI does (in a fresh interpreter per
+run) and reports:
+- import_s:  time spent in the plugin import (ComfyUI's custom node load time)
+- heavy:     Flask / Socket.IO / httpx modules already loaded when the import returns
+- bind_s:    time until /health answers on the Socket.IO port
+- opencode:  OpenCode warm-up state and duration once it settles (or times out)
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 3] [--opencode-timeout 20]
+"""
+
+from __future__ import annotations
+import argparse
+import importlib.util
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+PLUGIN_DIR = Path(__file__).parent.parent.resolve()
+HEAVY_MODULES = ("flask", "flask_socketio", "socketio", "httpx")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get_health(port: int) -> dict | None:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=0.5) as response:
+            return json.loads(response.read())
+    except OSError:
+        return None
+
+
+def child(port: int, opencode_timeout: float) -> None:
+    """Measure one cold start in this (fresh) interpreter."""
+    started = time.perf_counter()
+    spec = importlib.util.spec_from_file_location(
+        "comfyui_prompt_skills",
+        PLUGIN_DIR / "__init__.py",
+        submodule_search_locations=[str(PLUGIN_DIR)],
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    import_s = time.perf_counter() - started
+    heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    bind_s = None
+    while time.perf_counter() - started < 30:
+        health = get_health(port)
+        if health:
+            bind_s = time.perf_counter() - started
+            break
+        time.sleep(0.01)
+
+    opencode = health.get("opencode") if bind_s is not None else None
+    deadline = time.perf_counter() + opencode_timeout
+    while opencode and opencode["state"] == "starting" and time.perf_counter() < deadline:
+        time.sleep(0.1)
+        opencode = (get_health(port) or {}).get("opencode", opencode)
+
+    print(json.dumps({"import_s": import_s, "heavy": heavy, "bind_s": bind_s, "opencode": opencode}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--opencode-timeout", type=float, default=20.0)
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.opencode_timeout)
+        return
+
+    results = []
+    for run in range(args.runs):
+        port = free_port()
+        env = {**os.environ, "COMFYUI_PROMPT_SKILLS_PORT": str(port), "COMFYUI_PROMPT_SKILLS_TESTING": "1"}
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", str(port), "--opencode-timeout", str(args.opencode_timeout)],
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=args.opencode_timeout + 60,
+        ).stdout.strip().splitlines()
+        result = json.loads(output[-1])
+        results.append(result)
+        print(f"run {run + 1}: {json.dumps(result)}")
+
+    imports = [r["import_s"] for r in results]
+    binds = [r["bind_s"] for r in results if r["bind_s"] is not None]
+    print(f"\nplugin import: median {statistics.median(imports) * 1000:.1f} ms")
+    if binds:
+        print(f"socket bound:  median {statistics.median(binds) * 1000:.1f} ms")
+    else:
+        print("socket bound:  never (see plugin logs)")
+
+
+if __name__ == "__main__":
+    main()
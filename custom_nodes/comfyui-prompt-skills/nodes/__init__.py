@@ -1,6 +1,7 @@
 """ComfyUI Nodes Package"""
 
 from .container_node import OpencodeContainerNode
+from .batch_prompt_node import PromptBatchNode
 from .show_text_node import ShowTextNode
 
-__all__ = ["OpencodeContainerNode", "ShowTextNode"]
+__all__ = ["OpencodeContainerNode", "PromptBatchNode", "ShowTextNode"]
@@ -0,0 +1,127 @@
+"""
+Tier 1: PromptBatchNode - Prompt Generation from a List of Requests
+
+Generates one prompt per input request inside a workflow run, so dataset
+prompt generation can be queued in ComfyUI instead of typed into the chat
+UI. Requests come from a multiline string (one per line) or a list input;
+outputs are lists in the same order, with empty strings for items that
+failed or timed out.
+"""
+
+from __future__ import annotations
+from typing import Any
+
+
+def split_requests(values: list[str]) -> list[str]:
+    """Flatten list and multiline inputs into non-empty request lines."""
+    requests = []
+    for value in values:
+        requests.extend(line.strip() for line in str(value).splitlines() if line.strip())
+    return requests
+
+
+class PromptBatchNode:
+    """
+    Batch prompt generation node for ComfyUI.
+    
+    Every request is generated in its own short-lived OpenCode session with
+    the selected skills, at most ``concurrency`` at a time. The run is one
+    generation scheduler job, so it queues behind chat sessions and shares
+    their global concurrency cap. The node blocks until all items finish
+    or ``timeout`` seconds (queueing included) have passed.
+    """
+    
+    def __init__(self) -> None:
+        pass
+    
+    @classmethod
+    def INPUT_TYPES(cls) -> dict[str, Any]:
+        return {
+            "required": {
+                "requests": ("STRING", {
+                    "default": "",
+                    "multiline": True,
+                    "placeholder": "One request per line",
+                }),
+                "skills": ("STRING", {
+                    "default": "z-photo",
+                    "multiline": False,
+                    "placeholder": "Comma-separated skill IDs",
+                }),
+            },
+            "optional": {
+                "model_target": (["z-image-turbo", "sdxl"], {
+                    "default": "z-image-turbo"
+                }),
+                "concurrency": ("INT", {
+                    "default": 2,
+                    "min": 1,
+                    "max": 8,
+                }),
+                "timeout": ("INT", {
+                    "default": 600,
+                    "min": 10,
+                    "max": 86400,
+                }),
+            },
+        }
+    
+    # Accept a list of requests from upstream nodes as a single call
+    INPUT_IS_LIST = True
+    RETURN_TYPES = ("STRING", "STRING", "STRING")
+    RETURN_NAMES = ("prompt_english", "prompt_json", "prompt_bilingual")
+    OUTPUT_IS_LIST = (True, True, True)
+    FUNCTION = "run"
+    CATEGORY = "Prompt Skills"
+    
+    def run(
+        self,
+        requests: list[str],
+        skills: list[str],
+        model_target: list[str] | None = None,
+        concurrency: list[int] | None = None,
+        timeout: list[int] | None = None,
+    ) -> tuple[list[str], list[str], list[str]]:
+        """
+        Execute the node.
+        
+        With INPUT_IS_LIST every argument arrives as a list; scalar widgets
+        are single-item lists.
+        """
+        items = split_requests(requests)
+        skill_ids = [s.strip() for s in (skills[0] if skills else "").split(",") if s.strip()]
+        target = model_target[0] if model_target else "z-image-turbo"
+        limit = concurrency[0] if concurrency else 2
+        seconds = timeout[0] if timeout else 600
+        print(f"[PromptSkills BatchNode] {len(items)} requests, skills={skill_ids}, concurrency={limit}")
+        
+        if not items:
+            return ([], [], [])
+        
+        try:
+            from ..backend.logic.generation import run_prompt_batch
+            
+            results = run_prompt_batch(items, skill_ids, target, concurrency=limit, timeout=seconds)
+        except Exception as e:
+            print(f"[PromptSkills BatchNode] Exception: {e}")
+            import traceback
+            traceback.print_exc()
+            results = [None] * len(items)
+        
+        outputs = [output or {} for output in results]
+        print(f"[PromptSkills BatchNode] {sum(1 for o in outputs if o)}/{len(items)} prompts generated")
+        return (
+            [o.get("prompt_english", "") for o in outputs],
+            [o.get("prompt_json", "") for o in outputs],
+            [o.get("prompt_bilingual", "") for o in outputs],
+        )
+
+
+# Node registration for ComfyUI
+NODE_CLASS_MAPPINGS = {
+    "PromptBatchNode": PromptBatchNode,
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "PromptBatchNode": "Prompt Skills Batch",
+}
@@ -45,6 +45,14 @@ class OpencodeContainerNode:
                 "model_target": (["z-image-turbo", "sdxl"], {
                     "default": "z-image-turbo"
                 }),
+                "wait_for_generation": ("BOOLEAN", {
+                    "default": False,
+                }),
+                "wait_timeout": ("INT", {
+                    "default": 300,
+                    "min": 1,
+                    "max": 3600,
+                }),
             },
             "hidden": {
                 "unique_id": "UNIQUE_ID"
@@ -60,18 +68,32 @@ class OpencodeContainerNode:
     @classmethod
     def IS_CHANGED(cls, session_id, **kwargs):
         """
-        Force ComfyUI to always re-execute this node.
-        Returning NaN means the node output is never cached.
-        This is necessary because the output depends on external state
-        (SessionManager) that changes outside of ComfyUI's input tracking.
+        Return the session's output version.
+        
+        The output depends on external state (SessionManager) that changes
+        outside of ComfyUI's input tracking. The version only moves when a
+        different prompt is stored, so re-queuing a workflow reuses cached
+        downstream results until a new prompt is generated.
         """
-        return float("NaN")
+        try:
+            from ..backend.core import get_session_manager
+            session_manager = get_session_manager()
+            session = session_manager.get_session(session_id)
+            if kwargs.get("wait_for_generation") and session and session.status == "working":
+                # Run (and wait) rather than reuse the output being replaced
+                return float("NaN")
+            return session_manager.get_output_version(session_id)
+        except Exception:
+            # Without the backend, never cache
+            return float("NaN")
     
     def run(
         self,
         session_id: str,
         api_endpoint: str = "http://127.0.0.1:5000",
         model_target: str = "z-image-turbo",
+        wait_for_generation: bool = False,
+        wait_timeout: int = 300,
         unique_id: str = "",
     ) -> tuple[str, str, str]:
         """
@@ -79,6 +101,9 @@ class OpencodeContainerNode:
         
         Retrieves the latest generated prompts from the SessionManager.
         User should generate prompts via WebSocket/Vue UI first, then run the workflow.
+        With wait_for_generation, a run queued while a generation is in
+        progress blocks (up to wait_timeout seconds) for its result instead
+        of returning the previous prompt.
         """
         # Get output directly from session manager (no waiting needed)
         try:
@@ -101,6 +126,14 @@ class OpencodeContainerNode:
                 all_sessions = session_manager.list_sessions()
                 print(f"[PromptSkills Node] Available sessions: {all_sessions}")
             
+            # Read the version before the status so a result landing in between is not missed
+            since_version = session_manager.get_output_version(session_id)
+            if wait_for_generation and session and session.status == "working":
+                print(f"[PromptSkills Node] Generation in progress, waiting up to {wait_timeout}s")
+                waited = session_manager.wait_for_output(session_id, since_version, timeout=wait_timeout)
+                if waited and not waited["changed"]:
+                    print(f"[PromptSkills Node] No new output (status={waited['status']}), using the previous one")
+            
             output = session_manager.get_output(session_id)
             
             result = (
@@ -4,6 +4,9 @@ Standalone Runner for Prompt Skills Logic Layer (Tier 2/3)
 
 This script starts the Flask server and SocketIO interface independent of ComfyUI.
 It allows testing the backend logic and OpenCode integration directly.
+
+See backend/logic/server.py for the host, port, debug and connection-limit
+settings.
 """
 
 import sys
@@ -17,43 +20,48 @@ from pathlib import Path
 PROJECT_ROOT = Path(__file__).parent.resolve()
 sys.path.insert(0, str(PROJECT_ROOT))
 
-from backend import create_app, socketio, get_opencode_client
+from backend import create_app, get_opencode_client
+from backend.logic import ServerConfig, run_server
 
 def main():
     print("=" * 60)
     print("🎨 Prompt Skills - Standalone Server")
     print("=" * 60)
     
-    # 1. Start OpenCode Server (Tier 3)
-    print("\n[Tier 3] Checking OpenCode Server...")
+    # 1. Start OpenCode Server (Tier 3) in the background
+    print("\n[Tier 3] Warming up OpenCode Server in the background...")
     
-    # Configure OpenCode Client
-    from backend.core import get_opencode_client, OpencodeConfig
+    from backend.core import get_opencode_warmup
     
     # Determine config path: repo root
     repo_root = PROJECT_ROOT.parent.parent
     config_path = repo_root / "opencode.json"
     
     client = get_opencode_client()
+    warmup = get_opencode_warmup()
     
     if config_path.exists():
         print(f"👉 Using OpenCode config: {config_path}")
-        client.configure(OpencodeConfig(config_path=str(config_path)))
     else:
         print("⚠️ opencode.json not found, using default configuration")
-
-    if client.ensure_server_running():
-        print("✅ OpenCode Server is running")
-    else:
-        print("❌ Failed to start OpenCode Server. Please install: npm install -g opencode")
-        sys.exit(1)
         
     # 2. Create Flask App (Tier 2)
     print("\n[Tier 2] Initializing Logic Layer...")
-    app = create_app(debug=True)
+    server_config = ServerConfig.from_env(host="127.0.0.1")
+    app = create_app(debug=server_config.debug, server_config=server_config)
+    
+    warmup.start(str(config_path) if config_path.exists() else None)
+    
+    def report_warmup():
+        if warmup.wait():
+            print(f"✅ OpenCode Server is running ({warmup.status()['elapsed']:.1f}s)")
+        else:
+            print("❌ Failed to start OpenCode Server. Please install: npm install -g opencode")
+    
+    threading.Thread(target=report_warmup, daemon=True).start()
     
     # 3. Start Server
-    port = 8189
+    port = server_config.port
     url = f"http://127.0.0.1:{port}/standalone"
     print(f"\n🚀 Server starting on port {port}")
     print(f"👉 Open web interface: {url}")
@@ -69,14 +77,7 @@ def main():
     # threading.Thread(target=open_browser).start()
     
     try:
-        socketio.run(
-            app,
-            host="127.0.0.1",
-            port=port,
-            debug=True,
-            use_reloader=False, # Disable reloader to avoid duplicate process issues in some envs
-            allow_unsafe_werkzeug=True
-        )
+        run_server(app, server_config)
     except KeyboardInterrupt:
         print("\nStopping server...")
     except Exception as e:
@@ -0,0 +1,151 @@
+"""
+Tests for AsyncOpencodeClient and BackgroundLoop (Tier 3 Core)
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from backend.core import AsyncOpencodeClient, BackgroundLoop, OpencodeConfig
+
+
+def make_client(handler, **config):
+    """AsyncOpencodeClient wired to an in-memory transport."""
+    client = AsyncOpencodeClient(OpencodeConfig(**config))
+    client._client = httpx.AsyncClient(
+        base_url=client.config.base_url,
+        transport=httpx.MockTransport(handler),
+    )
+    return client
+
+
+class TestAsyncOpencodeClient:
+    """Test AsyncOpencodeClient request handling."""
+
+    async def test_create_session(self):
+        """Should POST /session with the title."""
+        def handler(request):
+            assert request.url.path == "/session"
+            assert json.loads(request.content) == {"title": "PromptSkills-test"}
+            return httpx.Response(200, json={"id": "ses_1"})
+
+        client = make_client(handler)
+        assert await client.create_session("PromptSkills-test") == {"id": "ses_1"}
+        await client.close()
+
+    async def test_send_message_payload(self):
+        """Should send parts and system prompt to the session."""
+        def handler(request):
+            assert request.url.path == "/session/ses_1/message"
+            body = json.loads(request.content)
+            assert body["parts"] == [{"type": "text", "text": "hello"}]
+            assert body["system"] == "be brief"
+            return httpx.Response(200, json={"info": {"role": "assistant"}, "parts": []})
+
+        client = make_client(handler)
+        result = await client.send_message("ses_1", "hello", system="be brief")
+        assert result["info"]["role"] == "assistant"
+        await client.close()
+
+    async def test_failures_return_defaults(self):
+        """Non-200 responses should map to None / empty list like the sync client."""
+        client = make_client(lambda request: httpx.Response(500))
+        assert await client.create_session() is None
+        assert await client.send_message("ses_1", "hello") is None
+        assert await client.get_messages("ses_1") == []
+        assert await client.list_sessions() == []
+        assert await client.is_server_running() is False
+        await client.close()
+
+    async def test_get_messages_since_grows_window(self):
+        """Should widen the tail window until the marker message is found."""
+        transcript = [
+            {"info": {"id": f"msg_{i}", "role": "user" if i % 2 == 0 else "assistant"}, "parts": []}
+            for i in range(20)
+        ]
+        limits = []
+
+        def handler(request):
+            limit = int(request.url.params["limit"])
+            limits.append(limit)
+            return httpx.Response(200, json=transcript[-limit:])
+
+        client = make_client(handler)
+        newer = await client.get_messages_since("ses_1", "msg_5", page_size=4)
+
+        assert [m["info"]["id"] for m in newer] == [f"msg_{i}" for i in range(6, 20)]
+        assert limits == [4, 8, 16]
+        await client.close()
+
+    async def test_get_messages_since_only_fetches_tail(self):
+        """A recent marker should be found in the first small page."""
+        transcript = [{"info": {"id": f"msg_{i}"}, "parts": []} for i in range(100)]
+        client = make_client(
+            lambda request: httpx.Response(200, json=transcript[-int(request.url.params["limit"]):])
+        )
+
+        newer = await client.get_messages_since("ses_1", "msg_98")
+
+        assert [m["info"]["id"] for m in newer] == ["msg_99"]
+        await client.close()
+
+    async def test_concurrent_requests_share_one_pool(self):
+        """Many in-flight requests should be awaited concurrently on one client."""
+        in_flight = 0
+        peak = 0
+
+        async def handler(request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return httpx.Response(200, json=[])
+
+        client = make_client(handler)
+        await asyncio.gather(*(client.get_messages(f"ses_{i}") for i in range(20)))
+        assert peak == 20
+        await client.close()
+
+    async def test_stream_events(self):
+        """Should forward SSE data lines and signal open/complete."""
+        body = b'data: {"type": "a"}\n\n: keep-alive\n\ndata: {"type": "b"}\n\n'
+        client = make_client(lambda request: httpx.Response(200, content=body))
+        events = []
+        opened = []
+        completed = []
+
+        await client.stream_events(
+            on_delta=events.append,
+            on_complete=lambda: completed.append(True),
+            on_open=lambda: opened.append(True),
+        )
+
+        assert events == ['{"type": "a"}', '{"type": "b"}']
+        assert opened == [True]
+        assert completed == [True]
+        await client.close()
+
+    def test_pool_limits_from_config(self):
+        """Pool limits should come from OpencodeConfig."""
+        config = OpencodeConfig(max_connections=7, max_keepalive_connections=3, keepalive_expiry=5.0)
+        limits = config.limits
+        assert limits.max_connections == 7
+        assert limits.max_keepalive_connections == 3
+        assert limits.keepalive_expiry == 5.0
+
+
+class TestBackgroundLoop:
+    """Test the shared background event loop."""
+
+    def test_run_coroutine_from_thread(self):
+        """Coroutines submitted from a plain thread should run on the loop."""
+        loop = BackgroundLoop(name="test-loop")
+
+        async def work():
+            await asyncio.sleep(0)
+            return loop.in_loop_thread()
+
+        assert loop.run(work(), timeout=5) is True
+        assert loop.in_loop_thread() is False
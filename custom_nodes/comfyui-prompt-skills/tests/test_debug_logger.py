@@ -0,0 +1,100 @@
+"""
+Tests for lazy debug logging and batched emission (Tier 3 Core)
+"""
+
+import logging
+import threading
+
+import pytest
+from backend.core import DebugEmitter, DebugLogQueue, debug_log
+from backend.core import debug_logger as debug_logger_module
+
+
+class Recorder:
+    """emit_func that records what was sent."""
+
+    def __init__(self):
+        self.calls = []
+        self.sent = threading.Event()
+
+    def __call__(self, event, data, room):
+        self.calls.append((event, data, room))
+        self.sent.set()
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    """Global queue without the background thread; tests flush explicitly."""
+    queue = DebugLogQueue()
+    monkeypatch.setattr(queue, "_start", lambda: None)
+    monkeypatch.setattr(debug_logger_module, "_debug_log_queue", queue)
+    return queue
+
+
+class TestLazyFormatting:
+    def test_debug_not_rendered_when_disabled(self, monkeypatch, queue):
+        monkeypatch.setattr(debug_logger_module, "DEBUG_MODE", False)
+        calls = []
+        emitter = DebugEmitter(Recorder(), "s1")
+
+        emitter.debug("Test", lambda: calls.append(1) or "expensive")
+        debug_log("Test", lambda: calls.append(1) or "expensive", level="DEBUG")
+
+        assert calls == []
+        assert queue.pending == 0
+
+    def test_percent_args_are_rendered(self, queue):
+        emitter = DebugEmitter(Recorder(), "s1")
+        emitter.info("Test", "%d messages: %r", 2, ["a", "b"])
+
+        (_, _, entry), = list(queue._pending)
+        assert entry["message"] == "2 messages: ['a', 'b']"
+
+    def test_console_only_skips_disabled_levels(self):
+        logger = debug_logger_module.logger
+        level = logger.level
+        logger.setLevel(logging.ERROR)
+        try:
+            calls = []
+            DebugEmitter().info("Test", lambda: calls.append(1) or "text")
+            assert calls == []
+        finally:
+            logger.setLevel(level)
+
+
+class TestDebugLogQueue:
+    def test_batches_per_room(self, queue):
+        recorder = Recorder()
+        a = DebugEmitter(recorder, "room_a")
+        b = DebugEmitter(recorder, "room_b")
+        a.info("Test", "one")
+        b.warn("Test", "two")
+        a.error("Test", "three")
+
+        assert queue.flush() == 3
+        assert [(event, room, [e["message"] for e in data["entries"]]) for event, data, room in recorder.calls] == [
+            ("debug_logs", "room_a", ["one", "three"]),
+            ("debug_logs", "room_b", ["two"]),
+        ]
+        entry = recorder.calls[0][1]["entries"][0]
+        assert entry["level"] == "INFO" and isinstance(entry["timestamp"], str)
+
+    def test_background_flush(self, monkeypatch):
+        monkeypatch.setattr(debug_logger_module, "_debug_log_queue", DebugLogQueue(flush_interval=0.01))
+        recorder = Recorder()
+        DebugEmitter(recorder, "room_a").info("Test", "later")
+
+        assert recorder.sent.wait(2)
+        assert recorder.calls[0][1]["entries"][0]["message"] == "later"
+
+    def test_bounded(self, monkeypatch):
+        queue = DebugLogQueue(max_pending=5, max_batch=2)
+        monkeypatch.setattr(queue, "_start", lambda: None)
+        recorder = Recorder()
+        for i in range(10):
+            queue.put(recorder, "room", {"message": str(i), "timestamp": 0})
+
+        assert queue.flush() == 5
+        # Oldest entries were dropped; batches are capped at max_batch
+        assert [len(data["entries"]) for _, data, _ in recorder.calls] == [2, 2, 1]
+        assert recorder.calls[0][1]["entries"][0]["message"] == "5"
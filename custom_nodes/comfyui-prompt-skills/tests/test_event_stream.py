@@ -0,0 +1,116 @@
+"""
+Tests for EventStreamRouter (Tier 3 Core)
+"""
+
+import threading
+
+import pytest
+from backend.core import EventStreamRouter
+
+
+class FakeStreamClient:
+    """Stands in for OpencodeClient: opens the stream and idles until stopped."""
+
+    def __init__(self):
+        self.stop = threading.Event()
+
+    def stream_events(self, on_delta=None, on_complete=None, on_open=None):
+        if on_open:
+            on_open()
+        self.stop.wait(5)
+
+
+def message_updated(session_id, message_id, role="assistant"):
+    return {
+        "directory": "/tmp",
+        "payload": {
+            "type": "message.updated",
+            "properties": {"info": {"id": message_id, "sessionID": session_id, "role": role}},
+        },
+    }
+
+
+def part_updated(session_id, message_id, text, delta=None, part_id="prt_1"):
+    properties = {
+        "part": {
+            "id": part_id,
+            "sessionID": session_id,
+            "messageID": message_id,
+            "type": "text",
+            "text": text,
+        },
+    }
+    if delta is not None:
+        properties["delta"] = delta
+    return {"directory": "/tmp", "payload": {"type": "message.part.updated", "properties": properties}}
+
+
+@pytest.fixture
+def router():
+    client = FakeStreamClient()
+    router = EventStreamRouter(client=client, reconnect_delay=0.01)
+    yield router
+    client.stop.set()
+
+
+class TestEventStreamRouter:
+    """Test routing of SSE events to session subscribers."""
+
+    def test_subscribe_connects_stream(self, router):
+        """Subscribing should open the shared stream."""
+        router.subscribe("oc-1", lambda delta: None)
+        assert router.wait_until_ready(1.0)
+        assert router.is_connected
+
+    def test_routes_assistant_deltas(self, router):
+        """Deltas of assistant messages should reach the session subscriber."""
+        received = []
+        router.subscribe("oc-1", received.append)
+
+        router.handle_event(message_updated("oc-1", "msg_a"))
+        router.handle_event(part_updated("oc-1", "msg_a", "Hel", delta="Hel"))
+        router.handle_event(part_updated("oc-1", "msg_a", "Hello", delta="lo"))
+
+        assert received == ["Hel", "lo"]
+
+    def test_ignores_user_parts(self, router):
+        """The echoed user prompt should not be streamed back."""
+        received = []
+        router.subscribe("oc-1", received.append)
+
+        router.handle_event(message_updated("oc-1", "msg_u", role="user"))
+        router.handle_event(part_updated("oc-1", "msg_u", "draw a cat", delta="draw a cat"))
+
+        assert received == []
+
+    def test_ignores_other_sessions(self, router):
+        """Events for other OpenCode sessions should not leak between rooms."""
+        received = []
+        router.subscribe("oc-1", received.append)
+
+        router.handle_event(message_updated("oc-2", "msg_b"))
+        router.handle_event(part_updated("oc-2", "msg_b", "secret", delta="secret"))
+
+        assert received == []
+
+    def test_derives_delta_from_accumulated_text(self, router):
+        """Without a delta field, only the new suffix should be forwarded."""
+        received = []
+        router.subscribe("oc-1", received.append)
+
+        router.handle_event(message_updated("oc-1", "msg_a"))
+        router.handle_event(part_updated("oc-1", "msg_a", "cinematic"))
+        router.handle_event(part_updated("oc-1", "msg_a", "cinematic, rainy night"))
+
+        assert received == ["cinematic", ", rainy night"]
+
+    def test_unsubscribe_stops_delivery(self, router):
+        """Unsubscribed callbacks should not receive further deltas."""
+        received = []
+        router.subscribe("oc-1", received.append)
+        router.handle_event(message_updated("oc-1", "msg_a"))
+        router.unsubscribe("oc-1", received.append)
+
+        router.handle_event(part_updated("oc-1", "msg_a", "late", delta="late"))
+
+        assert received == []
@@ -0,0 +1,140 @@
+"""
+Tests for list generation helpers (Tier 2 Logic Layer)
+"""
+
+import asyncio
+
+import pytest
+from backend.logic import generation
+from nodes.batch_prompt_node import split_requests
+
+
+class SlowOpencodeClient:
+    """Answers with the request line; requests containing "slow" never finish."""
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.deleted = []
+
+    async def ensure_server_running(self):
+        return True
+
+    async def create_session(self, title=None):
+        return {"id": title}
+
+    async def send_message(self, session_id, content, system=None):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            request = content.splitlines()[0].split(": ", 1)[1]
+            await asyncio.sleep(3600 if "slow" in request else 0.01)
+        finally:
+            self.running -= 1
+        text = f'{{"positive_prompt": "{request}"}}'
+        return {"info": {"role": "assistant"}, "parts": [{"type": "text", "text": text}]}
+
+    async def delete_session(self, session_id):
+        self.deleted.append(session_id)
+        return True
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    client = SlowOpencodeClient()
+    monkeypatch.setattr(generation, "get_async_opencode_client", lambda: client)
+    return client
+
+
+class TestGeneratePrompts:
+    def test_order_and_concurrency(self, fake_client):
+        requests = [f"cat {i}" for i in range(6)]
+        results = asyncio.run(generation.generate_prompts(requests, [], "sdxl", concurrency=2))
+
+        assert [r["prompt_english"] for r in results] == requests
+        assert fake_client.peak == 2
+        assert len(fake_client.deleted) == 6
+
+    def test_timeout_keeps_finished_items(self, fake_client):
+        results = asyncio.run(generation.generate_prompts(
+            ["fast cat", "slow dog"], [], "sdxl", concurrency=2, timeout=0.5,
+        ))
+
+        assert results[0]["prompt_english"] == "fast cat"
+        assert results[1] is None
+        # The cancelled item still cleaned up its session
+        assert len(fake_client.deleted) == 2
+
+
+class TestRunPromptBatch:
+    """The batch node runs its list as one scheduler job."""
+
+    @pytest.fixture
+    def scheduler(self):
+        from backend.core import BackgroundLoop, GenerationScheduler, SchedulerConfig
+        return GenerationScheduler(SchedulerConfig(max_concurrent=2), loop=BackgroundLoop(name="test-node-batch"))
+
+    def test_fan_out_respects_global_cap(self, fake_client, scheduler):
+        requests = [f"cat {i}" for i in range(6)]
+        results = generation.run_prompt_batch(requests, [], "sdxl", concurrency=4, timeout=10, scheduler=scheduler)
+
+        assert [r["prompt_english"] for r in results] == requests
+        assert fake_client.peak == 2
+        assert scheduler.stats()["borrowed_slots"] == 0
+
+    def test_timeout_covers_queueing(self, fake_client, scheduler):
+        import threading
+        release = threading.Event()
+
+        async def hold(job):
+            await asyncio.to_thread(release.wait, 5)
+
+        scheduler.submit("chat-a", hold)
+        scheduler.submit("chat-b", hold)
+        try:
+            results = generation.run_prompt_batch(["cat"], [], "sdxl", timeout=0.2, scheduler=scheduler)
+        finally:
+            release.set()
+
+        assert results == [None]
+        assert fake_client.peak == 0
+
+    def test_full_queue(self, fake_client):
+        from backend.core import BackgroundLoop, GenerationScheduler, SchedulerConfig
+        scheduler = GenerationScheduler(SchedulerConfig(max_queued=0), loop=BackgroundLoop(name="test-node-full"))
+        assert generation.run_prompt_batch(["cat", "dog"], [], "sdxl", scheduler=scheduler) == [None, None]
+
+
+def test_split_requests():
+    assert split_requests(["a cat\n\n  a dog  ", "a bird"]) == ["a cat", "a dog", "a bird"]
+
+
+class TestSystemPrompt:
+    @pytest.fixture
+    def assembler(self, monkeypatch):
+        from backend.core import PromptAssembler
+
+        assembler = PromptAssembler(budget=0)
+        calls = []
+        assemble = assembler.assemble
+        monkeypatch.setattr(assembler, "assemble", lambda sections: calls.append(1) or assemble(sections))
+        monkeypatch.setattr(generation, "get_prompt_assembler", lambda: assembler)
+        monkeypatch.setattr(generation, "_skill_prompts", type(generation._skill_prompts)())
+        assembler.calls = calls
+        return assembler
+
+    def test_skill_sections_are_memoized(self, assembler):
+        from backend.core import get_skill_registry
+
+        registry = get_skill_registry()
+        skill_ids = [skill["id"] for skill in registry.list_all()][:2]
+        skills = registry.load_skills(skill_ids)
+        compiled = registry.compile_prompt(skill_ids)
+
+        first = generation.build_system_prompt(skills, "style one", compiled.fingerprint)
+        second = generation.build_system_prompt(skills, "style two", compiled.fingerprint)
+
+        assert len(assembler.calls) == 1
+        assert compiled.text in first.text
+        assert first.text.replace("style one", "style two") == second.text
+        assert first.text.endswith(generation.SYSTEM_PROMPT_FOOTER)
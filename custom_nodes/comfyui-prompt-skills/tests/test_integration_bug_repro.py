@@ -8,10 +8,11 @@ It mocks the OpenCode server interactions to simulate:
 3. Validating the system logs the full response for debugging
 """
 
+import asyncio
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
 from backend.logic import create_app, socketio
-from backend.core import get_session_manager, get_opencode_client, get_skill_registry
+from backend.core import get_session_manager, get_opencode_client, get_skill_registry, GenerationJob
 
 
 @pytest.fixture
@@ -28,24 +29,34 @@ def app_client(flask_app):
 def socket_client(flask_app):
     return socketio.test_client(flask_app)
 
-class SyncExecutor:
-    def submit(self, fn, *args, **kwargs):
-        fn(*args, **kwargs)
-        return MagicMock()
+class SyncScheduler:
+    """Runs each generation job to completion inside submit()."""
 
-    def shutdown(self, wait=True):
+    def has_capacity(self, session_id):
+        return True
+
+    def submit(self, session_id, run):
+        job = GenerationJob(session_id=session_id, run=run)
+        job.started_at = job.enqueued_at
+        asyncio.run(run(job))
+        return job
+
+    def set_queue_listener(self, listener):
         pass
 
+    def cancel_session(self, session_id):
+        return []
+
 
 @pytest.fixture(autouse=True)
-def mock_executor():
-    with patch("backend.logic.socket_handlers._executor", SyncExecutor()):
+def mock_scheduler():
+    with patch("backend.logic.socket_handlers._scheduler", SyncScheduler()):
         yield
 
-@patch("backend.core.opencode_client.OpencodeClient.ensure_server_running")
-@patch("backend.core.opencode_client.OpencodeClient.create_session")
-@patch("backend.core.opencode_client.OpencodeClient.send_message")
-@patch("backend.core.opencode_client.OpencodeClient.get_messages")
+@patch("backend.core.async_opencode_client.AsyncOpencodeClient.ensure_server_running")
+@patch("backend.core.async_opencode_client.AsyncOpencodeClient.create_session")
+@patch("backend.core.async_opencode_client.AsyncOpencodeClient.send_message")
+@patch("backend.core.async_opencode_client.AsyncOpencodeClient.get_messages")
 def test_repro_no_assistant_message(
     mock_get_messages, 
     mock_send_message, 
@@ -93,15 +104,19 @@ def test_repro_no_assistant_message(
     received = socket_client.get_received()
     
     # Filter for interesting events
-    log_events = [e for e in received if e["name"] == "debug_log"]
+    log_entries = [
+        entry
+        for e in received if e["name"] == "debug_logs"
+        for entry in e["args"][0]["entries"]
+    ]
     error_events = [e for e in received if e["name"] == "error"]
     status_events = [e for e in received if e["name"] == "status_update"]
     
     # Check if we got the warning about no assistant message
     warning_logs = [
-        l["args"][0] for l in log_events 
-        if l["args"][0].get("level") == "WARN" 
-        and "No assistant message found" in l["args"][0].get("message")
+        entry for entry in log_entries
+        if entry.get("level") == "WARN"
+        and "No assistant message found" in entry.get("message")
     ]
     
     assert len(warning_logs) > 0, "Should have logged warning about missing assistant message"
@@ -114,9 +129,9 @@ def test_repro_no_assistant_message(
     assert len(idle_status) > 0, "Session should return to idle state"
 
 
-@patch("backend.core.opencode_client.OpencodeClient.ensure_server_running")
-@patch("backend.core.opencode_client.OpencodeClient.create_session")
-@patch("backend.core.opencode_client.OpencodeClient.send_message")
+@patch("backend.core.async_opencode_client.AsyncOpencodeClient.ensure_server_running")
+@patch("backend.core.async_opencode_client.AsyncOpencodeClient.create_session")
+@patch("backend.core.async_opencode_client.AsyncOpencodeClient.send_message")
 def test_repro_send_message_failure(
     mock_send_message, 
     mock_create_session, 
@@ -148,3 +163,48 @@ def test_repro_send_message_failure(
     
     assert len(error_events) > 0, "Should emit error event"
     assert "Failed to get response" in error_events[0]["args"][0]["message"]
+
+
+@patch("backend.core.async_opencode_client.AsyncOpencodeClient.ensure_server_running")
+@patch("backend.core.async_opencode_client.AsyncOpencodeClient.create_session")
+@patch("backend.core.async_opencode_client.AsyncOpencodeClient.send_message")
+@patch("backend.core.async_opencode_client.AsyncOpencodeClient.get_messages")
+def test_reply_taken_from_send_response(
+    mock_get_messages,
+    mock_send_message,
+    mock_create_session,
+    mock_ensure_server,
+    flask_app
+):
+    """
+    The assistant reply returned by send_message should be used directly,
+    without refetching the session transcript.
+    """
+    mock_ensure_server.return_value = True
+    mock_create_session.return_value = {"id": "test_opencode_session_id"}
+    mock_send_message.return_value = {
+        "info": {"id": "msg_asst_1", "role": "assistant", "parentID": "msg_user_1"},
+        "parts": [{"type": "text", "text": '{"positive_prompt": "a cat, studio light"}'}],
+    }
+
+    socket_client = socketio.test_client(flask_app, query_string="session_id=test_send_reply")
+    socket_client.connect()
+    socket_client.get_received()
+
+    socket_client.emit("user_message", {
+        "session_id": "test_send_reply",
+        "content": "Help me draw a cat",
+        "model_target": "z-image-turbo"
+    })
+
+    received = socket_client.get_received()
+    complete_events = [e for e in received if e["name"] == "complete"]
+
+    assert mock_get_messages.call_count == 0, "Transcript should not be refetched"
+    # Skill context rides in the system prompt, the turn carries only the request
+    sent = mock_send_message.call_args.kwargs
+    assert "Help me draw a cat" in sent["content"]
+    assert "JSON" not in sent["content"]
+    assert "JSON" in sent["system"]
+    assert len(complete_events) == 1
+    assert complete_events[0]["args"][0]["prompt_english"] == "a cat, studio light"
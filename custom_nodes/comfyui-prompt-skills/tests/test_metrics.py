@@ -0,0 +1,129 @@
+"""
+Tests for the metrics registry (Tier 3 Core) and the /metrics route
+"""
+
+import httpx
+import pytest
+from backend.core import MetricsRegistry
+from backend.core import metrics as metrics_module
+from backend.core.metrics import endpoint_template
+
+from .test_tracing import SyncScheduler, opencode_transport
+
+
+class TestMetricsRegistry:
+    def test_render_counter_and_gauge(self):
+        registry = MetricsRegistry(enabled=True)
+        counter = registry.counter("demo_total", "Demo counter", ("outcome",))
+        counter.inc(outcome="ok")
+        counter.inc(2, outcome="error")
+        registry.gauge("demo_depth", 'Depth "now"').set(3)
+
+        text = registry.render()
+        assert "# TYPE demo_total counter" in text
+        assert 'demo_total{outcome="ok"} 1' in text
+        assert 'demo_total{outcome="error"} 2' in text
+        assert '# HELP demo_depth Depth "now"' in text
+        assert "demo_depth 3" in text
+        assert registry.counter("demo_total", "Demo counter", ("outcome",)) is counter
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry(enabled=True)
+        histogram = registry.histogram("demo_seconds", "Demo latency", buckets=(0.1, 1))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value)
+
+        text = registry.render()
+        assert 'demo_seconds_bucket{le="0.1"} 1' in text
+        assert 'demo_seconds_bucket{le="1"} 2' in text
+        assert 'demo_seconds_bucket{le="+Inf"} 3' in text
+        assert "demo_seconds_count 3" in text
+        assert "demo_seconds_sum 5.55" in text
+        assert histogram.count() == 3
+
+    def test_type_conflict(self):
+        registry = MetricsRegistry(enabled=True)
+        registry.counter("demo_total", "Demo counter")
+        with pytest.raises(ValueError):
+            registry.gauge("demo_total", "Demo gauge")
+
+    def test_failing_collector_is_skipped(self):
+        registry = MetricsRegistry(enabled=True)
+        registry.register_collector("broken", lambda: 1 / 0)
+        registry.gauge("demo_up", "Demo gauge").set(1)
+        assert "demo_up 1" in registry.render()
+
+    def test_endpoint_template(self):
+        assert endpoint_template("/session") == "/session"
+        assert endpoint_template("/session/ses_abc123/message") == "/session/{id}/message"
+        assert endpoint_template("/session/ses_abc/message/msg_def") == "/session/{id}/message/{id}"
+
+
+class TestMetricsRoute:
+    @pytest.fixture
+    def registry(self, monkeypatch):
+        registry = MetricsRegistry(enabled=True)
+        registry.register_collector("core", metrics_module.core_families)
+        monkeypatch.setattr(metrics_module, "_metrics_registry", registry)
+        return registry
+
+    def test_disabled(self, client, monkeypatch):
+        monkeypatch.setattr(metrics_module, "_metrics_registry", MetricsRegistry(enabled=False))
+        assert client.get("/metrics").status_code == 404
+
+    def test_core_collectors(self, client, registry):
+        from backend.logic.server import connection_families
+
+        registry.register_collector("connections", connection_families)
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.content_type.startswith("text/plain; version=0.0.4")
+        text = response.get_data(as_text=True)
+        for name in (
+            "prompt_skills_jobs_running",
+            "prompt_skills_jobs_queued",
+            "prompt_skills_sessions",
+            "prompt_skills_cache_lookups_total",
+            "prompt_skills_socket_connections",
+        ):
+            assert f"# TYPE {name} " in text
+
+    def test_memory_gauges_without_proc(self, client, registry, monkeypatch):
+        """Without /proc only the peak is exported, under its own name."""
+        monkeypatch.setattr(metrics_module, "_process_memory_bytes", lambda: None)
+        monkeypatch.setattr(metrics_module, "_process_peak_memory_bytes", lambda: 2048)
+        text = client.get("/metrics").get_data(as_text=True)
+
+        assert "prompt_skills_process_resident_memory_bytes" not in text
+        assert "prompt_skills_process_peak_resident_memory_bytes 2048" in text
+
+    def test_generation_is_measured(self, app, client, session_manager, monkeypatch):
+        from backend.core import AsyncOpencodeClient
+        from backend.core.opencode_client import OpencodeConfig
+        from backend.logic import socket_handlers, socketio
+
+        opencode = AsyncOpencodeClient(OpencodeConfig(stream_ready_timeout=0))
+        opencode._client = httpx.AsyncClient(
+            base_url="http://opencode.test",
+            transport=httpx.MockTransport(opencode_transport),
+            event_hooks={"response": [metrics_module.record_opencode_response_async]},
+        )
+        monkeypatch.setattr(socket_handlers, "get_async_opencode_client", lambda: opencode)
+        monkeypatch.setattr(socket_handlers, "_scheduler", SyncScheduler())
+        before = socket_handlers._generation_seconds.count()
+        ok_before = socket_handlers._generations.value(outcome="ok")
+
+        sock = socketio.test_client(app, query_string="session_id=metrics_s1")
+        sock.emit("user_message", {"session_id": "metrics_s1", "content": "a fox"})
+        sock.disconnect()
+
+        assert socket_handlers._generation_seconds.count() == before + 1
+        assert socket_handlers._generations.value(outcome="ok") == ok_before + 1
+        text = client.get("/metrics").get_data(as_text=True)
+        assert "prompt_skills_generation_llm_seconds_count" in text
+        assert "prompt_skills_generation_queue_wait_seconds_bucket" in text
+        assert (
+            'prompt_skills_opencode_requests_total{method="POST",endpoint="/session/{id}/message",status="200"}'
+            in text
+        )
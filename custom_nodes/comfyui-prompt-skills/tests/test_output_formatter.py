@@ -0,0 +1,128 @@
+"""
+Tests for OutputFormatter (Tier 3 Core)
+"""
+
+import json
+
+import pytest
+from backend.core import OutputFormatter, StreamingPromptParser
+from backend.core.output_formatter import scan_json_objects
+
+
+@pytest.fixture
+def formatter():
+    return OutputFormatter()
+
+
+class TestScanJsonObjects:
+    """Test the single-pass balanced-brace scanner."""
+
+    def test_outermost_spans(self):
+        text = 'a {"x": {"y": 1}} b {"z": 2}'
+        spans = scan_json_objects(text)
+        assert [text[s:e] for s, e in spans] == ['{"x": {"y": 1}}', '{"z": 2}']
+
+    def test_braces_inside_strings(self):
+        text = '{"p": "a } b { c", "q": "\\"}"}'
+        [(start, end)] = scan_json_objects(text)
+        assert json.loads(text[start:end]) == {"p": "a } b { c", "q": '"}'}
+
+    def test_unmatched_brace_in_prose(self):
+        """A stray '{' before the object should not hide it."""
+        text = 'Use { carefully. {"positive_prompt": "a cat"}'
+        spans = scan_json_objects(text)
+        assert [text[s:e] for s, e in spans] == ['{"positive_prompt": "a cat"}']
+
+
+class TestOutputFormatter:
+    """Test extraction and formatting of LLM responses."""
+
+    def test_fenced_json(self, formatter):
+        raw = 'Here you go:\n```json\n{"positive_prompt": "a cat, film grain"}\n```\nEnjoy {it}.'
+        assert formatter.format(raw).prompt_english == "a cat, film grain"
+
+    def test_prose_with_braces(self, formatter):
+        """Braces in surrounding prose should not break extraction."""
+        raw = 'I used {style} tokens. {"positive_prompt": "a {red} fox"} Done {ok}.'
+        output = formatter.format(raw)
+        assert output.prompt_english == "a {red} fox"
+        assert json.loads(output.prompt_json) == {"positive_prompt": "a {red} fox"}
+
+    def test_prompt_object_preferred(self, formatter):
+        """An object with a prompt key wins over larger unrelated objects."""
+        raw = '{"notes": "a long unrelated object here"} {"prompt": "a dog"}'
+        assert formatter.format(raw).prompt_english == "a dog"
+
+    def test_plain_text_fallback(self, formatter):
+        output = formatter.format("**A cat** sitting on {a mat}")
+        assert output.prompt_english == "A cat sitting on {a mat}"
+        assert json.loads(output.prompt_json) == {"prompt": "A cat sitting on {a mat}"}
+
+    def test_z_image_turbo_drops_negative(self, formatter):
+        raw = '{"positive_prompt": "a cat", "negative_prompt": "blurry"}'
+        output = formatter.format_for_model(raw, "z-image-turbo")
+        assert json.loads(output.prompt_json) == {"positive_prompt": "a cat"}
+        assert output.prompt_english == "a cat"
+
+    def test_sdxl_keeps_negative(self, formatter):
+        raw = '{"positive_prompt": "a cat", "negative_prompt": "blurry"}'
+        output = formatter.format_for_model(raw, "sdxl")
+        assert json.loads(output.prompt_json)["negative_prompt"] == "blurry"
+
+
+def feed_chunks(parser, text, size):
+    """Feed text in fixed-size deltas, returning every non-None result."""
+    results = []
+    for i in range(0, len(text), size):
+        result = parser.feed(text[i:i + size])
+        if result is not None:
+            results.append((i + size, result))
+    return results
+
+
+class TestStreamingPromptParser:
+    """Test provisional prompts from a growing response."""
+
+    RESPONSE = (
+        'Sure {here}:\n```json\n{"analysis": {"prompt": "nested"}, "tags": ["a", "b"], '
+        '"positive_prompt": "a cat, \\"film\\" {grain}", "bilingual": {"subject_zh": "猫"}}\n```'
+    )
+
+    @pytest.mark.parametrize("size", [1, 3, 7, 1000])
+    def test_prompt_emitted_once_when_complete(self, size):
+        parser = StreamingPromptParser()
+        results = feed_chunks(parser, self.RESPONSE, size)
+
+        assert [prompt for _, prompt in results] == ['a cat, "film" {grain}']
+        # Available before the later fields have streamed in
+        assert results[0][0] < self.RESPONSE.index("bilingual") + size
+        assert parser.done
+
+    def test_matches_final_format(self):
+        parser = StreamingPromptParser()
+        parser.feed(self.RESPONSE)
+        assert parser.prompt == OutputFormatter().format(self.RESPONSE).prompt_english
+
+    def test_incomplete_field(self):
+        parser = StreamingPromptParser()
+        assert parser.feed('{"positive_prompt": "a c') is None
+        assert not parser.done
+
+    def test_value_equal_to_key_name(self):
+        """Only the value of the field counts, not other keys or values."""
+        parser = StreamingPromptParser()
+        assert parser.feed('{"note": "positive_prompt", "x": 1}') is None
+
+    @pytest.mark.parametrize("prose", [
+        "Use the { to open a set: ",
+        'He said {"maybe" so. ',
+        "{ {",
+        "Numbers {1, 2} and { open ",
+    ])
+    def test_stray_brace_in_prose(self, prose):
+        """An unmatched "{" before the object should not hide it."""
+        response = prose + '{"style": "ink", "positive_prompt": "a fox"}'
+        for size in (1, 5, 1000):
+            parser = StreamingPromptParser()
+            assert [prompt for _, prompt in feed_chunks(parser, response, size)] == ["a fox"]
+            assert parser.prompt == OutputFormatter().format(response).prompt_english
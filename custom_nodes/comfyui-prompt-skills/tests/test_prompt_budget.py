@@ -0,0 +1,153 @@
+"""
+Tests for PromptAssembler (Tier 3 Core)
+"""
+
+import pytest
+from backend.core import PromptAssembler, PromptSection, estimate_tokens
+from backend.core.prompt_budget import TRUNCATION_MARKER, compact_markdown, truncate_to_tokens
+
+
+SKILL_TEXT = """## Skill: demo
+
+## 规则
+
+Keep this rule.
+
+## 示例
+
+This example can go.
+
+### 子示例
+
+Nested example.
+
+## 参数表
+
+| a | b |
+|---|---|
+| 1 | 1 |
+| 2 | 2 |
+| 3 | 3 |
+| 4 | 4 |
+
+## 输出格式
+
+Keep the output format."""
+
+
+class TestEstimateTokens:
+    """Test the offline token estimate."""
+
+    def test_cjk_counts_per_character(self):
+        assert estimate_tokens("提示词") == 3
+
+    def test_latin_counts_per_four_characters(self):
+        assert estimate_tokens("abcdefgh") == 2
+
+    def test_empty(self):
+        assert estimate_tokens("") == 0
+
+
+class TestCompaction:
+    """Test deterministic markdown reduction."""
+
+    def test_drops_example_subsections(self):
+        compacted = compact_markdown(SKILL_TEXT)
+        assert "Keep this rule." in compacted
+        assert "example can go" not in compacted
+        assert "Nested example" not in compacted
+        assert "Keep the output format." in compacted
+
+    def test_shortens_long_tables(self):
+        compacted = compact_markdown(SKILL_TEXT, max_table_rows=2)
+        assert "| 2 | 2 |" in compacted
+        assert "| 3 | 3 |" not in compacted
+        assert "| … |" in compacted
+
+    def test_truncate_closes_code_fence(self):
+        text = "intro\n```\n" + "\n".join(f"line {i}" for i in range(100)) + "\n```"
+        truncated = truncate_to_tokens(text, 30)
+        assert truncated.endswith(TRUNCATION_MARKER)
+        assert truncated.count("```") % 2 == 0
+
+
+class TestPromptAssembler:
+    """Test budget enforcement and reporting."""
+
+    def sections(self):
+        return [
+            PromptSection("instructions", "你是一个提示词工程师。", priority=100, required=True),
+            PromptSection("skill:demo", SKILL_TEXT, priority=60, required=True, compactable=True),
+            PromptSection("styles", "style " * 40, priority=40),
+        ]
+
+    def test_within_budget_is_untouched(self):
+        result = PromptAssembler(budget=10_000).assemble(self.sections())
+        assert not result.reduced
+        assert result.text.startswith("你是一个提示词工程师。\n\n## Skill: demo")
+        assert [s["name"] for s in result.sections] == ["instructions", "skill:demo", "styles"]
+
+    def test_compacts_before_dropping(self):
+        full = PromptAssembler(budget=0).assemble(self.sections()).total_tokens
+        example_tokens = estimate_tokens(SKILL_TEXT) - estimate_tokens(compact_markdown(SKILL_TEXT))
+        result = PromptAssembler(budget=full - example_tokens + 1).assemble(self.sections())
+
+        actions = {s["name"]: s["action"] for s in result.sections}
+        assert actions == {"instructions": "kept", "skill:demo": "compacted", "styles": "kept"}
+        assert result.total_tokens <= result.budget
+
+    def test_drops_optional_then_truncates(self):
+        result = PromptAssembler(budget=40).assemble(self.sections())
+
+        actions = {s["name"]: s["action"] for s in result.sections}
+        assert actions["styles"] == "dropped"
+        assert actions["skill:demo"] == "truncated"
+        assert actions["instructions"] == "kept"
+        assert result.total_tokens <= 40
+
+    def test_deterministic(self):
+        first = PromptAssembler(budget=40).assemble(self.sections())
+        second = PromptAssembler(budget=40).assemble(self.sections())
+        assert first.text == second.text
+
+    def test_summary_reports_sizes(self):
+        result = PromptAssembler(budget=40).assemble(self.sections())
+        summary = result.summary()
+        assert "skill:demo=" in summary
+        assert "dropped" in summary
+        assert "budget=40" in summary
+
+    def test_empty_sections_skipped(self):
+        result = PromptAssembler(budget=0).assemble([
+            PromptSection("a", "first"),
+            PromptSection("b", ""),
+            PromptSection("c", "last"),
+        ])
+        assert result.text == "first\n\nlast"
+
+    def test_extend_inserts_before_named_part(self):
+        assembler = PromptAssembler(budget=10_000)
+        base = assembler.assemble([
+            PromptSection("instructions", "head", required=True),
+            PromptSection("output_format", "tail", required=True),
+        ])
+        result = assembler.extend(base, PromptSection("styles", "style a"), before="output_format")
+
+        assert result.text == "head\n\nstyle a\n\ntail"
+        assert [s["name"] for s in result.sections] == ["instructions", "styles", "output_format"]
+        assert result.total_tokens == assembler.assemble([
+            PromptSection("instructions", "head"),
+            PromptSection("styles", "style a"),
+            PromptSection("output_format", "tail"),
+        ]).total_tokens
+        # The memoizable base is left untouched
+        assert base.text == "head\n\ntail"
+
+    def test_extend_drops_what_does_not_fit(self):
+        assembler = PromptAssembler(budget=40)
+        base = assembler.assemble(self.sections()[:2])
+        result = assembler.extend(base, PromptSection("styles", "style " * 40))
+
+        assert result.text == base.text
+        assert {s["name"]: s["action"] for s in result.sections}["styles"] == "dropped"
+        assert result.total_tokens <= 40
@@ -0,0 +1,126 @@
+"""
+Tests for ResultCache (Tier 3 Core)
+"""
+
+import pytest
+from backend.core import ResultCache, ResultCacheConfig, make_cache_key
+from backend.core.result_cache import normalize_request
+
+
+OUTPUT = {
+    "prompt_english": "cinematic portrait, rainy night",
+    "prompt_json": "{}",
+    "prompt_bilingual": "",
+    "raw_response": "{}",
+}
+
+
+@pytest.fixture
+def cache():
+    cache = ResultCache(ResultCacheConfig(enabled=True, max_entries=2))
+    yield cache
+    cache.close()
+
+
+class TestCacheKey:
+    """Keys cover request text, skill prompt, model target and styles."""
+
+    def test_near_identical_requests_share_key(self):
+        assert normalize_request("Cinematic portrait，  rainy night。") == "cinematic portrait, rainy night"
+        assert make_cache_key("cinematic portrait, rainy night", "fp", "sdxl") == make_cache_key(
+            "  Cinematic Portrait ,rainy night! ", "fp", "sdxl"
+        )
+
+    def test_fingerprint_and_model_change_key(self):
+        key = make_cache_key("a cat", "fp1", "sdxl")
+        assert key != make_cache_key("a cat", "fp2", "sdxl")
+        assert key != make_cache_key("a cat", "fp1", "z-image-turbo")
+        assert key != make_cache_key("a cat", "fp1", "sdxl", styles="### ink wash")
+
+
+class TestResultCache:
+    """Test LRU memory tier, TTL and disk tier."""
+
+    def test_disabled_by_default(self):
+        cache = ResultCache(ResultCacheConfig())
+        cache.put("k", OUTPUT)
+        assert cache.get("k") is None
+
+    def test_hit_and_miss(self, cache):
+        assert cache.get("k") is None
+        cache.put("k", OUTPUT)
+        assert cache.get("k") == OUTPUT
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["stores"]) == (1, 1, 1)
+
+    def test_returns_copies(self, cache):
+        cache.put("k", OUTPUT)
+        cache.get("k")["prompt_english"] = "changed"
+        assert cache.get("k")["prompt_english"] == OUTPUT["prompt_english"]
+
+    def test_lru_eviction(self, cache):
+        cache.put("a", OUTPUT)
+        cache.put("b", OUTPUT)
+        cache.get("a")  # b is now least recently used
+        cache.put("c", OUTPUT)
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_ttl(self):
+        cache = ResultCache(ResultCacheConfig(enabled=True, ttl=60))
+        cache.put("k", OUTPUT)
+        created_at, output = cache._entries["k"]
+        cache._entries["k"] = (created_at - 120, output)
+        assert cache.get("k") is None
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        config = ResultCacheConfig(enabled=True, disk_path=str(tmp_path / "results.db"))
+        first = ResultCache(config)
+        first.put("k", OUTPUT)
+        first.close()
+
+        second = ResultCache(config)
+        assert second.get("k") == OUTPUT
+        assert second.stats()["disk_hits"] == 1
+        # Promoted into memory: the next hit does not touch the disk
+        second.get("k")
+        assert second.stats()["disk_hits"] == 1
+        second.close()
+
+    def test_disk_tier_is_bounded(self, tmp_path):
+        cache = ResultCache(ResultCacheConfig(
+            enabled=True, disk_path=str(tmp_path / "results.db"), max_disk_entries=2,
+        ))
+        for key in ("a", "b", "c"):
+            cache.put(key, OUTPUT)
+        assert cache.stats()["disk_entries"] == 2
+        # The oldest entry went
+        assert cache._load_disk("a") is None
+        assert cache._load_disk("c") is not None
+        cache.close()
+
+    def test_disk_trim_only_over_cap(self, tmp_path, monkeypatch):
+        cache = ResultCache(ResultCacheConfig(
+            enabled=True, disk_path=str(tmp_path / "results.db"), max_disk_entries=2,
+        ))
+        trims = []
+        trim = cache._trim_disk_locked
+        monkeypatch.setattr(cache, "_trim_disk_locked", lambda: trims.append(1) or trim())
+
+        cache.put("a", OUTPUT)
+        cache.put("b", OUTPUT)
+        assert trims == []
+        # Replacing a key counts as a row until the trim recounts
+        cache.put("a", OUTPUT)
+        assert trims == [1]
+        assert cache.stats()["disk_entries"] == 2
+        cache.close()
+
+
+class TestResultCacheRoute:
+    def test_stats_endpoint(self, client):
+        response = client.get("/api/cache/stats")
+        assert response.status_code == 200
+        assert "hit_rate" in response.get_json()
@@ -0,0 +1,247 @@
+"""
+Tests for GenerationScheduler (Tier 3 Core)
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from backend.core import BackgroundLoop, GenerationJob, GenerationScheduler, SchedulerConfig
+
+
+@pytest.fixture(scope="module")
+def loop():
+    return BackgroundLoop(name="test-scheduler-loop")
+
+
+def make_scheduler(loop, **config):
+    return GenerationScheduler(SchedulerConfig(**config), loop=loop)
+
+
+class Gate:
+    """Jobs that record their start and block until released."""
+
+    def __init__(self):
+        self.started = []
+        self.release = threading.Event()
+
+    def job(self, label):
+        async def run(job):
+            self.started.append(label)
+            await asyncio.to_thread(self.release.wait, 5)
+        return run
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+class TestGenerationScheduler:
+    """Test fairness, caps and queue bounds."""
+
+    def test_global_concurrency_cap(self, loop):
+        """No more than max_concurrent jobs should run at once."""
+        scheduler = make_scheduler(loop, max_concurrent=2)
+        gate = Gate()
+        for name in ("a", "b", "c"):
+            scheduler.submit(name, gate.job(name))
+
+        assert wait_for(lambda: len(gate.started) == 2)
+        stats = scheduler.stats()
+        assert stats["running"] == 2
+        assert stats["queued"] == 1
+
+        gate.release.set()
+        assert wait_for(lambda: len(gate.started) == 3)
+        assert wait_for(lambda: scheduler.stats()["running"] == 0)
+
+    def test_round_robin_across_sessions(self, loop):
+        """A second session should be served before the first session's backlog."""
+        scheduler = make_scheduler(loop, max_concurrent=1)
+        gate = Gate()
+        scheduler.submit("a", gate.job("a1"))
+        scheduler.submit("a", gate.job("a2"))
+        scheduler.submit("a", gate.job("a3"))
+        scheduler.submit("b", gate.job("b1"))
+
+        gate.release.set()
+        assert wait_for(lambda: len(gate.started) == 4)
+        assert gate.started == ["a1", "b1", "a2", "a3"]
+
+    def test_one_running_job_per_session(self, loop):
+        """Jobs of the same session should never overlap."""
+        scheduler = make_scheduler(loop, max_concurrent=4)
+        gate = Gate()
+        scheduler.submit("a", gate.job("a1"))
+        scheduler.submit("a", gate.job("a2"))
+
+        assert wait_for(lambda: gate.started == ["a1"])
+        time.sleep(0.05)
+        assert gate.started == ["a1"]
+
+        gate.release.set()
+        assert wait_for(lambda: gate.started == ["a1", "a2"])
+
+    def test_bounded_queue_rejects(self, loop):
+        """Submissions beyond the queue bounds should be rejected."""
+        scheduler = make_scheduler(loop, max_concurrent=1, max_queued=2, max_queued_per_session=1)
+        gate = Gate()
+        assert scheduler.submit("a", gate.job("a1")) is not None  # running
+        assert scheduler.submit("a", gate.job("a2")) is not None  # queued
+        assert scheduler.submit("a", gate.job("a3")) is None  # per-session bound
+        assert scheduler.has_capacity("a") is False
+        assert scheduler.submit("b", gate.job("b1")) is not None
+        assert scheduler.submit("c", gate.job("c1")) is None  # global bound
+
+        gate.release.set()
+        assert wait_for(lambda: len(gate.started) == 3)
+
+    def test_queue_position_updates(self, loop):
+        """The listener should see start (0) and 1-based queue positions."""
+        scheduler = make_scheduler(loop, max_concurrent=1)
+        updates = []
+        scheduler.set_queue_listener(lambda job, position, queued: updates.append((job.session_id, position)))
+        gate = Gate()
+
+        first = scheduler.submit("a", gate.job("a1"))
+        second = scheduler.submit("b", gate.job("b1"))
+
+        assert ("a", 0) in updates
+        assert ("b", 1) in updates
+        assert scheduler.queue_position(first.id) == 0
+        assert scheduler.queue_position(second.id) == 1
+
+        gate.release.set()
+        assert wait_for(lambda: ("b", 0) in updates)
+
+    def test_cancel_session(self, loop):
+        """Cancelling should stop the running job and drop queued ones."""
+        scheduler = make_scheduler(loop, max_concurrent=1)
+        gate = Gate()
+        finished = []
+
+        async def long_running(job):
+            gate.started.append("a1")
+            await asyncio.sleep(5)
+            finished.append("a1")
+
+        running = scheduler.submit("a", long_running)
+        queued = scheduler.submit("a", gate.job("a2"))
+        assert wait_for(lambda: gate.started == ["a1"])
+
+        cancelled = scheduler.cancel_session("a")
+
+        assert {job.id for job in cancelled} == {running.id, queued.id}
+        assert wait_for(lambda: running.finished_at is not None)
+        assert finished == []
+        assert gate.started == ["a1"]
+        assert wait_for(lambda: scheduler.stats()["running"] == 0)
+
+    def test_cancel_frees_slot_for_other_sessions(self, loop):
+        """A cancelled job should release its concurrency slot immediately."""
+        scheduler = make_scheduler(loop, max_concurrent=1)
+        gate = Gate()
+
+        async def long_running(job):
+            await asyncio.sleep(5)
+
+        scheduler.submit("a", long_running)
+        scheduler.submit("b", gate.job("b1"))
+        scheduler.cancel_session("a")
+
+        assert wait_for(lambda: gate.started == ["b1"])
+        gate.release.set()
+
+
+    def test_borrowed_slots_count_against_cap(self, loop):
+        """Slots borrowed by a running job should hold back other sessions."""
+        scheduler = make_scheduler(loop, max_concurrent=2)
+        gate = Gate()
+
+        async def fan_out(job):
+            async with scheduler.slot():
+                gate.started.append("a-extra")
+                await asyncio.to_thread(gate.release.wait, 5)
+
+        scheduler.submit("a", fan_out)
+        assert wait_for(lambda: gate.started == ["a-extra"])
+        scheduler.submit("b", gate.job("b1"))
+
+        time.sleep(0.05)
+        assert gate.started == ["a-extra"]
+        assert scheduler.stats()["borrowed_slots"] == 1
+
+        gate.release.set()
+        assert wait_for(lambda: gate.started == ["a-extra", "b1"])
+        assert wait_for(lambda: scheduler.stats()["borrowed_slots"] == 0)
+
+    def test_queued_jobs_start_before_borrowers(self, loop):
+        """A freed slot should go to a queued job before a borrower."""
+        scheduler = make_scheduler(loop, max_concurrent=2)
+        gate = Gate()
+        first = Gate()
+        borrow = threading.Event()
+
+        async def fan_out(job):
+            await asyncio.to_thread(borrow.wait, 5)
+            async with scheduler.slot():
+                gate.started.append("a-extra")
+            await asyncio.to_thread(gate.release.wait, 5)
+
+        scheduler.submit("a", fan_out)
+        scheduler.submit("b", first.job("b1"))
+        scheduler.submit("c", gate.job("c1"))
+        assert wait_for(lambda: first.started == ["b1"])
+        borrow.set()
+        assert wait_for(lambda: len(scheduler._slot_waiters) == 1)
+
+        first.release.set()
+        assert wait_for(lambda: "c1" in gate.started)
+        time.sleep(0.05)
+        assert gate.started == ["c1"]
+
+        gate.release.set()
+        assert wait_for(lambda: gate.started == ["c1", "a-extra"])
+        assert wait_for(lambda: scheduler.stats()["running"] == 0)
+
+    def test_cancelled_borrower_returns_slot(self, loop):
+        """Cancelling a job waiting for a slot should not leak it."""
+        scheduler = make_scheduler(loop, max_concurrent=1)
+        waiting = threading.Event()
+
+        async def fan_out(job):
+            waiting.set()
+            async with scheduler.slot():
+                pass
+
+        scheduler.submit("a", fan_out)
+        assert waiting.wait(2)
+        scheduler.cancel_session("a")
+
+        assert wait_for(lambda: scheduler.stats()["running"] == 0)
+        stats = scheduler.stats()
+        assert stats["borrowed_slots"] == 0
+        assert scheduler.has_capacity("b")
+
+
+class TestGenerationJob:
+    """Test the commit/cancel handshake that suppresses late results."""
+
+    def test_commit_wins(self):
+        """Once committed, a job can no longer be cancelled."""
+        job = GenerationJob(session_id="s", run=None)
+        assert job.try_commit() is True
+        assert job.cancel() is False
+        assert job.cancelled is False
+
+    def test_cancel_wins(self):
+        """A cancelled job must not publish its result."""
+        job = GenerationJob(session_id="s", run=None)
+        assert job.cancel() is True
+        assert job.try_commit() is False
@@ -0,0 +1,72 @@
+"""
+Tests for server configuration and connection limits (Tier 2 Logic)
+"""
+
+import pytest
+from backend.logic import server as server_module
+from backend.logic.server import ConnectionLimiter, ServerConfig
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = ConnectionLimiter(limit=1)
+    monkeypatch.setattr(server_module, "_connection_limiter", limiter)
+    return limiter
+
+
+class TestServerConfig:
+    def test_defaults(self, monkeypatch):
+        for name in ("PORT", "SERVER_DEBUG", "MAX_CONNECTIONS"):
+            monkeypatch.delenv(f"COMFYUI_PROMPT_SKILLS_{name}", raising=False)
+        config = ServerConfig.from_env(host="127.0.0.1")
+
+        assert config.host == "127.0.0.1"
+        assert config.port == 8189
+        assert config.debug is False
+        assert config.max_connections == 500
+
+    def test_environment_overrides(self, monkeypatch):
+        monkeypatch.setenv("COMFYUI_PROMPT_SKILLS_PORT", "9000")
+        monkeypatch.setenv("COMFYUI_PROMPT_SKILLS_SERVER_DEBUG", "1")
+        monkeypatch.setenv("COMFYUI_PROMPT_SKILLS_MAX_CONNECTIONS", "0")
+        config = ServerConfig.from_env(port=5000)
+
+        assert config.port == 9000
+        assert config.debug is True
+        assert config.max_connections == 0
+
+
+class TestConnectionLimiter:
+    def test_limit(self):
+        limiter = ConnectionLimiter(limit=2)
+        assert limiter.acquire("a") and limiter.acquire("b")
+        assert not limiter.acquire("c")
+        # Re-admitting a known client does not count twice
+        assert limiter.acquire("a")
+
+        limiter.release("a")
+        assert limiter.acquire("c")
+        assert limiter.stats() == {"connections": 2, "max_connections": 2}
+
+    def test_unlimited(self):
+        limiter = ConnectionLimiter(limit=0)
+        assert all(limiter.acquire(str(i)) for i in range(1000))
+
+    def test_socket_refused_when_full(self, app, limiter):
+        from backend.logic import socketio
+
+        first = socketio.test_client(app, query_string="session_id=limit_a")
+        second = socketio.test_client(app, query_string="session_id=limit_b")
+
+        assert first.is_connected()
+        assert not second.is_connected()
+
+        first.disconnect()
+        assert limiter.stats()["connections"] == 0
+        third = socketio.test_client(app, query_string="session_id=limit_c")
+        assert third.is_connected()
+        third.disconnect()
+
+    def test_health_reports_connections(self, client, limiter):
+        data = client.get("/health").get_json()
+        assert data["server"] == {"connections": 0, "max_connections": 1}
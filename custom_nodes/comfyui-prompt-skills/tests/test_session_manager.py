@@ -2,6 +2,8 @@
 Tests for SessionManager (Tier 3 Core)
 """
 
+import threading
+
 import pytest
 from backend.core import SessionManager, get_session_manager
 
@@ -155,6 +157,22 @@ class TestSessionManagerOutput:
         assert output["prompt_english"] == ""
         assert output["prompt_json"] == ""
         assert output["prompt_bilingual"] == ""
+    
+    def test_output_version_tracks_content(self, session_manager):
+        """Output version should change only when a different output is stored."""
+        session_manager.create_session("output-version-test")
+        assert session_manager.get_output_version("output-version-test") == 0
+        
+        session_manager.set_output("output-version-test", "a cat", "{}", "猫")
+        assert session_manager.get_output_version("output-version-test") == 1
+        
+        # Same prompt again (e.g. a cache hit): downstream caches stay valid
+        session_manager.set_output("output-version-test", "a cat", "{}", "猫")
+        assert session_manager.get_output_version("output-version-test") == 1
+        
+        session_manager.set_output("output-version-test", "a dog", "{}", "狗")
+        assert session_manager.get_output_version("output-version-test") == 2
+        assert session_manager.get_output_version("nonexistent-session") == 0
 
 
 class TestSessionManagerOpencode:
@@ -190,3 +208,120 @@ class TestSessionManagerOpencode:
         data = session.to_dict()
         
         assert data["opencode_session_id"] == "oc-abcdef"
+
+
+class TestSessionManagerVersioning:
+    """Test versioned changes for delta sync."""
+    
+    def test_changes_bump_version(self, session_manager):
+        """Each client-visible change should bump the version."""
+        session = session_manager.create_session("version-test")
+        assert session.version == 0
+        
+        session_manager.add_message("version-test", "user", "Hello")
+        session_manager.update_session_config("version-test", skills=["z-photo"])
+        
+        assert session.version == 2
+        assert session.to_dict()["version"] == 2
+    
+    def test_changes_since(self, session_manager):
+        """Should return only the changes after the given version."""
+        session_manager.create_session("since-test")
+        session_manager.add_message("since-test", "user", "one")
+        session_manager.add_message("since-test", "assistant", "two")
+        
+        changes = session_manager.changes_since("since-test", 1)
+        assert [c["op"] for c in changes] == ["append"]
+        assert changes[0]["message"]["content"] == "two"
+        assert session_manager.changes_since("since-test", 2) == []
+    
+    def test_changes_since_needs_snapshot(self, session_manager):
+        """Versions outside the change log should require a full snapshot."""
+        session = session_manager.create_session("snapshot-test")
+        session_manager.add_message("snapshot-test", "user", "one")
+        
+        assert session_manager.changes_since("snapshot-test", 5) is None
+        session.changes.clear()
+        assert session_manager.changes_since("snapshot-test", 0) is None
+        assert session_manager.changes_since("unknown-session", 0) is None
+    
+    def test_change_listener(self, session_manager):
+        """The listener should receive every change in order."""
+        received = []
+        previous = session_manager._change_listener
+        session_manager.set_change_listener(lambda sid, change: received.append((sid, change["op"])))
+        try:
+            session_manager.create_session("listener-test")
+            session_manager.set_opencode_session("listener-test", "oc-1")
+            session_manager.replace_history("listener-test", [{"role": "user", "content": "x"}])
+        finally:
+            session_manager.set_change_listener(previous)
+        
+        assert received == [("listener-test", "set"), ("listener-test", "reset")]
+
+    def test_replace_history_needs_snapshot(self, session_manager):
+        """A history replacement is logged without its data and forces a snapshot."""
+        session = session_manager.create_session("reset-test")
+        session_manager.add_message("reset-test", "user", "x" * 1000)
+        version = session.version
+        session_manager.replace_history("reset-test", [{"role": "user", "content": "y" * 1000}])
+
+        assert session.changes[-1] == {"version": version + 1, "op": "reset"}
+        assert session_manager.changes_since("reset-test", version) is None
+        assert session_manager.changes_since("reset-test", version + 1) == []
+
+
+class TestWaitForOutput:
+    """Waiting for the next output instead of polling."""
+
+    def test_returns_new_output(self, session_manager):
+        session_manager.create_session("wait-test")
+        session_manager.set_status("wait-test", "working")
+
+        def finish():
+            # A provisional output first; the waiter should hold out for the final one
+            session_manager.set_output("wait-test", "a c", "", "")
+            session_manager.set_output("wait-test", "a cat", "{}", "猫")
+            session_manager.set_status("wait-test", "idle")
+
+        threading.Timer(0.05, finish).start()
+        result = session_manager.wait_for_output("wait-test", timeout=5)
+
+        assert result["changed"]
+        assert result["output"]["prompt_english"] == "a cat"
+        assert result["output_version"] == 2
+        assert result["status"] == "idle"
+
+    def test_already_newer(self, session_manager):
+        session_manager.create_session("wait-newer")
+        session_manager.set_output("wait-newer", "a cat", "{}", "猫")
+        result = session_manager.wait_for_output("wait-newer", since_version=0, timeout=0)
+        assert result["changed"]
+
+    def test_timeout(self, session_manager):
+        session_manager.create_session("wait-timeout")
+        result = session_manager.wait_for_output("wait-timeout", timeout=0.05)
+        assert not result["changed"]
+
+    def test_failed_generation_ends_wait(self, session_manager):
+        session_manager.create_session("wait-error")
+        session_manager.set_status("wait-error", "working")
+        threading.Timer(0.05, session_manager.set_status, ("wait-error", "error")).start()
+
+        result = session_manager.wait_for_output("wait-error", timeout=5)
+        assert not result["changed"]
+        assert result["status"] == "error"
+
+    def test_unknown_session(self, session_manager):
+        assert session_manager.wait_for_output("missing", timeout=0) is None
+
+    def test_long_poll_route(self, client, session_manager):
+        session_manager.create_session("wait-http")
+        session_manager.set_output("wait-http", "a cat", "{}", "猫")
+
+        data = client.get("/api/sessions/wait-http/output?since=0&timeout=1").get_json()
+        assert data["changed"] and data["output_version"] == 1
+
+        data = client.get("/api/sessions/wait-http/output?since=1&timeout=0.05").get_json()
+        assert not data["changed"]
+        assert client.get("/api/sessions/missing/output?timeout=0").status_code == 404
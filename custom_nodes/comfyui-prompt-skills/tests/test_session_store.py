@@ -0,0 +1,198 @@
+"""
+Tests for SessionStore backends and SessionManager persistence (Tier 3 Core)
+"""
+
+import pytest
+from backend.core import MemorySessionStore, SessionLimits, SessionManager, SessionStore, SQLiteSessionStore
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "sessions.db"
+
+
+@pytest.fixture
+def store(db_path):
+    store = SQLiteSessionStore(db_path, flush_interval=0.01)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def persistent_manager(db_path):
+    """SessionManager backed by SQLite, restored to a memory store afterwards."""
+    manager = SessionManager()
+    store = SQLiteSessionStore(db_path, flush_interval=0.01)
+    manager.set_store(store)
+    yield manager
+    store.close()
+    manager.set_store(MemorySessionStore())
+    manager.set_limits(SessionLimits())
+
+
+class TestSQLiteSessionStore:
+    """Test batched writes and durability."""
+
+    def test_roundtrip(self, store):
+        store.save("s1", {"id": "s1", "history": [{"role": "user", "content": "你好"}]})
+        assert store.flush()
+        assert store.load("s1")["history"][0]["content"] == "你好"
+
+    def test_pending_write_visible_before_flush(self, db_path):
+        store = SQLiteSessionStore(db_path, flush_interval=60)
+        store.save("s1", {"id": "s1"})
+        assert store.load("s1") == {"id": "s1"}
+        assert store.list_ids() == ["s1"]
+        store.close()
+
+    def test_snapshots_coalesce(self, store):
+        """Only the latest snapshot of a session should be written."""
+        for i in range(50):
+            store.save("s1", {"id": "s1", "n": i})
+        store.flush()
+        assert store.load("s1")["n"] == 49
+
+    def test_delete(self, store):
+        store.save("s1", {"id": "s1"})
+        store.flush()
+        store.delete("s1")
+        assert store.load("s1") is None
+        store.flush()
+        assert store.list_ids() == []
+
+    def test_unserializable_record_is_skipped(self, db_path, store):
+        """A bad record should not block the rest of its batch or later ones."""
+        store.save("bad", {"id": "bad", "value": object()})
+        store.save("good", {"id": "good"})
+        assert store.flush()
+        store.save("later", {"id": "later"})
+        assert store.flush()
+
+        reopened = SQLiteSessionStore(db_path)
+        assert reopened.list_ids() == ["good", "later"]
+        reopened.close()
+
+    def test_survives_reopen(self, db_path):
+        """Data should be readable by a new store on the same file."""
+        first = SQLiteSessionStore(db_path, flush_interval=0.01)
+        first.save("s1", {"id": "s1", "value": 1})
+        first.close()
+
+        second = SQLiteSessionStore(db_path)
+        assert second.load("s1") == {"id": "s1", "value": 1}
+        second.close()
+
+    def test_wal_mode(self, store):
+        mode = store._read_conn.execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode.lower() == "wal"
+
+    def test_incomplete_store_rejected(self):
+        class LoadOnlyStore(SessionStore):
+            def load(self, session_id):
+                return None
+
+        with pytest.raises(TypeError):
+            LoadOnlyStore()
+
+
+class TestSessionManagerPersistence:
+    """Sessions should survive a restart and rehydrate lazily."""
+
+    def test_rehydrate_after_restart(self, persistent_manager, db_path):
+        manager = persistent_manager
+        manager.create_session("s1")
+        manager.update_session_config("s1", api_key="secret", skills=["z-photo"], model_target="sdxl")
+        manager.set_opencode_session("s1", "oc_1")
+        manager.add_message("s1", "user", "一只猫")
+        manager.set_output("s1", "a cat", "{}", "猫 / a cat")
+        manager.set_status("s1", "working")
+        manager.store.close()
+
+        # Simulate a restart: new store on the same file, empty memory
+        restarted = SQLiteSessionStore(db_path)
+        manager.set_store(restarted)
+        assert manager.list_sessions() == []
+
+        session = manager.get_session("s1")
+        assert session is not None
+        assert session.history == [{"role": "user", "content": "一只猫"}]
+        assert session.skills == ["z-photo"]
+        assert session.opencode_session_id == "oc_1"
+        assert session.status == "idle"
+        assert "api_key" not in session.config
+        assert manager.get_output("s1")["prompt_english"] == "a cat"
+        assert manager.get_output_version("s1") == 1
+        restarted.close()
+
+    def test_delete_removes_stored_session(self, persistent_manager):
+        manager = persistent_manager
+        manager.create_session("s1")
+        assert manager.delete_session("s1") is True
+        assert manager.get_session("s1") is None
+        assert manager.store.load("s1") is None
+
+
+class TestSessionLimits:
+    """Memory bounds: LRU/TTL eviction, history caps and spill."""
+
+    @pytest.fixture
+    def bounded(self, session_manager):
+        yield session_manager
+        session_manager.set_limits(SessionLimits())
+
+    def test_lru_eviction(self, bounded):
+        bounded.set_limits(SessionLimits(max_sessions=2, spill_evicted=False))
+        bounded.create_session("a")
+        bounded.create_session("b")
+        bounded.get_session("a")  # b is now least recently used
+        bounded.create_session("c")
+
+        assert set(bounded.list_sessions()) == {"a", "c"}
+        assert bounded.get_session("b") is None
+        assert bounded.stats()["evicted_lru"] >= 1
+
+    def test_working_session_not_evicted(self, bounded):
+        bounded.set_limits(SessionLimits(max_sessions=1, spill_evicted=False))
+        bounded.create_session("a")
+        bounded.set_status("a", "working")
+        bounded.create_session("b")
+
+        assert "a" in bounded.list_sessions()
+
+    def test_idle_ttl(self, bounded):
+        bounded.set_limits(SessionLimits(idle_ttl=60, spill_evicted=False))
+        session = bounded.create_session("a")
+        session.last_access -= 120
+
+        assert bounded.get_session("a") is None
+        assert bounded.stats()["evicted_ttl"] >= 1
+
+    def test_history_count_cap(self, bounded):
+        bounded.set_limits(SessionLimits(max_history=3))
+        bounded.create_session("a")
+        for i in range(5):
+            bounded.add_message("a", "user", f"m{i}")
+
+        assert [m["content"] for m in bounded.get_session("a").history] == ["m2", "m3", "m4"]
+
+    def test_history_bytes_cap(self, bounded):
+        bounded.set_limits(SessionLimits(max_history_bytes=200))
+        bounded.create_session("a")
+        for i in range(10):
+            bounded.add_message("a", "user", "x" * 60)
+
+        session = bounded.get_session("a")
+        assert session.history_bytes <= 200
+        assert len(session.history) < 10
+
+    def test_evicted_session_spills_to_durable_store(self, persistent_manager):
+        persistent_manager.set_limits(SessionLimits(max_sessions=1))
+        persistent_manager.create_session("a")
+        persistent_manager.add_message("a", "user", "keep me")
+        persistent_manager.create_session("b")
+
+        assert persistent_manager.list_sessions() == ["b"]
+        assert persistent_manager.get_session("a").history[0]["content"] == "keep me"
+        stats = persistent_manager.stats()
+        assert stats["spilled"] >= 1
+        assert stats["rehydrated"] >= 1
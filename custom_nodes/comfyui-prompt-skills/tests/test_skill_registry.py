@@ -0,0 +1,138 @@
+"""
+Tests for SkillRegistry (Tier 3 Core)
+"""
+
+import os
+
+import pytest
+from backend.core import SkillRegistry
+
+
+def write_skill(root, skill_id, body, name_zh="技能"):
+    skill_dir = root / skill_id
+    skill_dir.mkdir(exist_ok=True)
+    skill_file = skill_dir / "SKILL.md"
+    skill_file.write_text(
+        f"---\nname: {skill_id}\nname_zh: {name_zh}\ndescription: test\n---\n\n{body}\n",
+        encoding="utf-8",
+    )
+    return skill_file
+
+
+def touch_later(path, seconds=5):
+    """Move a file's mtime forward so the change is visible on coarse clocks."""
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 1_000_000_000))
+
+
+@pytest.fixture
+def skills_dir(tmp_path):
+    write_skill(tmp_path, "alpha", "Alpha content")
+    return tmp_path
+
+
+class TestSkillRegistry:
+    """Test the metadata index and hot reloading."""
+
+    def test_list_all(self, skills_dir):
+        registry = SkillRegistry(skills_dir, reload_interval=0)
+        assert [s["id"] for s in registry.list_all()] == ["alpha"]
+        assert registry.load_skill("alpha").content == "Alpha content"
+
+    def test_edit_is_picked_up(self, skills_dir):
+        """Editing a SKILL.md should be visible without clearing caches."""
+        registry = SkillRegistry(skills_dir, reload_interval=0)
+        assert registry.load_skill("alpha").name_zh == "技能"
+
+        skill_file = write_skill(skills_dir, "alpha", "Edited content", name_zh="新技能")
+        touch_later(skill_file)
+
+        assert registry.load_skill("alpha").content == "Edited content"
+        assert registry.list_all()[0]["name_zh"] == "新技能"
+
+    def test_added_and_removed_skills(self, skills_dir):
+        registry = SkillRegistry(skills_dir, reload_interval=0)
+        registry.list_all()
+
+        write_skill(skills_dir, "beta", "Beta content")
+        touch_later(skills_dir)
+        assert [s["id"] for s in registry.list_all()] == ["alpha", "beta"]
+
+        (skills_dir / "beta" / "SKILL.md").unlink()
+        assert [s["id"] for s in registry.list_all()] == ["alpha"]
+        assert registry.load_skill("beta") is None
+
+    def test_checks_are_throttled(self, skills_dir):
+        """Within the reload interval the index should be served as-is."""
+        registry = SkillRegistry(skills_dir, reload_interval=3600)
+        registry.list_all()
+
+        skill_file = write_skill(skills_dir, "alpha", "Edited content")
+        touch_later(skill_file)
+
+        assert registry.load_skill("alpha").content == "Alpha content"
+        registry.clear_cache()
+        assert registry.load_skill("alpha").content == "Edited content"
+
+    def test_unknown_skill(self, skills_dir):
+        registry = SkillRegistry(skills_dir, reload_interval=0)
+        assert registry.load_skill("../alpha") is None
+        assert registry.load_skill("missing") is None
+
+    def test_missing_directory(self, tmp_path):
+        registry = SkillRegistry(tmp_path / "missing", reload_interval=0)
+        assert registry.list_all() == []
+
+
+class TestCompiledPrompts:
+    """Test memoized combined prompts and fingerprints."""
+
+    def test_combined_prompt_is_memoized(self, skills_dir):
+        write_skill(skills_dir, "beta", "Beta content")
+        registry = SkillRegistry(skills_dir, reload_interval=0)
+
+        first = registry.compile_prompt(["alpha", "beta"])
+        second = registry.compile_prompt(["alpha", "beta"])
+
+        assert first is second
+        assert "## Skill: alpha" in first.text and "Beta content" in first.text
+        assert registry.compiled_prompt_stats() == {"size": 1, "hits": 1, "misses": 1}
+
+    def test_order_matters(self, skills_dir):
+        write_skill(skills_dir, "beta", "Beta content")
+        registry = SkillRegistry(skills_dir, reload_interval=0)
+
+        forward = registry.get_prompt_fingerprint(["alpha", "beta"])
+        backward = registry.get_prompt_fingerprint(["beta", "alpha"])
+        assert forward != backward
+
+    def test_fingerprint_changes_with_content(self, skills_dir):
+        registry = SkillRegistry(skills_dir, reload_interval=0)
+        before = registry.get_prompt_fingerprint(["alpha"])
+        assert registry.get_prompt_fingerprint(["alpha"]) == before
+
+        touch_later(write_skill(skills_dir, "alpha", "Edited content"))
+        after = registry.compile_prompt(["alpha"])
+
+        assert after.fingerprint != before
+        assert "Edited content" in after.text
+
+    def test_fingerprint_stable_across_registries(self, skills_dir):
+        """Fingerprints depend only on the text, not on process state."""
+        first = SkillRegistry(skills_dir, reload_interval=0).get_prompt_fingerprint(["alpha"])
+        second = SkillRegistry(skills_dir, reload_interval=0).get_prompt_fingerprint(["alpha"])
+        assert first == second
+
+    def test_cache_is_bounded(self, skills_dir):
+        for name in ("beta", "gamma"):
+            write_skill(skills_dir, name, name)
+        registry = SkillRegistry(skills_dir, reload_interval=0, max_compiled_prompts=2)
+
+        for combo in (["alpha"], ["beta"], ["gamma"]):
+            registry.compile_prompt(combo)
+
+        assert registry.compiled_prompt_stats()["size"] == 2
+
+    def test_unknown_skills_give_empty_prompt(self, skills_dir):
+        registry = SkillRegistry(skills_dir, reload_interval=0)
+        assert registry.get_combined_prompt(["missing"]) == ""
@@ -58,3 +58,398 @@ class TestSocketIOEvents:
         """Disconnect should clean up."""
         socket_client.disconnect()
         assert not socket_client.is_connected()
+    
+    def test_connect_sends_snapshot(self, app, session_manager):
+        """A fresh client should receive the full state."""
+        from backend.logic import socketio
+        client = socketio.test_client(app, query_string="session_id=sync-snapshot")
+        events = {e["name"]: e["args"][0] for e in client.get_received()}
+        
+        assert events["sync_state"]["version"] == 0
+        assert "history" in events["sync_state"]
+        client.disconnect()
+    
+    def test_reconnect_sends_only_missed_changes(self, app, session_manager):
+        """A client reconnecting with its version should receive a delta."""
+        from backend.logic import socketio
+        session_manager.create_session("sync-delta")
+        session_manager.add_message("sync-delta", "user", "first")
+        session_manager.add_message("sync-delta", "assistant", "second")
+        
+        client = socketio.test_client(app, query_string="session_id=sync-delta", auth={"since": 1})
+        events = {e["name"]: e["args"][0] for e in client.get_received()}
+        
+        assert "sync_state" not in events
+        delta = events["sync_delta"]
+        assert delta["from_version"] == 1
+        assert delta["version"] == 2
+        assert [c["message"]["content"] for c in delta["changes"]] == ["second"]
+        client.disconnect()
+    
+    def test_configure_broadcasts_delta(self, app, session_manager):
+        """Config changes should be pushed as a small delta, not a snapshot."""
+        from backend.logic import socketio
+        client = socketio.test_client(app, query_string="session_id=sync-configure")
+        client.get_received()
+        
+        client.emit("configure", {"session_id": "sync-configure", "active_skills": ["z-manga"]})
+        received = client.get_received()
+        names = [e["name"] for e in received]
+        
+        assert "sync_state" not in names
+        delta = next(e["args"][0] for e in received if e["name"] == "sync_delta")
+        assert delta["changes"][0]["fields"] == {"skills": ["z-manga"]}
+        client.disconnect()
+
+
+class FakeOpencodeClient:
+    """Async OpenCode stand-in answering each batch variant in turn."""
+
+    def __init__(self):
+        self.created = []
+        self.deleted = []
+
+    async def ensure_server_running(self):
+        return True
+
+    async def create_session(self, title=None):
+        session = {"id": f"oc_{len(self.created)}"}
+        self.created.append(session["id"])
+        return session
+
+    async def send_message(self, session_id, content, system=None):
+        text = f'{{"positive_prompt": "variant from {session_id}"}}'
+        return {"info": {"role": "assistant"}, "parts": [{"type": "text", "text": text}]}
+
+    async def delete_session(self, session_id):
+        self.deleted.append(session_id)
+        return True
+
+
+class TestBatchGeneration:
+    """generate_batch fans out variants in short-lived OpenCode sessions."""
+
+    @pytest.fixture
+    def fake_client(self, monkeypatch):
+        from backend.logic import generation, socket_handlers
+        client = FakeOpencodeClient()
+        monkeypatch.setattr(socket_handlers, "get_async_opencode_client", lambda: client)
+        monkeypatch.setattr(generation, "get_async_opencode_client", lambda: client)
+        return client
+
+    def wait_for_status(self, session_manager, session_id, status="idle", timeout=5.0):
+        import time
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if session_manager.get_session(session_id).status == status:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_batch_over_socket(self, app, session_manager, fake_client):
+        from backend.logic import socketio
+        client = socketio.test_client(app, query_string="session_id=batch-socket")
+        client.get_received()
+
+        client.emit("generate_batch", {"session_id": "batch-socket", "content": "一只猫", "count": 3})
+        assert self.wait_for_status(session_manager, "batch-socket")
+
+        received = client.get_received()
+        names = [e["name"] for e in received]
+        assert "batch_started" in names
+        assert names.count("batch_result") == 3
+        assert "batch_complete" in names
+
+        output = session_manager.get_output("batch-socket")
+        assert len(output["variants"]) == 3
+        assert output["prompt_english"] == output["variants"][0]["prompt_english"]
+        # Every short-lived session is cleaned up
+        assert sorted(fake_client.deleted) == sorted(fake_client.created)
+        client.disconnect()
+
+    def test_batch_over_http(self, client, session_manager, fake_client):
+        session_manager.create_session("batch-http")
+        response = client.post("/api/sessions/batch-http/batch", json={"content": "一只猫", "count": 99})
+
+        assert response.status_code == 202
+        assert response.get_json()["count"] == 8
+        assert self.wait_for_status(session_manager, "batch-http")
+        assert len(session_manager.get_output("batch-http")["variants"]) == 8
+
+    def test_rejected_batch_leaves_no_message(self, app, session_manager, monkeypatch):
+        from backend.logic import socket_handlers, socketio
+
+        class FullScheduler:
+            def has_capacity(self, session_id):
+                return True
+
+            def submit(self, session_id, run):
+                return None
+
+        monkeypatch.setattr(socket_handlers, "_scheduler", FullScheduler())
+        client = socketio.test_client(app, query_string="session_id=batch-full")
+        client.get_received()
+        client.emit("generate_batch", {"session_id": "batch-full", "content": "一只猫", "count": 2})
+        received = client.get_received()
+        client.disconnect()
+
+        assert session_manager.get_session("batch-full").history == []
+        assert "sync_delta" not in [e["name"] for e in received]
+        assert "error" in [e["name"] for e in received]
+
+    def test_batch_requires_content(self, client, session_manager):
+        session_manager.create_session("batch-empty")
+        assert client.post("/api/sessions/batch-empty/batch", json={}).status_code == 400
+        assert client.post("/api/sessions/missing/batch", json={"content": "x"}).status_code == 404
+
+
+    def test_batch_respects_global_cap(self, app, session_manager, fake_client, monkeypatch):
+        import asyncio
+        from backend.core import GenerationScheduler, SchedulerConfig
+        from backend.logic import socket_handlers, socketio
+        monkeypatch.setattr(socket_handlers, "_scheduler", GenerationScheduler(SchedulerConfig(max_concurrent=2)))
+        running = []
+        peak = []
+        send_message = fake_client.send_message
+
+        async def slow_send(session_id, content, system=None):
+            running.append(session_id)
+            peak.append(len(running))
+            await asyncio.sleep(0.02)
+            running.remove(session_id)
+            return await send_message(session_id, content, system)
+
+        fake_client.send_message = slow_send
+        client = socketio.test_client(app, query_string="session_id=batch-cap")
+        client.emit("generate_batch", {"session_id": "batch-cap", "content": "一只猫", "count": 6})
+
+        assert self.wait_for_status(session_manager, "batch-cap")
+        assert len(session_manager.get_output("batch-cap")["variants"]) == 6
+        assert max(peak) == 2
+        client.disconnect()
+
+
+class FakeEventRouter:
+    """Event router stand-in; the fake client pushes deltas through it."""
+
+    def __init__(self):
+        self.subscribers = {}
+
+    def subscribe(self, session_id, callback):
+        self.subscribers.setdefault(session_id, []).append(callback)
+
+    def unsubscribe(self, session_id, callback):
+        self.subscribers.get(session_id, []).remove(callback)
+
+    def wait_until_ready(self, timeout=None):
+        return True
+
+    def deliver(self, session_id, delta):
+        for callback in list(self.subscribers.get(session_id, [])):
+            callback(delta)
+
+
+class StreamingOpencodeClient(FakeOpencodeClient):
+    """Streams ``stream`` through the router, then answers with ``reply``."""
+
+    def __init__(self, router):
+        super().__init__()
+        self.router = router
+        self.config = type("Config", (), {"stream_ready_timeout": 0})()
+        self.reply = '{"positive_prompt": "a red fox"}'
+        self.stream = None
+        self.role = "assistant"
+        self.sent = []
+
+    async def send_message(self, session_id, content, system=None):
+        self.sent.append((session_id, content, system))
+        stream = [self.reply[:10], self.reply[10:]] if self.stream is None else self.stream
+        for delta in stream:
+            self.router.deliver(session_id, delta)
+        return {"info": {"role": self.role}, "parts": [{"type": "text", "text": self.reply}]}
+
+    async def get_messages_since(self, session_id, parent_id):
+        return []
+
+
+@pytest.fixture
+def chat(app, session_manager, monkeypatch):
+    """Sends user_message turns; OpenCode is faked and the result cache enabled."""
+    from backend.core import ResultCache, ResultCacheConfig
+    from backend.logic import socket_handlers, socketio
+    from .test_tracing import SyncScheduler
+
+    router = FakeEventRouter()
+    opencode = StreamingOpencodeClient(router)
+    cache = ResultCache(ResultCacheConfig(enabled=True))
+    monkeypatch.setattr(socket_handlers, "get_event_router", lambda: router)
+    monkeypatch.setattr(socket_handlers, "get_async_opencode_client", lambda: opencode)
+    monkeypatch.setattr(socket_handlers, "get_result_cache", lambda: cache)
+    monkeypatch.setattr(socket_handlers, "_scheduler", SyncScheduler())
+
+    def send(session_id, content="a fox"):
+        client = socketio.test_client(app, query_string=f"session_id={session_id}")
+        client.get_received()
+        client.emit("user_message", {"session_id": session_id, "content": content})
+        received = client.get_received()
+        client.disconnect()
+        return received
+
+    send.opencode = opencode
+    send.cache = cache
+    return send
+
+
+class TestChatStreaming:
+    """user_message streams the reply and keeps clients consistent with it."""
+
+    def test_full_stream(self, chat):
+        received = chat("stream-full")
+        deltas = [e["args"][0]["delta"] for e in received if e["name"] == "stream_delta"]
+        assert "".join(deltas) == chat.opencode.reply
+        assert "stream_resync" not in [e["name"] for e in received]
+
+    def test_dropped_stream_sends_tail(self, chat):
+        chat.opencode.stream = [chat.opencode.reply[:8]]
+        received = chat("stream-dropped")
+        deltas = [e["args"][0]["delta"] for e in received if e["name"] == "stream_delta"]
+        assert "".join(deltas) == chat.opencode.reply
+        assert len(deltas) == 2
+
+    def test_diverged_stream_resyncs(self, chat):
+        chat.opencode.stream = ["something else"]
+        received = chat("stream-diverged")
+        resync = next(e["args"][0] for e in received if e["name"] == "stream_resync")
+        assert resync["text"] == chat.opencode.reply
+
+    def test_provisional_prompt_is_not_an_output(self, chat, session_manager):
+        chat.opencode.reply = '{"positive_prompt": "a red fox", "style": "ink"}'
+        chat.opencode.stream = [chat.opencode.reply[:30], chat.opencode.reply[30:]]
+        # The reply never materializes as an assistant message
+        chat.opencode.role = "user"
+        received = chat("stream-provisional")
+
+        partial = next(e["args"][0] for e in received if e["name"] == "partial_output")
+        assert partial["prompt_english"] == "a red fox"
+        session = session_manager.get_session("stream-provisional")
+        assert session.output_version == 0
+        assert session.last_output["prompt_english"] == ""
+        assert session.provisional_output == ""
+        assert session_manager.store.load("stream-provisional")["last_output"]["prompt_english"] == ""
+
+    def test_final_output_replaces_provisional(self, chat, session_manager):
+        chat.opencode.reply = '{"positive_prompt": "a red fox", "style": "ink"}'
+        chat("stream-final")
+
+        session = session_manager.get_session("stream-final")
+        assert session.output_version == 1
+        assert session.last_output["prompt_english"] == "a red fox"
+        assert session.provisional_output == ""
+
+
+class TestChatResultCache:
+    """Only context-free turns use the result cache."""
+
+    def test_first_turn_is_cached_across_sessions(self, chat, session_manager):
+        chat("cache-a")
+        received = chat("cache-b")
+
+        complete = next(e["args"][0] for e in received if e["name"] == "complete")
+        assert complete["cached"] is True
+        assert len(chat.opencode.sent) == 1
+
+    def test_hit_skips_the_full_queue(self, chat, session_manager, monkeypatch):
+        from backend.logic import socket_handlers
+
+        class FullScheduler:
+            def has_capacity(self, session_id):
+                return False
+
+            def submit(self, session_id, run):
+                raise AssertionError("a cache hit must not be queued")
+
+        chat("cache-queue-a")
+        monkeypatch.setattr(socket_handlers, "_scheduler", FullScheduler())
+        received = chat("cache-queue-b")
+
+        names = [e["name"] for e in received]
+        assert "busy" not in names
+        assert next(e["args"][0] for e in received if e["name"] == "complete")["cached"] is True
+        history = session_manager.get_session("cache-queue-b").history
+        assert [m["role"] for m in history] == ["user", "assistant"]
+
+    def test_busy_names_the_rejected_message(self, chat, session_manager, monkeypatch):
+        from backend.logic import socket_handlers
+
+        class FullScheduler:
+            def has_capacity(self, session_id):
+                return False
+
+        monkeypatch.setattr(socket_handlers, "_scheduler", FullScheduler())
+        received = chat("busy-content", "a grey wolf")
+
+        busy = next(e["args"][0] for e in received if e["name"] == "busy")
+        # Clients use the content to drop their optimistic copy of the message
+        assert busy["content"] == "a grey wolf"
+        assert session_manager.get_session("busy-content").history == []
+
+    def test_follow_up_is_not_cached(self, chat, session_manager):
+        chat("cache-follow-a")
+        chat("cache-follow-a", "make it darker")
+        chat("cache-follow-a", "make it darker")
+        # A first turn with the same text is not answered with a follow-up's result
+        chat("cache-follow-b", "make it darker")
+
+        assert len(chat.opencode.sent) == 4
+        assert chat.cache.stats()["stores"] == 2
+
+    def test_turn_after_cache_hit_replays_history(self, chat, session_manager):
+        chat("cache-recap-a")
+        chat("cache-recap-b")
+        chat("cache-recap-b", "make it darker")
+
+        _, content, _ = chat.opencode.sent[-1]
+        assert content.startswith("之前的对话:\n用户: a fox\n助手: a red fox")
+        assert "用户请求: make it darker" in content
+
+
+class TestDeleteOpencodeSession:
+    """Deleting the current OpenCode session resets the conversation everywhere."""
+
+    def test_delete_current_session(self, app, session_manager, monkeypatch):
+        from backend.logic import socket_handlers, socketio
+
+        class SyncClient:
+            def delete_session(self, session_id):
+                return True
+
+        monkeypatch.setattr(socket_handlers, "get_opencode_client", lambda: SyncClient())
+        session_manager.create_session("delete-oc")
+        session_manager.set_opencode_session("delete-oc", "oc_1")
+        session_manager.add_message("delete-oc", "user", "a cat " * 100)
+        session_manager.set_output("delete-oc", "a cat", "{}", "a cat")
+        output_version = session_manager.get_output_version("delete-oc")
+        version = session_manager.get_session("delete-oc").version
+
+        client = socketio.test_client(app, query_string="session_id=delete-oc")
+        client.get_received()
+        client.emit("delete_opencode_session", {"session_id": "delete-oc", "opencode_session_id": "oc_1"})
+        received = client.get_received()
+        client.disconnect()
+
+        session = session_manager.get_session("delete-oc")
+        assert session.history == [] and session.history_bytes == 0
+        assert session.last_output["prompt_english"] == ""
+        assert session.output_version == output_version + 1
+        ops = [c["op"] for c in session.changes if c["version"] > version]
+        assert ops == ["set", "reset"]
+        assert any(
+            c["op"] == "reset" for e in received if e["name"] == "sync_delta" for c in e["args"][0]["changes"]
+        )
+        # Catching up across the reset takes a full snapshot
+        assert session_manager.changes_since("delete-oc", version) is None
+
+        stored = session_manager.store.load("delete-oc")
+        assert stored["history"] == []
+        assert stored["last_output"]["prompt_english"] == ""
+        assert stored["opencode_session_id"] is None
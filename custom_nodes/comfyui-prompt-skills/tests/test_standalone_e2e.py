@@ -144,6 +144,11 @@ class TestStandaloneE2E(unittest.TestCase):
             # Print debug logs from server to help diagnose
             print(f"[Server-Debug] [{data.get('module')}] {data.get('message')}")
 
+        @sio.on("debug_logs")
+        def on_debug_logs(data):
+            for entry in data["entries"]:
+                on_debug_log(entry)
+
         # Connect
         print(f"[Test] Connecting to {self.SERVER_URL}...")
         sio.connect(f"{self.SERVER_URL}?session_id={session_id}", transports=['websocket'])
@@ -0,0 +1,83 @@
+"""
+Tests for StyleIndex (Tier 3 Core)
+"""
+
+import json
+
+import pytest
+from backend.core import StyleIndex, get_skill_registry
+from backend.core.style_index import tokenize
+
+
+@pytest.fixture
+def index():
+    """StyleIndex over the bundled style library."""
+    return StyleIndex()
+
+
+class TestTokenize:
+    """Test mixed-language tokenization."""
+
+    def test_english_words(self):
+        assert tokenize("Cinematic Film Grain") == ["cinematic", "film", "grain"]
+
+    def test_chinese_bigrams(self):
+        assert tokenize("胶片感") == ["胶片", "片感"]
+
+
+class TestStyleIndex:
+    """Test style retrieval over the bundled library."""
+
+    def test_chinese_request_matches_english_keywords(self, index):
+        """Glossary terms should map Chinese requests onto English keywords."""
+        matches = index.search("复古胶片感的人像", model_target="z-image-turbo")
+        assert matches[0].style["id"] == "analog_film"
+
+    def test_name_zh_match(self, index):
+        """Chinese style names should match directly."""
+        matches = index.search("一位仙侠少女", categories=["chinese_culture"])
+        assert matches[0].style["id"] == "xianxia"
+
+    def test_category_filter(self, index):
+        """Only the requested categories should be returned."""
+        matches = index.search("vintage anime film", categories=["illustration"])
+        assert matches
+        assert all(match.category == "illustration" for match in matches)
+
+    def test_top_k(self, index):
+        """No more than top_k results should be returned."""
+        assert len(index.search("portrait film cinematic street", top_k=2)) == 2
+
+    def test_no_match(self, index):
+        """Unrelated requests should return nothing rather than noise."""
+        assert index.search("xyzzy") == []
+
+    def test_model_target_filter(self, tmp_path):
+        """Styles not supporting the target model should be skipped."""
+        db = tmp_path / "styles.json"
+        db.write_text(json.dumps({"styles": {"photography": [
+            {"id": "a", "name": "Film", "keywords": ["film"], "model_target": ["sdxl"]},
+            {"id": "b", "name": "Film B", "keywords": ["film"], "model_target": ["z-image-turbo"]},
+        ]}}), encoding="utf-8")
+        index = StyleIndex(db)
+
+        assert [m.style["id"] for m in index.search("film", model_target="z-image-turbo")] == ["b"]
+
+    def test_missing_library(self, tmp_path):
+        """A missing library file should yield no matches."""
+        assert StyleIndex(tmp_path / "missing.json").search("film") == []
+
+    def test_format_for_prompt(self, index):
+        """Formatted section should carry keywords and tech specs of matches."""
+        text = index.format_for_prompt(index.search("赛博朋克"))
+        assert "cyberpunk" in text
+        assert "tech_specs" in text
+        assert index.format_for_prompt([]) == ""
+
+
+class TestSkillStyleCategories:
+    """Skills declare which library categories they search."""
+
+    def test_skill_categories(self):
+        registry = get_skill_registry()
+        assert registry.get_style_categories(["z-photo", "z-hanfu"]) == ["photography", "chinese_culture"]
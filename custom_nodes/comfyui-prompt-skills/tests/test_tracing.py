@@ -0,0 +1,182 @@
+"""
+Tests for per-request tracing (Tier 3 Core) and its socket/HTTP wiring
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from backend.core import AsyncOpencodeClient, GenerationJob, Tracer, export_chrome, trace_span
+from backend.core import tracing as tracing_module
+from backend.core.opencode_client import OpencodeConfig
+
+
+@pytest.fixture
+def tracer(monkeypatch):
+    tracer = Tracer(enabled=True, capacity=3)
+    monkeypatch.setattr(tracing_module, "_tracer", tracer)
+    return tracer
+
+
+class TestTracer:
+    def test_spans_nest_under_active_trace(self, tracer):
+        trace = tracer.start_trace("generation", "s1")
+        with tracer.activate(trace):
+            with trace_span("outer"):
+                with trace_span("inner", size=3) as inner:
+                    inner.attrs["status"] = 200
+        tracer.finish(trace)
+
+        outer, inner = trace.to_dict()["spans"]
+        assert outer["name"] == "outer" and outer["parent"] is None
+        assert inner["parent"] == outer["id"]
+        assert inner["attrs"] == {"size": 3, "status": 200}
+        assert trace.status == "ok"
+
+    def test_no_active_trace_is_noop(self):
+        with trace_span("orphan") as span:
+            assert span is None
+
+    def test_error_is_recorded(self, tracer):
+        trace = tracer.start_trace("generation")
+        with tracer.activate(trace), pytest.raises(ValueError):
+            with trace_span("failing"):
+                raise ValueError("boom")
+        assert trace.to_dict()["spans"][0]["attrs"]["error"] == "ValueError"
+
+    def test_ring_buffer(self, tracer):
+        traces = [tracer.start_trace("generation", f"s{i}") for i in range(5)]
+        assert tracer.get(traces[0].id) is traces[0]  # still running
+        for trace in traces:
+            tracer.finish(trace)
+
+        assert [t.session_id for t in tracer.recent()] == ["s4", "s3", "s2"]
+        assert tracer.get(traces[0].id) is None
+        assert [t.session_id for t in tracer.recent(session_id="s3")] == ["s3"]
+
+    def test_disabled_tracer_keeps_nothing(self):
+        tracer = Tracer(enabled=False)
+        trace = tracer.start_trace("generation")
+        with tracer.activate(trace), trace_span("step") as span:
+            assert span is None
+        tracer.finish(trace)
+        assert tracer.recent() == []
+
+    def test_chrome_export(self, tracer):
+        trace = tracer.start_trace("generation", "s1")
+        trace.add_span("queue", trace.start, trace.start + 0.25)
+        tracer.finish(trace)
+
+        events = export_chrome([trace])["traceEvents"]
+        assert events[0]["ph"] == "M" and events[0]["args"]["name"] == trace.id
+        queue = next(e for e in events if e["name"] == "queue")
+        assert queue["ph"] == "X" and queue["dur"] == pytest.approx(250_000)
+
+
+class SyncScheduler:
+    """Runs each generation job to completion inside submit()."""
+
+    def has_capacity(self, session_id):
+        return True
+
+    def submit(self, session_id, run):
+        job = GenerationJob(session_id=session_id, run=run)
+        job.started_at = time.monotonic()
+        asyncio.run(run(job))
+        return job
+
+    def set_queue_listener(self, listener):
+        pass
+
+
+def opencode_transport(request):
+    """Minimal OpenCode Server answering the generation requests."""
+    if request.url.path == "/config":
+        return httpx.Response(200, json={})
+    if request.url.path == "/session":
+        return httpx.Response(200, json={"id": "oc_trace"})
+    if request.url.path.endswith("/message"):
+        return httpx.Response(200, json={
+            "info": {"id": "msg_2", "role": "assistant", "parentID": "msg_1"},
+            "parts": [{"type": "text", "text": '{"positive_prompt": "a cat"}'}],
+        })
+    return httpx.Response(404)
+
+
+class TestGenerationTrace:
+    @pytest.fixture
+    def wired(self, monkeypatch, tracer):
+        from backend.logic import socket_handlers
+
+        client = AsyncOpencodeClient(OpencodeConfig(stream_ready_timeout=0))
+        client._client = httpx.AsyncClient(
+            base_url="http://opencode.test", transport=httpx.MockTransport(opencode_transport)
+        )
+        monkeypatch.setattr(socket_handlers, "get_async_opencode_client", lambda: client)
+        monkeypatch.setattr(socket_handlers, "_scheduler", SyncScheduler())
+        return tracer
+
+    def test_generation_records_spans(self, app, session_manager, wired):
+        from backend.logic import socketio
+
+        client = socketio.test_client(app, query_string="session_id=trace_s1")
+        client.get_received()
+        client.emit("user_message", {
+            "session_id": "trace_s1",
+            "content": "a cat",
+            "request_id": "req_client_1",
+        })
+        received = client.get_received()
+
+        complete = next(e["args"][0] for e in received if e["name"] == "complete")
+        assert complete["request_id"] == "req_client_1"
+        trace = next(e["args"][0]["trace"] for e in received if e["name"] == "trace")
+        assert trace["trace_id"] == complete["trace_id"] != "req_client_1"
+        assert trace["attrs"]["request_id"] == "req_client_1"
+        names = [span["name"] for span in trace["spans"]]
+        for expected in (
+            "queue",
+            "skills.load",
+            "skills.compile",
+            "cache.lookup",
+            "opencode.ensure_server_running",
+            "opencode.create_session",
+            "opencode.send_message",
+            "format",
+            "emit",
+        ):
+            assert expected in names
+        send = next(s for s in trace["spans"] if s["name"] == "opencode.send_message")
+        assert send["attrs"]["status"] == 200
+        assert trace["status"] == "ok"
+        client.disconnect()
+
+    def test_reused_request_id_gets_distinct_traces(self, app, client, session_manager, wired):
+        from backend.logic import socketio
+
+        for session_id in ("trace_dup_a", "trace_dup_b"):
+            sock = socketio.test_client(app, query_string=f"session_id={session_id}")
+            sock.emit("user_message", {"session_id": session_id, "content": "a cat", "request_id": "dup"})
+            sock.disconnect()
+
+        traces = [client.get(f"/api/traces?session_id={s}").get_json()["traces"] for s in ("trace_dup_a", "trace_dup_b")]
+        assert [len(t) for t in traces] == [1, 1]
+        assert traces[0][0]["trace_id"] != traces[1][0]["trace_id"]
+        assert traces[0][0]["attrs"]["request_id"] == traces[1][0]["attrs"]["request_id"] == "dup"
+
+    def test_trace_routes(self, app, client, session_manager, wired):
+        from backend.logic import socketio
+
+        sock = socketio.test_client(app, query_string="session_id=trace_s2")
+        sock.emit("user_message", {"session_id": "trace_s2", "content": "a dog"})
+        sock.disconnect()
+
+        listed = client.get("/api/traces?session_id=trace_s2").get_json()["traces"]
+        assert len(listed) == 1
+        trace_id = listed[0]["trace_id"]
+
+        assert client.get(f"/api/traces/{trace_id}").get_json()["session_id"] == "trace_s2"
+        chrome = client.get(f"/api/traces/{trace_id}?format=chrome").get_json()
+        assert any(e["name"] == "opencode.send_message" for e in chrome["traceEvents"])
+        assert client.get("/api/traces/missing").status_code == 404
@@ -0,0 +1,60 @@
+"""
+Tests for OpencodeWarmup (Tier 3 Core)
+"""
+
+import threading
+
+import pytest
+from backend.core import OpencodeWarmup
+from backend.core import warmup as warmup_module
+
+
+class GatedClient:
+    """OpenCode client whose start-up blocks until released."""
+
+    def __init__(self, result=True):
+        self.result = result
+        self.release = threading.Event()
+
+    def configure(self, config):
+        self.config = config
+
+    def ensure_server_running(self):
+        self.release.wait(5)
+        return self.result
+
+
+@pytest.fixture
+def gated_client(monkeypatch):
+    client = GatedClient()
+    monkeypatch.setattr(warmup_module, "get_opencode_client", lambda: client)
+    return client
+
+
+class TestOpencodeWarmup:
+    def test_start_does_not_block(self, gated_client):
+        warmup = OpencodeWarmup()
+        states = []
+        warmup.set_status_listener(lambda status: states.append(status["state"]))
+
+        assert warmup.start()
+        assert warmup.state == "starting"
+        assert not warmup.start()
+
+        gated_client.release.set()
+        assert warmup.wait(5)
+        assert states == ["starting", "ready"]
+        assert warmup.status()["elapsed"] >= 0
+
+    def test_unavailable(self, gated_client):
+        gated_client.result = False
+        gated_client.release.set()
+        warmup = OpencodeWarmup()
+        warmup.start("/tmp/opencode.json")
+
+        assert not warmup.wait(5)
+        assert warmup.state == "unavailable"
+        assert gated_client.config.config_path == "/tmp/opencode.json"
+
+    def test_health_reports_state(self, client):
+        assert "state" in client.get("/health").get_json()["opencode"]